@@ -0,0 +1,200 @@
+import logging
+import marshal
+import os
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Drawn in place of characters the font has no glyph for
+REPLACEMENT_CODEPOINT = 0xFFFD
+# Bump whenever the layout of compiled font cache files changes
+FONT_CACHE_VERSION = 1
+
+
+class Glyph:
+    """A single BDF glyph."""
+
+    __slots__ = ("device_width", "width", "height", "y_offset", "rows", "_bitmap")
+
+    def __init__(
+        self, device_width: int, width: int, height: int, y_offset: int, rows: Tuple[int, ...]
+    ):
+        """Initialize the glyph.
+
+        Args:
+            device_width: Horizontal advance in pixels (DWIDTH)
+            width: Bitmap width in pixels
+            height: Bitmap height in pixels
+            y_offset: Offset of the bitmap bottom from the baseline
+            rows: Bitmap rows top to bottom; bit (width - 1 - x) is column x
+        """
+        self.device_width = device_width
+        self.width = width
+        self.height = height
+        self.y_offset = y_offset
+        self.rows = rows
+        self._bitmap: Optional["np.ndarray"] = None
+
+    @property
+    def bitmap(self) -> "np.ndarray":
+        """The glyph as a (height, width) boolean array, built on first use."""
+        if self._bitmap is None:
+            # NumPy is only needed once glyphs are drawn by the numpy backend
+            import numpy as np  # pylint: disable=import-outside-toplevel,redefined-outer-name
+            shifts = np.arange(self.width - 1, -1, -1, dtype=np.uint32)
+            rows = np.array(self.rows, dtype=np.uint32).reshape(-1, 1)
+            self._bitmap = ((rows >> shifts) & 1).astype(bool)
+        return self._bitmap
+
+
+class BdfFont:
+    """A BDF bitmap font usable without the rgbmatrix library.
+
+    Mirrors the parts of rgbmatrix.graphics.Font the renderers use
+    (LoadFont, CharacterWidth, height, baseline), so it can stand in for it.
+    """
+
+    def __init__(self):
+        """Initialize an empty font; call LoadFont to fill it."""
+        self.height = 0
+        self.baseline = 0
+        self.glyphs: Dict[int, Glyph] = {}
+
+    def LoadFont(self, path: str) -> None:  # pylint: disable=invalid-name
+        """Parse a BDF file.
+
+        Args:
+            path: Path to the .bdf file
+
+        Raises:
+            ValueError: If the file is not a BDF font
+        """
+        with open(path, "r", encoding="latin-1") as bdf:
+            lines = bdf.read().splitlines()
+        if not lines or not lines[0].startswith("STARTFONT"):
+            raise ValueError(f"Not a BDF font: {path}")
+
+        glyphs: Dict[int, Glyph] = {}
+        codepoint = -1
+        device_width = width = height = y_offset = 0
+        index = 0
+        while index < len(lines):
+            fields = lines[index].split()
+            index += 1
+            if not fields:
+                continue
+            keyword = fields[0]
+            if keyword == "FONTBOUNDINGBOX":
+                self.height = int(fields[2])
+                self.baseline = self.height + int(fields[4])
+            elif keyword == "ENCODING":
+                codepoint = int(fields[1])
+            elif keyword == "DWIDTH":
+                device_width = int(fields[1])
+            elif keyword == "BBX":
+                # The x offset is ignored, as rgbmatrix's own font loader does
+                width, height, y_offset = int(fields[1]), int(fields[2]), int(fields[4])
+            elif keyword == "BITMAP":
+                rows = []
+                for line in lines[index:index + height]:
+                    digits = len(line.strip())
+                    rows.append(int(line, 16) >> (digits * 4 - width))
+                index += height
+                if codepoint >= 0:
+                    glyphs[codepoint] = Glyph(device_width, width, height, y_offset, tuple(rows))
+                codepoint = -1
+        self.glyphs = glyphs
+
+    def glyph(self, codepoint: int) -> Optional[Glyph]:
+        """Find the glyph for a codepoint, or the replacement glyph.
+
+        Args:
+            codepoint: Unicode codepoint
+
+        Returns:
+            The glyph, or None if neither it nor the replacement exists
+        """
+        found = self.glyphs.get(codepoint)
+        if found is None:
+            found = self.glyphs.get(REPLACEMENT_CODEPOINT)
+        return found
+
+    def CharacterWidth(self, codepoint: int) -> int:  # pylint: disable=invalid-name
+        """Get the advance of a character, or -1 if the font lacks it.
+
+        Args:
+            codepoint: Unicode codepoint
+
+        Returns:
+            Advance width in pixels
+        """
+        found = self.glyphs.get(codepoint)
+        return found.device_width if found is not None else -1
+
+
+def load_bdf_font(path: str, cache_dir: Optional[str] = None) -> BdfFont:
+    """Load a BDF font from a file.
+
+    Parsing a large BDF file is slow on a Pi, so with a cache_dir the parsed
+    glyphs are also compiled into a binary cache file that later loads use
+    instead, for as long as the BDF file's size and mtime are unchanged.
+
+    Args:
+        path: Path to the .bdf file
+        cache_dir: Directory for the compiled font cache, if any
+
+    Returns:
+        The parsed font
+    """
+    if not cache_dir:
+        font = BdfFont()
+        font.LoadFont(path)
+        return font
+
+    stat = os.stat(path)
+    key = (FONT_CACHE_VERSION, stat.st_size, stat.st_mtime_ns)
+    cache_path = os.path.join(cache_dir, os.path.basename(path) + ".cache")
+    font = _read_font_cache(cache_path, key)
+    if font is None:
+        font = BdfFont()
+        font.LoadFont(path)
+        _write_font_cache(font, cache_path, key)
+    return font
+
+
+def _read_font_cache(cache_path: str, key: Tuple[int, int, int]) -> Optional[BdfFont]:
+    """Load a compiled font, or None if the cache is missing, stale or corrupt."""
+    try:
+        with open(cache_path, "rb") as cache:
+            cached_key, height, baseline, glyphs = marshal.loads(cache.read())
+        if tuple(cached_key) != key:
+            return None
+        font = BdfFont()
+        font.height = height
+        font.baseline = baseline
+        font.glyphs = {
+            codepoint: Glyph(device_width, width, glyph_height, y_offset, rows)
+            for codepoint, device_width, width, glyph_height, y_offset, rows in glyphs
+        }
+        return font
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+
+
+def _write_font_cache(font: BdfFont, cache_path: str, key: Tuple[int, int, int]) -> None:
+    """Compile a font into a cache file, replacing any old one atomically."""
+    glyphs = [
+        (codepoint, glyph.device_width, glyph.width, glyph.height, glyph.y_offset, glyph.rows)
+        for codepoint, glyph in font.glyphs.items()
+    ]
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(temp_path, "wb") as cache:
+            cache.write(marshal.dumps((key, font.height, font.baseline, glyphs)))
+        os.replace(temp_path, cache_path)
+    except OSError as e:
+        logger.warning("Could not write font cache %s: %s", cache_path, e)
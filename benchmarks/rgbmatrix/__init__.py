@@ -0,0 +1,36 @@
+"""Stand-in for the rgbmatrix bindings, for running without a panel.
+
+RGBMatrix is a VirtualMatrix, so every frame and drawing call is recorded.
+Put the benchmarks directory first on sys.path to use it.
+"""
+from typing import Any
+
+from virtual_matrix import VirtualMatrix
+
+from . import graphics
+
+
+class RGBMatrixOptions:  # pylint: disable=too-few-public-methods
+    """Accepts any option the real RGBMatrixOptions does."""
+
+    def __init__(self):
+        self.rows = 32
+        self.cols = 64
+        self.chain_length = 1
+        self.parallel = 1
+
+
+class RGBMatrix(VirtualMatrix):
+    """A virtual matrix sized from RGBMatrixOptions."""
+
+    def __init__(self, options: Any = None):
+        if options is None:
+            options = RGBMatrixOptions()
+        super().__init__(
+            options.cols * options.chain_length,
+            options.rows * options.parallel
+        )
+        self.options = options
+
+
+__all__ = ["RGBMatrix", "RGBMatrixOptions", "graphics"]
@@ -0,0 +1,20 @@
+"""Stand-in for rgbmatrix.graphics, drawing through numpy_graphics."""
+import os
+
+from bdf_font import BdfFont
+from numpy_graphics import Color, DrawLine, DrawText  # pylint: disable=unused-import
+
+BUNDLED_FONT_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "assets", "fonts"
+)
+
+
+class Font(BdfFont):
+    """A BDF font that resolves missing paths against the bundled fonts."""
+
+    def LoadFont(self, path: str) -> None:  # pylint: disable=invalid-name
+        if not os.path.exists(path):
+            # The deployed font path only exists on the display's Pi
+            path = os.path.join(BUNDLED_FONT_DIR, os.path.basename(path))
+        super().LoadFont(path)
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Rendering and polling benchmarks, run against the stand-in rgbmatrix module
+in this directory so no panel is needed.
+Usage: python benchmarks/run_benchmarks.py [--iterations 500] [--output results.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from typing import Any, Callable, Dict, List
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(BENCH_DIR)
+# The stand-in rgbmatrix package must shadow any installed one
+sys.path[:0] = [BENCH_DIR, PROJECT_ROOT]
+if platform.system() != "Linux":
+    # initialize_matrix only uses RGBMatrix on Linux; elsewhere go virtual directly
+    os.environ.setdefault("MATRIX_DISPLAY", "virtual")
+
+import matrix_setup  # pylint: disable=wrong-import-position
+from fake_train_api import FakeTrainApi  # pylint: disable=wrong-import-position
+from metrics import METRICS  # pylint: disable=wrong-import-position
+from rgb_matrix_controller import RGBMatrixController  # pylint: disable=wrong-import-position
+from train_client import TrainApiClient  # pylint: disable=wrong-import-position
+from train_record import TrainArrival  # pylint: disable=wrong-import-position
+from transitions import TRANSITIONS  # pylint: disable=wrong-import-position
+
+Trains = List[TrainArrival]
+
+# Three sets, so that with double buffering the back canvas never already
+# holds the next frame
+FULL_REDRAW: List[Trains] = [
+    [TrainArrival("F", "4 mins", True), TrainArrival("G", "11 mins", False)],
+    [TrainArrival("G", "Delayed", False), TrainArrival("F", "2 mins", False)],
+    [TrainArrival("F", "17 mins", False), TrainArrival("G", "6 mins", True)],
+]
+
+
+def minutes_tick(step: int) -> Trains:
+    """Trains whose minutes change every step, as during a countdown."""
+    return [
+        TrainArrival("F", f"{9 - step % 10} mins", True),
+        TrainArrival("G", f"{19 - step % 10} mins", False),
+    ]
+
+
+SCENARIOS: Dict[str, Callable[[int], Trains]] = {
+    "full_redraw": lambda step: FULL_REDRAW[step % 3],
+    "minutes_tick": minutes_tick,
+    "unchanged": lambda step: FULL_REDRAW[0],
+}
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Summarize durations in seconds as microsecond statistics."""
+    ordered = sorted(samples)
+    return {
+        "mean_us": round(statistics.fmean(ordered) * 1e6, 2),
+        "p50_us": round(ordered[len(ordered) // 2] * 1e6, 2),
+        "p95_us": round(ordered[int(len(ordered) * 0.95)] * 1e6, 2),
+        "max_us": round(ordered[-1] * 1e6, 2),
+    }
+
+
+def make_controller(
+    backend: str, double_buffered: bool, transition: str = "off"
+) -> RGBMatrixController:
+    """Build a controller drawing to a virtual matrix with the given backend.
+
+    Transitions are off unless asked for, since they hold display_trains
+    for their whole duration.
+    """
+    matrix_setup.MATRIX_BACKEND = backend
+    return RGBMatrixController(double_buffered=double_buffered, transition=transition)
+
+
+def bench_render(backend: str, double_buffered: bool, scenario: str, iterations: int) -> Dict[str, Any]:
+    """Time display_trains for one scenario and count matrix calls per frame."""
+    controller = make_controller(backend, double_buffered)
+    trains_for = SCENARIOS[scenario]
+    for step in range(10):
+        controller.display_trains(trains_for(step))
+
+    matrix = controller.matrix
+    frames_before = matrix.frame_count
+    matrix.frames.clear()
+    samples = []
+    for step in range(iterations):
+        trains = trains_for(step)
+        start = time.perf_counter()
+        controller.display_trains(trains)
+        samples.append(time.perf_counter() - start)
+
+    frames = matrix.frame_count - frames_before
+    calls: Counter = matrix.call_totals()
+    recorded = max(len(matrix.frames), 1)
+    per_frame = {name: round(count / recorded, 2) for name, count in sorted(calls.items())}
+
+    # Allocations, measured separately since tracing slows everything down
+    tracemalloc.start()
+    peaks = []
+    blocks_before = sys.getallocatedblocks()
+    for step in range(min(iterations, 100)):
+        trains = trains_for(step)
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        controller.display_trains(trains)
+        peaks.append(tracemalloc.get_traced_memory()[1] - current)
+    retained = sys.getallocatedblocks() - blocks_before
+    tracemalloc.stop()
+
+    return {
+        "backend": backend,
+        "double_buffered": double_buffered,
+        "scenario": scenario,
+        "iterations": iterations,
+        "frames_shown": frames,
+        "time": summarize(samples),
+        "calls_per_frame": per_frame,
+        "alloc_peak_bytes_per_frame": round(statistics.fmean(peaks), 1),
+        "retained_blocks": retained,
+    }
+
+
+def bench_transition(style: str, iterations: int) -> Dict[str, Any]:
+    """Time a transition's composition and frames, and count frames skipped.
+
+    Every step changes the trains on screen, so each display_trains plays
+    a whole transition.
+    """
+    controller = make_controller("numpy", True, transition=style)
+    controller.display_trains(FULL_REDRAW[0])
+    METRICS.timers.pop("transition_compose", None)
+    METRICS.timers.pop("transition_frame", None)
+    shown_before = METRICS.counters.get("transition_frames_shown", 0)
+    skipped_before = METRICS.counters.get("transition_frames_skipped", 0)
+
+    samples = []
+    for step in range(1, iterations + 1):
+        start = time.perf_counter()
+        controller.display_trains(FULL_REDRAW[step % 3])
+        samples.append(time.perf_counter() - start)
+
+    player = controller.transitions
+    shown = METRICS.counters.get("transition_frames_shown", 0) - shown_before
+    skipped = METRICS.counters.get("transition_frames_skipped", 0) - skipped_before
+    return {
+        "style": style,
+        "iterations": iterations,
+        "frames_per_transition": player.count,
+        "duration_us": round(player.count * player.interval * 1e6, 2),
+        "transition": summarize(samples),
+        "compose": summarize(list(METRICS.timers["transition_compose"].values)),
+        "frame": summarize(list(METRICS.timers["transition_frame"].values)),
+        "frames_shown": shown,
+        "frames_skipped": skipped,
+    }
+
+
+async def bench_poll(backend: str, iterations: int) -> Dict[str, Any]:
+    """Measure poll-to-pixels latency against a local fake train API."""
+    controller = make_controller(backend, True)
+    api = FakeTrainApi().start()
+    changed, not_modified = [], []
+    try:
+        async with TrainApiClient(api.url) as client:
+            for step in range(iterations):
+                api.set_trains([train._asdict() for train in minutes_tick(step)])
+                start = time.perf_counter()
+                trains = await client.fetch()
+                controller.display_trains(trains[:2])
+                changed.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                assert await client.fetch() is None
+                not_modified.append(time.perf_counter() - start)
+    finally:
+        api.stop()
+
+    return {
+        "backend": backend,
+        "iterations": iterations,
+        "poll_to_pixels": summarize(changed),
+        "not_modified_poll": summarize(not_modified),
+        "requests": api.requests,
+    }
+
+
+# Run in a fresh interpreter, so imports and font loading are included
+COLD_START = """
+import json
+from startup import STARTUP
+from rgb_matrix_controller import RGBMatrixController
+from train_record import decode_trains
+STARTUP.mark("imports")
+controller = RGBMatrixController()
+STARTUP.mark("matrix")
+controller.display_trains(decode_trains({trains!r}))
+print(json.dumps(STARTUP.phases))
+"""
+
+
+def bench_cold_start(backend: str, runs: int) -> Dict[str, Any]:
+    """Time startup phases up to the first pixel in fresh processes.
+
+    The first run starts with an empty font cache, later runs reuse it.
+    """
+    code = COLD_START.format(trains=json.dumps([train._asdict() for train in FULL_REDRAW[0]]))
+    phases: List[Dict[str, float]] = []
+    with tempfile.TemporaryDirectory() as cache_dir:
+        env = dict(
+            os.environ,
+            MATRIX_BACKEND=backend,
+            MATRIX_CACHE_DIR=cache_dir,
+            PYTHONPATH=os.pathsep.join([BENCH_DIR, PROJECT_ROOT]),
+        )
+        for _ in range(runs + 1):
+            output = subprocess.run(
+                [sys.executable, "-c", code], cwd=PROJECT_ROOT, env=env,
+                capture_output=True, text=True, check=True
+            ).stdout
+            phases.append(json.loads(output.strip().splitlines()[-1]))
+
+    warm = phases[1:]
+    return {
+        "backend": backend,
+        "runs": runs,
+        "cold_cache_ms": {phase: round(t * 1000, 2) for phase, t in phases[0].items()},
+        "warm_cache_median_ms": {
+            phase: round(statistics.median(run[phase] for run in warm) * 1000, 2)
+            for phase in warm[0]
+        } if warm else {},
+    }
+
+
+def git_commit() -> str:
+    """Get the current commit hash, or an empty string outside a checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=PROJECT_ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def main() -> int:
+    """Run every benchmark and write the results as JSON.
+
+    Returns:
+        Exit code
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--poll-iterations", type=int, default=100)
+    parser.add_argument("--transition-iterations", type=int, default=10)
+    parser.add_argument("--startup-runs", type=int, default=5)
+    parser.add_argument("--output", help="Write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    render = [
+        bench_render(backend, double_buffered, scenario, args.iterations)
+        for backend in ("native", "numpy")
+        for double_buffered in (True, False)
+        for scenario in SCENARIOS
+    ]
+    transition = [
+        bench_transition(style, args.transition_iterations) for style in TRANSITIONS
+    ]
+    poll = [
+        asyncio.run(bench_poll(backend, args.poll_iterations))
+        for backend in ("native", "numpy")
+    ]
+    startup = [bench_cold_start(backend, args.startup_runs) for backend in ("native", "numpy")]
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+        },
+        "render": render,
+        "transition": transition,
+        "poll": poll,
+        "startup": startup,
+    }
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as out:
+            out.write(output + "\n")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
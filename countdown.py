@@ -0,0 +1,103 @@
+import re
+import time
+from typing import List, Optional
+
+from train_record import TrainArrival, minutes_status
+
+# Statuses of this form are counted down locally between polls
+MINUTES_STATUS = re.compile(r"^(\d+) mins$")
+# How long a train stays on the display after its estimated arrival
+DEPARTURE_GRACE = 30.0
+# How often the displayed minutes are recomputed
+TICK_INTERVAL = 1.0
+
+
+class Arrival:
+    """One buffered train, anchored to an absolute arrival time when possible."""
+
+    __slots__ = ("train", "arrives_at")
+
+    def __init__(self, train: TrainArrival, arrives_at: Optional[float]):
+        """Initialize the arrival.
+
+        Args:
+            train: Train as received from the API
+            arrives_at: Estimated arrival as a time.time() timestamp, or None
+                for statuses that are shown verbatim ("Delayed", ...)
+        """
+        self.train = train
+        self.arrives_at = arrives_at
+
+
+class Countdown:
+    """Turns polled "N mins" statuses into arrival times and counts them down.
+
+    Every train in the last response is kept, so when the first train
+    departs the next buffered one moves up without waiting for a poll.
+    """
+
+    def __init__(self, departure_grace: float = DEPARTURE_GRACE):
+        """Initialize an empty countdown.
+
+        Args:
+            departure_grace: Seconds a train stays listed after arriving
+        """
+        self.departure_grace = departure_grace
+        self.arrivals: List[Arrival] = []
+        self.updated_at: Optional[float] = None
+
+    def update(self, trains: List[TrainArrival], now: Optional[float] = None) -> None:
+        """Replace the buffered arrivals with a fresh API response.
+
+        The API reports whole minutes, so each arrival is placed in the
+        middle of its minute to keep the local estimate within 30 seconds.
+
+        Args:
+            trains: Trains from the API, soonest first
+            now: Time the response was received (defaults to time.time())
+        """
+        now = time.time() if now is None else now
+        arrivals = []
+        for train in trains:
+            match = MINUTES_STATUS.match(train.status)
+            arrives_at = now + (int(match.group(1)) + 0.5) * 60 if match else None
+            arrivals.append(Arrival(train, arrives_at))
+        self.arrivals = arrivals
+        self.updated_at = now
+
+    def clear(self) -> None:
+        """Drop all buffered arrivals."""
+        self.arrivals = []
+        self.updated_at = None
+
+    def trains(self, now: Optional[float] = None) -> List[TrainArrival]:
+        """Get the trains to display with minutes recomputed for now.
+
+        Departed trains are dropped from the buffer.
+
+        Args:
+            now: Current time (defaults to time.time())
+
+        Returns:
+            Trains with their statuses updated
+        """
+        now = time.time() if now is None else now
+        self.arrivals = [
+            arrival for arrival in self.arrivals
+            if arrival.arrives_at is None
+            or arrival.arrives_at + self.departure_grace >= now
+        ]
+
+        trains = []
+        for arrival in self.arrivals:
+            if arrival.arrives_at is None:
+                trains.append(arrival.train)
+                continue
+            minutes = max(int((arrival.arrives_at - now) // 60), 0)
+            status = minutes_status(minutes)
+            train = arrival.train
+            if train.status != status:
+                # Keep the same object while the minutes stay the same
+                train = arrival.train = train._replace(status=status)
+            trains.append(train)
+        return trains
@@ -0,0 +1,407 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from metrics import METRICS, RollingHistogram
+from train_client import BadResponseError, TrainApiClient
+
+logger = logging.getLogger(__name__)
+
+# Latencies kept per endpoint for its hedge delay
+LATENCY_WINDOW = 64
+# Requests an endpoint must have answered before its own p95 is trusted
+MIN_LATENCY_SAMPLES = 5
+# Hedge delay used until then
+HEDGE_DEFAULT_DELAY = 0.5
+# Never hedge sooner than this, however fast the endpoint usually is
+HEDGE_MIN_DELAY = 0.05
+HEDGE_QUANTILE = 0.95
+# Fraction of fetches that may send a hedged second request, and how many
+# unused hedges can be saved up; keeps request volume near one per fetch
+HEDGE_BUDGET = 0.1
+HEDGE_BURST = 2.0
+# Failures in a row that open an endpoint's circuit
+BREAKER_FAILURES = 3
+# Seconds an open circuit waits before a trial request, doubling while trials fail
+BREAKER_COOLDOWN = 30.0
+BREAKER_MAX_COOLDOWN = 600.0
+# Weight of the newest sample in the latency and error averages
+HEALTH_DECAY = 0.2
+# How much a 100% error rate multiplies an endpoint's expected latency by
+ERROR_PENALTY = 10.0
+# Seconds for an endpoint's error rate to halve, so one that failed in the
+# past wins its place back even if no requests are sent to it
+ERROR_HALF_LIFE = 60.0
+
+# Errors that count against an endpoint; anything else is a bug and propagates
+ENDPOINT_ERRORS = (OSError, httpx.HTTPError, BadResponseError, ValueError)
+
+
+class CircuitBreaker:
+    """Stops requests to an endpoint that keeps failing.
+
+    Closed, requests go through. After `failures` failures in a row it
+    opens and refuses requests for `cooldown` seconds, then lets a trial
+    request through (half-open). A successful trial closes it again; a
+    failed one reopens it for twice as long, up to `max_cooldown`.
+    """
+
+    def __init__(
+        self,
+        failures: int = BREAKER_FAILURES,
+        cooldown: float = BREAKER_COOLDOWN,
+        max_cooldown: float = BREAKER_MAX_COOLDOWN
+    ):
+        """Initialize a closed breaker.
+
+        Args:
+            failures: Failures in a row that open the circuit
+            cooldown: Seconds before the first trial request
+            max_cooldown: Longest wait between trial requests
+        """
+        self.threshold = failures
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+    @property
+    def retry_at(self) -> float:
+        """time.monotonic() at which a trial request is allowed (0 when closed)."""
+        return 0.0 if self.opened_at is None else self.opened_at + self.cooldown
+
+    def state(self, now: Optional[float] = None) -> str:
+        """Get the breaker's state.
+
+        Args:
+            now: time.monotonic() (defaults to now)
+
+        Returns:
+            "closed", "open" or "half-open"
+        """
+        if self.opened_at is None:
+            return "closed"
+        now = time.monotonic() if now is None else now
+        return "open" if now < self.retry_at else "half-open"
+
+    def allow(self, now: Optional[float] = None) -> bool:
+        """Check whether a request may be sent.
+
+        Args:
+            now: time.monotonic() (defaults to now)
+
+        Returns:
+            False while the circuit is open
+        """
+        return self.state(now) != "open"
+
+    def on_success(self) -> bool:
+        """Record a successful request.
+
+        Returns:
+            True if this closed an open circuit
+        """
+        was_open = self.opened_at is not None
+        self.failures = 0
+        self.opened_at = None
+        self.cooldown = self.base_cooldown
+        return was_open
+
+    def on_failure(self, now: Optional[float] = None) -> bool:
+        """Record a failed request.
+
+        Args:
+            now: time.monotonic() (defaults to now)
+
+        Returns:
+            True if this opened (or reopened) the circuit
+        """
+        now = time.monotonic() if now is None else now
+        self.failures += 1
+        if self.opened_at is not None:
+            # A failed trial
+            self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+            self.opened_at = now
+            return True
+        if self.failures >= self.threshold:
+            self.opened_at = now
+            return True
+        return False
+
+
+class Endpoint:
+    """One train API URL, with its own client, breaker and health record."""
+
+    def __init__(self, index: int, url: str, client: TrainApiClient):
+        """Initialize the endpoint.
+
+        Args:
+            index: Position in the configured list, used in metric names
+            url: The API URL
+            client: Client that fetches from it
+        """
+        self.index = index
+        self.url = url
+        self.client = client
+        self.breaker = CircuitBreaker()
+        self.latencies = RollingHistogram(LATENCY_WINDOW)
+        # Moving averages of latency in seconds and of the error rate (0-1)
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.errors_at = 0.0
+
+    def _average_latency(self, seconds: float) -> None:
+        self.latencies.observe(seconds)
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency += HEALTH_DECAY * (seconds - self.latency)
+
+    def _average_errors(self, failed: bool) -> None:
+        now = time.monotonic()
+        errors = self.recent_errors(now)
+        self.error_rate = errors + HEALTH_DECAY * (float(failed) - errors)
+        self.errors_at = now
+
+    def recent_errors(self, now: Optional[float] = None) -> float:
+        """Get the error rate, decayed for the time since it was last updated.
+
+        Args:
+            now: time.monotonic() (defaults to now)
+
+        Returns:
+            Fraction of recent requests that failed
+        """
+        now = time.monotonic() if now is None else now
+        return self.error_rate * 0.5 ** ((now - self.errors_at) / ERROR_HALF_LIFE)
+
+    def score(self, now: Optional[float] = None) -> float:
+        """Expected cost of a request here, lower is better.
+
+        Endpoints not tried yet are assumed to answer in the default
+        hedge delay.
+
+        Args:
+            now: time.monotonic() (defaults to now)
+        """
+        latency = HEDGE_DEFAULT_DELAY if self.latency is None else self.latency
+        return latency * (1.0 + ERROR_PENALTY * self.recent_errors(now))
+
+    def hedge_delay(self, timeout: float) -> float:
+        """Seconds to wait for this endpoint before hedging.
+
+        Args:
+            timeout: The request timeout, which caps the delay
+
+        Returns:
+            The p95 of its recent latencies, once there are enough of them
+        """
+        if self.latencies.count < MIN_LATENCY_SAMPLES:
+            delay = HEDGE_DEFAULT_DELAY
+        else:
+            delay = self.latencies.quantile(HEDGE_QUANTILE)
+        return min(max(delay, HEDGE_MIN_DELAY), timeout)
+
+    def on_success(self, seconds: float) -> None:
+        """Record an answered request.
+
+        Args:
+            seconds: How long it took
+        """
+        self._average_latency(seconds)
+        self._average_errors(False)
+        if self.breaker.on_success():
+            logger.info("Endpoint %s recovered", self.url)
+            METRICS.inc("circuit_closes")
+        METRICS.set(f"endpoint{self.index}_open", 0)
+
+    def on_failure(self, error: Exception) -> None:
+        """Record a failed request.
+
+        Args:
+            error: What went wrong
+        """
+        self._average_errors(True)
+        METRICS.inc("endpoint_failures")
+        if self.breaker.on_failure():
+            logger.warning(
+                "Endpoint %s failed %d times (%s); not using it for %.0fs",
+                self.url, self.breaker.failures, error, self.breaker.cooldown
+            )
+            METRICS.inc("circuit_opens")
+            METRICS.set(f"endpoint{self.index}_open", 1)
+
+    def on_abandoned(self, seconds: float) -> None:
+        """Record a request cancelled because another endpoint answered first.
+
+        Its latency is at least `seconds`, which is recorded as a sample so
+        a slow endpoint loses its place even though it never failed.
+
+        Args:
+            seconds: How long it had been waiting
+        """
+        self._average_latency(seconds)
+
+
+class EndpointPool:
+    """Fetches the train list from whichever of several API endpoints is healthiest.
+
+    Every fetch goes to the endpoint with the lowest expected latency (a
+    moving average, inflated by its recent error rate) whose circuit is
+    not open, or to one due a trial request. If it has not answered
+    within its own p95 latency, one hedged request goes to the next best
+    endpoint and the first answer wins; hedges are limited to HEDGE_BUDGET
+    of fetches, so the request volume stays close to one per fetch. A
+    request that fails is replaced by one to the next endpoint straight
+    away.
+
+    Each endpoint keeps its own client, so conditional GETs still apply.
+    Before asking an endpoint other than the one the shown trains came
+    from, its validators are dropped: a 304 from it would only say that
+    nothing changed since its own last answer.
+    """
+
+    def __init__(self, urls: List[str], timeout: float = 5.0, **client_options: Any):
+        """Initialize the pool.
+
+        Args:
+            urls: The API URLs, best guess first
+            timeout: Request timeout in seconds, per endpoint
+            **client_options: Passed on to each TrainApiClient
+        """
+        if not urls:
+            raise ValueError("At least one API URL is needed")
+        self.timeout = timeout
+        self.endpoints = [
+            Endpoint(index, url, TrainApiClient(url, timeout=timeout, **client_options))
+            for index, url in enumerate(urls)
+        ]
+        self._source: Optional[Endpoint] = None
+        self._hedge_tokens = HEDGE_BURST
+
+    async def __aenter__(self) -> "EndpointPool":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Close every endpoint's connection."""
+        for endpoint in self.endpoints:
+            await endpoint.client.aclose()
+
+    def reset(self) -> None:
+        """Forget cached addresses and validators so the next fetch starts fresh."""
+        for endpoint in self.endpoints:
+            endpoint.client.reset()
+        self._source = None
+
+    def candidates(self, now: Optional[float] = None) -> List[Endpoint]:
+        """Order the endpoints to try, best first.
+
+        Args:
+            now: time.monotonic() (defaults to now)
+
+        Returns:
+            Endpoints whose circuit allows a request: those due a trial
+            request first, so it is actually sent, then the rest by score.
+            If every circuit is open, the one that may be retried soonest.
+        """
+        now = time.monotonic() if now is None else now
+        allowed = [endpoint for endpoint in self.endpoints if endpoint.breaker.allow(now)]
+        if not allowed:
+            return [min(self.endpoints, key=lambda endpoint: endpoint.breaker.retry_at)]
+        # sorted() is stable, so ties keep the configured order
+        return sorted(
+            allowed,
+            key=lambda endpoint: (endpoint.breaker.state(now) != "half-open", endpoint.score(now))
+        )
+
+    async def _attempt(self, endpoint: Endpoint) -> Optional[Any]:
+        """Fetch from one endpoint and record how it went."""
+        if endpoint is not self._source:
+            endpoint.client.clear_validators()
+        started = time.monotonic()
+        try:
+            trains = await endpoint.client.fetch()
+        except asyncio.CancelledError:
+            endpoint.on_abandoned(time.monotonic() - started)
+            raise
+        except ENDPOINT_ERRORS as e:
+            endpoint.on_failure(e)
+            raise
+        endpoint.on_success(time.monotonic() - started)
+        return trains
+
+    async def fetch(self) -> Optional[Any]:
+        """Fetch the current train list from the best endpoint, hedging if it is slow.
+
+        Returns:
+            The decoded trains, or None if they have not changed since the
+            last successful fetch
+
+        Raises:
+            BadResponseError: If every endpoint tried answered with an error
+                and the last one did so with a bad status
+            httpx.HTTPError: On network errors from the last endpoint tried
+            ValueError: If the last endpoint's body could not be decoded
+        """
+        self._hedge_tokens = min(self._hedge_tokens + HEDGE_BUDGET, HEDGE_BURST)
+        remaining = iter(self.candidates())
+        pending: Dict["asyncio.Task[Optional[Any]]", Endpoint] = {}
+        hedged = False
+        # Requests kept in flight: the first one, plus the hedge once sent
+        in_flight = 1
+        errors: List[Exception] = []
+
+        def launch() -> bool:
+            endpoint = next(remaining, None)
+            if endpoint is None:
+                return False
+            pending[asyncio.ensure_future(self._attempt(endpoint))] = endpoint
+            return True
+
+        launch()
+        first = next(iter(pending.values()))
+        try:
+            while True:
+                delay = None
+                if not hedged and len(pending) == 1:
+                    delay = next(iter(pending.values())).hedge_delay(self.timeout)
+                done, _ = await asyncio.wait(
+                    pending, timeout=delay, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    hedged = True
+                    if self._hedge_tokens >= 1 and launch():
+                        self._hedge_tokens -= 1
+                        in_flight = 2
+                        METRICS.inc("hedged_requests")
+                    continue
+                for task in done:
+                    endpoint = pending.pop(task)
+                    try:
+                        trains = task.result()
+                    except ENDPOINT_ERRORS as e:
+                        errors.append(e)
+                        continue
+                    if trains is not None:
+                        self._source = endpoint
+                    if endpoint is not first:
+                        METRICS.inc("hedge_wins" if hedged else "failover_wins")
+                    return trains
+                # Replace failed requests with the next endpoints
+                while len(pending) < in_flight and launch():
+                    METRICS.inc("failovers")
+                if not pending:
+                    # Every endpoint tried failed; the last failure is reported
+                    raise errors[-1]
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
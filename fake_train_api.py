@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the train API, for development and benchmarks.
+Usage: python fake_train_api.py [--port 4599] [--change-every SECONDS]
+                                [--delay SECONDS] [--slow-rate FRACTION --slow-delay SECONDS]
+                                [--fail-rate FRACTION]
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_TRAINS: List[Dict[str, Any]] = [
+    {"line": "F", "status": "3 mins", "express": False},
+    {"line": "G", "status": "7 mins", "express": False},
+    {"line": "F", "status": "12 mins", "express": True},
+]
+# Seconds between keepalive comments on an event stream
+KEEPALIVE_INTERVAL = 15.0
+# Minutes a train that has arrived comes back with in count_down()
+COUNT_DOWN_WRAP = 20
+
+
+class FakeTrainApi:
+    """Serves a train list over HTTP/1.1 with keep-alive and ETag support.
+
+    GET <url>/events subscribes to the list as Server-Sent Events: the
+    list is sent on connect (unless Last-Event-ID says the client has it)
+    and again whenever it changes, with its ETag as the event ID.
+    """
+
+    def __init__(
+        self,
+        trains: Optional[List[Dict[str, Any]]] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        keepalive: float = KEEPALIVE_INTERVAL,
+        delay: float = 0.0,
+        slow_rate: float = 0.0,
+        slow_delay: float = 0.0,
+        fail_rate: float = 0.0
+    ):
+        """Initialize the server (call start() to serve).
+
+        Args:
+            trains: Train list to serve (defaults to DEFAULT_TRAINS)
+            host: Interface to bind
+            port: Port to bind, 0 for any free port
+            keepalive: Seconds between keepalive comments on event streams
+            delay: Seconds every train list request waits before answering
+            slow_rate: Fraction of requests that wait slow_delay more on top
+            slow_delay: Extra seconds a slow request waits
+            fail_rate: Fraction of requests answered with 503
+        """
+        self.requests = 0
+        self.not_modified = 0
+        self.events_sent = 0
+        # Last-Event-ID of every event stream subscription, in order
+        self.subscriptions: List[Optional[str]] = []
+        self.keepalive = keepalive
+        # Faults injected into train list requests; can be changed while serving
+        self.delay = delay
+        self.slow_rate = slow_rate
+        self.slow_delay = slow_delay
+        self.fail_rate = fail_rate
+        self.failed = 0
+        self._trains: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self.stopping = False
+        self._body = b""
+        self._etag = ""
+        self._last_modified = ""
+        self.set_trains(DEFAULT_TRAINS if trains is None else trains)
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL of the running server."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/trains/fg-northbound-next"
+
+    def set_trains(self, trains: List[Dict[str, Any]]) -> None:
+        """Replace the served train list.
+
+        Args:
+            trains: New train list
+        """
+        body = json.dumps(trains).encode("utf-8")
+        with self._lock:
+            self._trains = [dict(train) for train in trains]
+            self._body = body
+            self._etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+            self._last_modified = formatdate(usegmt=True)
+            self._changed.notify_all()
+
+    def count_down(self) -> None:
+        """Take a minute off every "N mins" status; arrived trains start over."""
+        with self._lock:
+            trains = [dict(train) for train in self._trains]
+        for train in trains:
+            match = re.match(r"^(\d+) mins$", train.get("status") or "")
+            if match:
+                minutes = int(match.group(1)) - 1
+                train["status"] = f"{minutes if minutes > 0 else COUNT_DOWN_WRAP} mins"
+        self.set_trains(trains)
+
+    def next_event(self, last_id: Optional[str]) -> Optional[Tuple[bytes, str]]:
+        """Wait up to one keepalive interval for a train list newer than last_id.
+
+        Args:
+            last_id: ETag of the list the subscriber has
+
+        Returns:
+            Tuple of (body, etag), or None if nothing changed in time
+        """
+        with self._changed:
+            if self._etag == last_id and not self.stopping:
+                self._changed.wait(self.keepalive)
+            if self._etag == last_id or self.stopping:
+                return None
+            return self._body, self._etag
+
+    def current(self) -> Tuple[bytes, str, str]:
+        """Count a request and get the response to serve.
+
+        Returns:
+            Tuple of (body, etag, last_modified)
+        """
+        with self._lock:
+            self.requests += 1
+            return self._body, self._etag, self._last_modified
+
+    def inject_faults(self) -> bool:
+        """Delay the current request as configured and decide whether it fails.
+
+        Returns:
+            True if the request should be answered with an error
+        """
+        delay = self.delay
+        if self.slow_rate and random.random() < self.slow_rate:
+            delay += self.slow_delay
+        if delay > 0:
+            time.sleep(delay)
+        if self.fail_rate and random.random() < self.fail_rate:
+            with self._lock:
+                self.failed += 1
+            return True
+        return False
+
+    def start(self) -> "FakeTrainApi":
+        """Serve from a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """Serve from the calling thread until interrupted."""
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def stop(self) -> None:
+        """Stop serving and close the socket."""
+        with self._changed:
+            self.stopping = True
+            self._changed.notify_all()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _make_handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """Answers every GET with the current train list."""
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; don't let Nagle hold the body
+            disable_nagle_algorithm = True
+
+            def do_GET(self):  # pylint: disable=invalid-name
+                if self.path.rstrip("/").endswith("/events"):
+                    self.stream_events()
+                    return
+                body, etag, last_modified = api.current()
+                if api.inject_faults():
+                    self.send_response(503)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                if self.headers.get("If-None-Match") == etag:
+                    api.not_modified += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", last_modified)
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # The client gave up, e.g. a hedged request that lost
+
+            def stream_events(self):
+                """Push the train list as Server-Sent Events until the client goes away."""
+                self.close_connection = True
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                last_id = self.headers.get("Last-Event-ID")
+                api.subscriptions.append(last_id)
+                try:
+                    self.wfile.write(b"retry: 3000\n\n")
+                    self.wfile.flush()
+                    while not api.stopping:
+                        event = api.next_event(last_id)
+                        if event is None:
+                            self.wfile.write(b": keepalive\n\n")
+                        else:
+                            body, last_id = event
+                            api.events_sent += 1
+                            self.wfile.write(f"id: {last_id}\ndata: ".encode("utf-8") + body + b"\n\n")
+                        self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+                pass
+
+        return Handler
+
+
+def main() -> None:
+    """Serve the default train list until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4599)
+    parser.add_argument("--keepalive", type=float, default=KEEPALIVE_INTERVAL,
+                        help="Seconds between keepalive comments on event streams")
+    parser.add_argument("--change-every", type=float, default=0,
+                        help="Count the trains down a minute every this many seconds")
+    parser.add_argument("--delay", type=float, default=0,
+                        help="Seconds to wait before answering every train list request")
+    parser.add_argument("--slow-rate", type=float, default=0,
+                        help="Fraction of requests that also wait --slow-delay seconds")
+    parser.add_argument("--slow-delay", type=float, default=0,
+                        help="Extra seconds a slow request waits")
+    parser.add_argument("--fail-rate", type=float, default=0,
+                        help="Fraction of requests answered with 503 Service Unavailable")
+    args = parser.parse_args()
+
+    api = FakeTrainApi(
+        host=args.host, port=args.port, keepalive=args.keepalive, delay=args.delay,
+        slow_rate=args.slow_rate, slow_delay=args.slow_delay, fail_rate=args.fail_rate
+    )
+    print(f"Serving fake train API at {api.url} (events at {api.url}/events)")
+    if args.change_every > 0:
+        def count_down_forever():
+            while True:
+                time.sleep(args.change_every)
+                api.count_down()
+        threading.Thread(target=count_down_forever, daemon=True).start()
+    try:
+        api.serve_forever()
+    except KeyboardInterrupt:
+        print("Exiting...")
+
+
+if __name__ == "__main__":
+    main()
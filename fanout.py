@@ -0,0 +1,344 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import socket
+import struct
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from metrics import METRICS
+from pipeline import FetchResult, LatestValue
+from state_store import StateStore
+from train_record import TrainArrival, trains_from_objects
+
+logger = logging.getLogger(__name__)
+
+# Multicast group and port the hub broadcasts train state on
+FANOUT_GROUP = os.environ.get("FANOUT_GROUP", "239.255.42.99")
+FANOUT_PORT = int(os.environ.get("FANOUT_PORT", "4598"))
+# Address of the network interface to use (127.0.0.1 keeps everything on loopback)
+FANOUT_INTERFACE = os.environ.get("FANOUT_INTERFACE", "0.0.0.0")
+# Seconds between broadcasts when nothing changes; every packet carries the
+# full state, so a lost packet is repaired by the next one
+FANOUT_HEARTBEAT = float(os.environ.get("FANOUT_HEARTBEAT", "5"))
+# Multicast hops; 1 keeps packets on the local network
+FANOUT_TTL = 1
+# Bump whenever the packet layout changes
+FANOUT_VERSION = 1
+# Heartbeats a subscriber without any data waits before showing an error
+MISSED_HEARTBEATS = 3
+
+
+class FanoutState(NamedTuple):
+    """The train state as broadcast by the hub.
+
+    Times are sent as ages rather than timestamps, so the signs' clocks do
+    not need to agree.
+    """
+    hub: int
+    seq: int
+    data_version: int
+    trains: Optional[List[TrainArrival]]
+    age: Optional[float]
+    fresh_age: Optional[float]
+    error: Optional[str]
+
+
+def encode_state(state: FanoutState) -> bytes:
+    """Encode a state as one datagram.
+
+    Args:
+        state: State to send
+
+    Returns:
+        The packet
+    """
+    return json.dumps({
+        "v": FANOUT_VERSION,
+        "hub": state.hub,
+        "seq": state.seq,
+        "data": state.data_version,
+        "trains": None if state.trains is None else [list(train) for train in state.trains],
+        "age": state.age,
+        "fresh_age": state.fresh_age,
+        "error": state.error,
+    }, separators=(",", ":")).encode("utf-8")
+
+
+def _seconds(packet: Dict[str, Any], key: str, required: bool) -> Optional[float]:
+    """Get an age from a packet, checking that it is a number of seconds."""
+    value = packet[key]
+    if value is None and not required:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise ValueError(f"Malformed packet: {key} is {value!r}, not a number of seconds")
+    return value
+
+
+def decode_state(payload: bytes) -> FanoutState:
+    """Decode and validate a datagram from the hub.
+
+    Args:
+        payload: The packet
+
+    Returns:
+        The state
+
+    Raises:
+        ValueError: If the packet is malformed or from another protocol version
+    """
+    try:
+        packet = json.loads(payload)
+        if packet.get("v") != FANOUT_VERSION:
+            raise ValueError(f"Unsupported packet version {packet.get('v')}")
+        trains = packet["trains"]
+        if trains is not None:
+            trains = trains_from_objects([
+                {"line": line, "status": status, "express": express}
+                for line, status, express in trains
+            ])
+        # The age of the trains is needed to date them whenever there are any
+        age = _seconds(packet, "age", required=trains is not None)
+        fresh_age = _seconds(packet, "fresh_age", required=False)
+        error = packet["error"]
+        if error is not None and not isinstance(error, str):
+            raise ValueError(f"Malformed packet: error is {error!r}, not a string")
+        return FanoutState(
+            int(packet["hub"]), int(packet["seq"]), int(packet["data"]), trains,
+            age, fresh_age, error
+        )
+    except (KeyError, TypeError, AttributeError) as e:
+        raise ValueError(f"Malformed packet: {e}") from e
+
+
+class FanoutPublisher:
+    """Broadcasts the hub's train state to subscribers over UDP multicast."""
+
+    def __init__(
+        self,
+        group: str = FANOUT_GROUP,
+        port: int = FANOUT_PORT,
+        interface: str = FANOUT_INTERFACE
+    ):
+        """Initialize the publisher.
+
+        Args:
+            group: Multicast group address
+            port: UDP port
+            interface: Address of the interface to send from
+        """
+        self.address = (group, port)
+        # Lets subscribers tell a restarted hub from a replayed packet
+        self.hub = random.getrandbits(31)
+        self.seq = 0
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, FANOUT_TTL)
+        self.sock.setsockopt(
+            socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(interface)
+        )
+        self.sock.setblocking(False)
+
+    def send(
+        self,
+        trains: Optional[List[TrainArrival]],
+        received_at: Optional[float],
+        fresh_at: Optional[float],
+        error: Optional[str],
+        data_version: int,
+        now: Optional[float] = None
+    ) -> None:
+        """Broadcast the current state.
+
+        Args:
+            trains: Last good train list, if any
+            received_at: When it was received
+            fresh_at: Last time the API answered successfully
+            error: Latest error, if the last poll failed
+            data_version: Number of train lists received so far
+            now: Current time (defaults to time.time())
+        """
+        now = time.time() if now is None else now
+        self.seq += 1
+        state = FanoutState(
+            self.hub, self.seq, data_version, trains,
+            None if received_at is None else now - received_at,
+            None if fresh_at is None else now - fresh_at,
+            error
+        )
+        try:
+            self.sock.sendto(encode_state(state), self.address)
+            METRICS.inc("fanout_sent")
+        except OSError as e:
+            logger.warning("Fanout send failed: %s", e)
+            METRICS.inc("fanout_send_errors")
+
+    def close(self) -> None:
+        """Close the socket."""
+        self.sock.close()
+
+
+class FanoutSubscriber(asyncio.DatagramProtocol):
+    """Receives the hub's train state and drops duplicates and stale packets.
+
+    Packets are numbered per hub. A gap in the numbers only means some
+    packets were lost; since every packet carries the full state it is
+    counted and otherwise ignored.
+    """
+
+    def __init__(
+        self,
+        group: str = FANOUT_GROUP,
+        port: int = FANOUT_PORT,
+        interface: str = FANOUT_INTERFACE
+    ):
+        """Initialize the subscriber; nothing is received until open().
+
+        Args:
+            group: Multicast group address
+            port: UDP port
+            interface: Address of the interface to join the group on
+        """
+        self.group = group
+        self.port = port
+        self.interface = interface
+        self.hub: Optional[int] = None
+        self.seq = 0
+        self.data_version: Optional[int] = None
+        self.packets: "asyncio.Queue[bytes]" = asyncio.Queue()
+        self.transport: Optional[asyncio.DatagramTransport] = None
+
+    async def open(self) -> None:
+        """Join the multicast group and start receiving."""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        # Several signs on one host can all listen on the port
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(("", self.port))
+        sock.setsockopt(
+            socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP,
+            struct.pack("4s4s", socket.inet_aton(self.group), socket.inet_aton(self.interface))
+        )
+        sock.setblocking(False)
+        self.transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+            lambda: self, sock=sock
+        )
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        self.packets.put_nowait(data)
+
+    def accept(self, state: FanoutState) -> bool:
+        """Check a packet's sequence number.
+
+        Args:
+            state: The decoded packet
+
+        Returns:
+            True if the packet is newer than everything seen from its hub
+        """
+        if state.hub != self.hub:
+            logger.info("Following hub %08x", state.hub)
+            self.hub = state.hub
+            self.data_version = None
+        elif state.seq <= self.seq:
+            METRICS.inc("fanout_out_of_order")
+            return False
+        elif state.seq > self.seq + 1:
+            METRICS.inc("fanout_lost", state.seq - self.seq - 1)
+        self.seq = state.seq
+        return True
+
+    def close(self) -> None:
+        """Leave the group."""
+        if self.transport is not None:
+            self.transport.close()
+
+
+async def broadcast_loop(
+    publisher: FanoutPublisher,
+    slot: LatestValue,
+    heartbeat: float = FANOUT_HEARTBEAT
+) -> None:
+    """Broadcast the slot's state whenever it changes, and at least every heartbeat.
+
+    Args:
+        publisher: Where to broadcast
+        slot: Slot the fetcher publishes into
+        heartbeat: Longest time between broadcasts
+    """
+    seen_version = 0
+    last_good: Optional[FetchResult] = None
+    data_version = 0
+    error: Optional[str] = None
+    while True:
+        await slot.wait(seen_version, heartbeat)
+        if slot.version != seen_version:
+            seen_version = slot.version
+            result = slot.value
+            if result.error is None:
+                last_good = result
+                data_version += 1
+                error = None
+            else:
+                error = result.error
+        publisher.send(
+            None if last_good is None else last_good.trains,
+            None if last_good is None else last_good.received_at,
+            slot.fresh_at, error, data_version
+        )
+
+
+async def subscribe_loop(
+    subscriber: FanoutSubscriber,
+    slot: LatestValue,
+    store: Optional[StateStore] = None,
+    heartbeat: float = FANOUT_HEARTBEAT
+) -> None:
+    """Publish the state received from the hub into the slot, in place of polling.
+
+    Args:
+        subscriber: Where the hub's packets arrive
+        slot: Slot the renderer reads from
+        store: Where each new train list is persisted, if anywhere
+        heartbeat: The hub's heartbeat interval
+    """
+    await subscriber.open()
+    try:
+        while True:
+            try:
+                payload = await asyncio.wait_for(
+                    subscriber.packets.get(), heartbeat * MISSED_HEARTBEATS
+                )
+            except asyncio.TimeoutError:
+                logger.warning("Nothing from the hub for %.0fs", heartbeat * MISSED_HEARTBEATS)
+                METRICS.inc("fanout_timeouts")
+                if slot.value is None:
+                    slot.publish(FetchResult(None, "No hub", time.time()))
+                continue
+
+            now = time.time()
+            try:
+                state = decode_state(payload)
+            except ValueError as e:
+                logger.warning("Bad fanout packet: %s", e)
+                METRICS.inc("fanout_bad_packets")
+                continue
+            if not subscriber.accept(state):
+                continue
+            METRICS.inc("fanout_received")
+
+            if state.trains is not None and state.data_version != subscriber.data_version:
+                subscriber.data_version = state.data_version
+                received_at = now - state.age
+                slot.publish(FetchResult(state.trains, None, received_at))
+                if store is not None:
+                    await asyncio.get_running_loop().run_in_executor(
+                        None, store.save, state.trains, received_at
+                    )
+            elif state.trains is None and state.error is not None:
+                slot.publish(FetchResult(None, state.error, now))
+            if state.fresh_age is not None:
+                slot.mark_fresh(now - state.fresh_age)
+    finally:
+        subscriber.close()
@@ -0,0 +1,156 @@
+from typing import Any, Iterable, Tuple
+
+import numpy as np
+
+from bdf_font import BdfFont
+
+
+class FrameBuffer:
+    """A whole frame composed in an RGB NumPy array.
+
+    Implements the canvas surface the renderers draw on (SetPixel, Clear,
+    Fill), so a frame can be built entirely in Python memory and then sent
+    to the matrix with a single SetImage call.
+    """
+
+    def __init__(self, width: int, height: int):
+        """Initialize a blank frame.
+
+        Args:
+            width: Frame width in pixels
+            height: Frame height in pixels
+        """
+        self.width = width
+        self.height = height
+        self.pixels = np.zeros((height, width, 3), dtype=np.uint8)
+
+    def SetPixel(self, x: int, y: int, r: int, g: int, b: int) -> None:  # pylint: disable=invalid-name
+        """Set one pixel, ignoring coordinates outside the frame."""
+        if 0 <= x < self.width and 0 <= y < self.height:
+            self.pixels[y, x] = (r, g, b)
+
+    def Clear(self) -> None:  # pylint: disable=invalid-name
+        """Set every pixel to black."""
+        self.pixels.fill(0)
+
+    def Fill(self, r: int, g: int, b: int) -> None:  # pylint: disable=invalid-name
+        """Set every pixel to one color."""
+        self.pixels[:, :] = (r, g, b)
+
+    def SetImage(self, image: Any, offset_x: int = 0, offset_y: int = 0, unsafe: bool = True) -> None:  # pylint: disable=invalid-name,unused-argument
+        """Paste a PIL image or (height, width, 3) array, clipped to the frame.
+
+        Args:
+            image: RGB PIL image or uint8 array
+            offset_x: Column of the image's left edge
+            offset_y: Row of the image's top edge
+            unsafe: Accepted for rgbmatrix compatibility
+        """
+        if not isinstance(image, np.ndarray):
+            image = np.asarray(image.convert("RGB"))
+        height, width = image.shape[:2]
+        left, top = max(offset_x, 0), max(offset_y, 0)
+        right = min(offset_x + width, self.width)
+        bottom = min(offset_y + height, self.height)
+        if left < right and top < bottom:
+            self.pixels[top:bottom, left:right] = image[
+                top - offset_y:bottom - offset_y, left - offset_x:right - offset_x
+            ]
+
+    def fill_rect(self, x0: int, y0: int, x1: int, y1: int, rgb: Tuple[int, int, int]) -> None:
+        """Fill a rectangle, corners inclusive and clipped to the frame.
+
+        Args:
+            x0: Left column
+            y0: Top row
+            x1: Right column
+            y1: Bottom row
+            rgb: Fill color
+        """
+        x0, x1 = max(min(x0, x1), 0), min(max(x0, x1), self.width - 1)
+        y0, y1 = max(min(y0, y1), 0), min(max(y0, y1), self.height - 1)
+        if x0 <= x1 and y0 <= y1:
+            self.pixels[y0:y1 + 1, x0:x1 + 1] = rgb
+
+    def fill_spans(
+        self, spans: Iterable[Tuple[int, int, int]], x: int, y: int, rgb: Tuple[int, int, int]
+    ) -> None:
+        """Fill horizontal (dy, dx_start, dx_end) spans relative to (x, y).
+
+        Args:
+            spans: Spans as stored in a sprites.Sprite
+            x: X-coordinate of the sprite anchor
+            y: Y-coordinate of the sprite anchor
+            rgb: Fill color
+        """
+        pixels = self.pixels
+        width = self.width
+        for dy, x0, x1 in spans:
+            row = y + dy
+            if 0 <= row < self.height:
+                start = max(x + x0, 0)
+                end = min(x + x1 + 1, width)
+                if start < end:
+                    pixels[row, start:end] = rgb
+
+    def blit_mask(self, mask: np.ndarray, x: int, y: int, rgb: Tuple[int, int, int]) -> None:
+        """Paint the True pixels of a boolean mask with its top-left at (x, y).
+
+        Args:
+            mask: (height, width) boolean array
+            x: Left column
+            y: Top row
+            rgb: Paint color
+        """
+        mask_height, mask_width = mask.shape
+        left, top = max(x, 0), max(y, 0)
+        right = min(x + mask_width, self.width)
+        bottom = min(y + mask_height, self.height)
+        if left >= right or top >= bottom:
+            return
+        clipped = mask[top - y:bottom - y, left - x:right - x]
+        self.pixels[top:bottom, left:right][clipped] = rgb
+
+    def draw_text(self, font: BdfFont, x: int, y: int, rgb: Tuple[int, int, int], text: str) -> int:
+        """Draw text with its baseline at y, like rgbmatrix's DrawText.
+
+        Args:
+            font: Font to draw with
+            x: Starting x-coordinate
+            y: Y-coordinate of the baseline
+            rgb: Text color
+            text: Text to draw
+
+        Returns:
+            The total advance in pixels
+        """
+        start_x = x
+        for char in text:
+            glyph = font.glyph(ord(char))
+            if glyph is None:
+                continue
+            if glyph.height:
+                self.blit_mask(glyph.bitmap, x, y - glyph.height - glyph.y_offset, rgb)
+            x += glyph.device_width
+        return x - start_x
+
+    def to_image(self) -> Any:
+        """Convert the frame to a PIL image for SetImage.
+
+        Returns:
+            An RGB PIL.Image sharing no memory with the frame
+        """
+        from PIL import Image  # pylint: disable=import-outside-toplevel
+        return Image.frombuffer(
+            "RGB", (self.width, self.height), self.pixels.tobytes(), "raw", "RGB", 0, 1
+        )
+
+    def push(self, canvas: Any) -> None:
+        """Upload the whole frame to a matrix or frame canvas in one call.
+
+        Args:
+            canvas: The rgbmatrix matrix or frame canvas
+        """
+        # In-memory canvases take the array as is; the hardware wants a PIL image
+        image = self.pixels if isinstance(canvas, FrameBuffer) else self.to_image()
+        canvas.SetImage(image, 0, 0)
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Built-in GTFS-realtime feed engine: reads the MTA subway feeds directly
+instead of going through the train API.
+Usage: python gtfs_feed.py show FEED [FEED ...]   (URLs or recorded files)
+       python gtfs_feed.py record DIRECTORY      (save the live feeds as fixtures)
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import Any, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import httpx
+
+from train_client import TrainApiClient
+from train_record import TrainArrival, minutes_status
+
+# MTA subway feeds that carry the F and the G
+DEFAULT_FEED_URLS = (
+    "https://api-endpoint.mta.info/Dataservice/mtagtfsfeeds/nyct%2Fgtfs-bdfm",
+    "https://api-endpoint.mta.info/Dataservice/mtagtfsfeeds/nyct%2Fgtfs-g",
+)
+# Feed URLs or recorded feed files, comma separated
+GTFS_FEED_URLS = [
+    source.strip()
+    for source in os.environ.get("GTFS_FEED_URLS", ",".join(DEFAULT_FEED_URLS)).split(",")
+    if source.strip()
+]
+# Parent stop (7 Av on the F/G) and direction suffix; MTA stop ids combine them ("F24N")
+GTFS_STOP_ID = os.environ.get("GTFS_STOP_ID", "F24")
+GTFS_DIRECTION = os.environ.get("GTFS_DIRECTION", "N")
+# Sent as x-api-key if set
+GTFS_API_KEY = os.environ.get("GTFS_API_KEY")
+# Express variants of a route have this suffix on their route id ("FX")
+EXPRESS_SUFFIX = "X"
+
+# Protobuf wire types
+VARINT, FIXED64, LENGTH_DELIMITED, FIXED32 = 0, 1, 2, 5
+
+# Field numbers from gtfs-realtime.proto
+FEED_HEADER, FEED_ENTITY = 1, 2
+HEADER_TIMESTAMP = 3
+ENTITY_TRIP_UPDATE = 3
+TRIP_UPDATE_TRIP, TRIP_UPDATE_STOP_TIME_UPDATE = 1, 2
+TRIP_TRIP_ID, TRIP_ROUTE_ID = 1, 5
+STOP_TIME_ARRIVAL, STOP_TIME_DEPARTURE, STOP_TIME_STOP_ID = 2, 3, 4
+EVENT_TIME = 2
+
+
+class GtfsDecodeError(ValueError):
+    """The data is not a valid GTFS-realtime protobuf message."""
+
+
+class FeedArrival(NamedTuple):
+    """One trip's arrival at the configured stop."""
+    arrives_at: int
+    route_id: str
+    trip_id: str
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    """Decode a varint, returning (value, position after it)."""
+    result = shift = 0
+    while True:
+        if pos >= len(data):
+            raise GtfsDecodeError("Truncated varint")
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+        if shift > 63:
+            raise GtfsDecodeError("Varint too long")
+
+
+def _iter_fields(data: bytes, start: int, end: int) -> Iterator[Tuple[int, Any]]:
+    """Walk the fields of a message without copying it.
+
+    Yields:
+        (field number, value) pairs; varints are ints, length-delimited
+        fields are (start, end) offsets into data, fixed-width fields are
+        skipped
+    """
+    pos = start
+    while pos < end:
+        key, pos = _read_varint(data, pos)
+        field, wire_type = key >> 3, key & 7
+        if wire_type == VARINT:
+            value, pos = _read_varint(data, pos)
+            yield field, value
+        elif wire_type == LENGTH_DELIMITED:
+            length, pos = _read_varint(data, pos)
+            if pos + length > end:
+                raise GtfsDecodeError("Truncated field")
+            yield field, (pos, pos + length)
+            pos += length
+        elif wire_type == FIXED64:
+            pos += 8
+        elif wire_type == FIXED32:
+            pos += 4
+        else:
+            raise GtfsDecodeError(f"Unsupported wire type {wire_type}")
+    if pos != end:
+        raise GtfsDecodeError("Truncated message")
+
+
+def _event_time(data: bytes, start: int, end: int) -> Optional[int]:
+    """Get the POSIX time of a StopTimeEvent, if it has one."""
+    for field, value in _iter_fields(data, start, end):
+        if field == EVENT_TIME and isinstance(value, int):
+            # int64 is encoded as a 64-bit two's complement varint
+            return value - (1 << 64) if value >= 1 << 63 else value
+    return None
+
+
+def _stop_time(data: bytes, start: int, end: int, stop_id: bytes) -> Optional[int]:
+    """Get the arrival (or departure) time of a StopTimeUpdate at stop_id."""
+    at_stop = False
+    arrival = departure = None
+    for field, value in _iter_fields(data, start, end):
+        if not isinstance(value, tuple):
+            continue
+        if field == STOP_TIME_STOP_ID:
+            if data[value[0]:value[1]] != stop_id:
+                return None
+            at_stop = True
+        elif field == STOP_TIME_ARRIVAL:
+            arrival = _event_time(data, *value)
+        elif field == STOP_TIME_DEPARTURE:
+            departure = _event_time(data, *value)
+    if not at_stop:
+        return None
+    return arrival if arrival is not None else departure
+
+
+def _trip_arrival(data: bytes, start: int, end: int, stop_id: bytes) -> Optional[FeedArrival]:
+    """Decode a TripUpdate, or return None if it does not stop at stop_id."""
+    trip = None
+    arrives_at = None
+    for field, value in _iter_fields(data, start, end):
+        if field == TRIP_UPDATE_TRIP and isinstance(value, tuple):
+            trip = value
+        elif field == TRIP_UPDATE_STOP_TIME_UPDATE and isinstance(value, tuple) and arrives_at is None:
+            # Most stop time updates are for other stops: skip them unless the id occurs
+            if data.find(stop_id, value[0], value[1]) != -1:
+                arrives_at = _stop_time(data, value[0], value[1], stop_id)
+    if arrives_at is None or trip is None:
+        return None
+
+    route_id = trip_id = ""
+    for field, value in _iter_fields(data, *trip):
+        if field == TRIP_ROUTE_ID and isinstance(value, tuple):
+            route_id = data[value[0]:value[1]].decode("utf-8", "replace")
+        elif field == TRIP_TRIP_ID and isinstance(value, tuple):
+            trip_id = data[value[0]:value[1]].decode("utf-8", "replace")
+    return FeedArrival(arrives_at, route_id, trip_id)
+
+
+def parse_feed(data: bytes, stop_id: str) -> Tuple[int, List[FeedArrival]]:
+    """Decode the arrivals at one stop from a GTFS-realtime FeedMessage.
+
+    Decoding is streaming and selective: entities that never mention the
+    stop are skipped without being decoded, and only the matching stop time
+    update and the trip descriptor of the remaining ones are read.
+
+    Args:
+        data: Serialized FeedMessage
+        stop_id: Stop id including the direction suffix (e.g. "F24N")
+
+    Returns:
+        Tuple of (feed timestamp, arrivals at the stop in feed order)
+
+    Raises:
+        GtfsDecodeError: If the data is not a valid message
+    """
+    target = stop_id.encode("utf-8")
+    timestamp = 0
+    arrivals: List[FeedArrival] = []
+    for field, value in _iter_fields(data, 0, len(data)):
+        if not isinstance(value, tuple):
+            continue
+        start, end = value
+        if field == FEED_HEADER:
+            for header_field, header_value in _iter_fields(data, start, end):
+                if header_field == HEADER_TIMESTAMP and isinstance(header_value, int):
+                    timestamp = header_value
+        elif field == FEED_ENTITY and data.find(target, start, end) != -1:
+            for entity_field, entity_value in _iter_fields(data, start, end):
+                if entity_field == ENTITY_TRIP_UPDATE and isinstance(entity_value, tuple):
+                    arrival = _trip_arrival(data, entity_value[0], entity_value[1], target)
+                    if arrival is not None:
+                        arrivals.append(arrival)
+    return timestamp, arrivals
+
+
+def trains_from_arrivals(arrivals: Sequence[FeedArrival], now: float) -> List[TrainArrival]:
+    """Turn arrivals into the train records display_trains consumes.
+
+    Args:
+        arrivals: Arrivals at the stop, from any number of feeds
+        now: Current POSIX time
+
+    Returns:
+        Trains that have not arrived yet, soonest first
+    """
+    trains = []
+    for arrival in sorted(arrivals):
+        if arrival.arrives_at < now:
+            continue
+        route_id = arrival.route_id
+        express = len(route_id) > 1 and route_id.endswith(EXPRESS_SUFFIX)
+        line = route_id[:-len(EXPRESS_SUFFIX)] if express else route_id
+        trains.append(TrainArrival(
+            sys.intern(line), minutes_status(int((arrival.arrives_at - now) // 60)), express
+        ))
+    return trains
+
+
+class FeedFile:
+    """A recorded feed on disk, re-read whenever the file changes."""
+
+    def __init__(self, path: str, decode: Any):
+        """Initialize the feed.
+
+        Args:
+            path: Path of the recorded FeedMessage
+            decode: Turns the file contents into the value fetch returns
+        """
+        self.path = path
+        self.decode = decode
+        self._mtime: Optional[int] = None
+
+    async def fetch(self) -> Optional[Any]:
+        """Read the file if it changed since the last fetch.
+
+        Returns:
+            The decoded feed, or None if the file is unchanged
+        """
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime == self._mtime:
+            return None
+        with open(self.path, "rb") as feed:
+            decoded = self.decode(feed.read())
+        self._mtime = mtime
+        return decoded
+
+    def reset(self) -> None:
+        """Read the file again on the next fetch."""
+        self._mtime = None
+
+    async def aclose(self) -> None:
+        """Nothing to close."""
+
+
+class GtfsFeedClient:
+    """Builds the train list from GTFS-realtime feeds instead of the train API.
+
+    Has the same interface as TrainApiClient, so fetch_loop can drive
+    either. Each feed is polled with conditional GETs and only the feeds
+    that changed are decoded again. Recorded feed files can stand in for
+    URLs; when every source is a file, arrivals are counted from the time
+    the feeds were recorded, so fixtures replay the same way every time.
+    """
+
+    def __init__(
+        self,
+        sources: Sequence[str],
+        stop_id: str,
+        timeout: float = 5.0,
+        api_key: Optional[str] = None
+    ):
+        """Initialize the client.
+
+        Args:
+            sources: Feed URLs or paths of recorded feeds
+            stop_id: Stop id including the direction suffix (e.g. "F24N")
+            timeout: Request timeout in seconds
+            api_key: MTA API key, if the feeds require one
+        """
+        self.stop_id = stop_id
+        headers = {"x-api-key": api_key} if api_key else None
+        self.feeds: List[Union[TrainApiClient, FeedFile]] = [
+            TrainApiClient(source, timeout=timeout, headers=headers, decode=self._decode)
+            if source.startswith(("http://", "https://"))
+            else FeedFile(source, self._decode)
+            for source in sources
+        ]
+        self.replay = all(isinstance(feed, FeedFile) for feed in self.feeds)
+        self._latest: List[Tuple[int, List[FeedArrival]]] = [(0, [])] * len(self.feeds)
+
+    def _decode(self, content: bytes) -> Tuple[int, List[FeedArrival]]:
+        return parse_feed(content, self.stop_id)
+
+    async def __aenter__(self) -> "GtfsFeedClient":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Close every feed's connection."""
+        for feed in self.feeds:
+            await feed.aclose()
+
+    def reset(self) -> None:
+        """Forget cached validators so every feed is fetched and decoded again."""
+        for feed in self.feeds:
+            feed.reset()
+
+    async def fetch(self) -> Optional[List[TrainArrival]]:
+        """Fetch every feed and merge their arrivals at the stop.
+
+        Returns:
+            Train records soonest first, or None if no feed has changed
+
+        Raises:
+            BadResponseError: If a feed answers with anything but 200 or 304
+            GtfsDecodeError: If a feed is not a valid GTFS-realtime message
+            httpx.HTTPError: On network errors
+        """
+        results = await asyncio.gather(*(feed.fetch() for feed in self.feeds))
+        if all(result is None for result in results):
+            return None
+        for index, result in enumerate(results):
+            if result is not None:
+                self._latest[index] = result
+
+        if self.replay:
+            now = float(max(timestamp for timestamp, _ in self._latest))
+        else:
+            now = time.time()
+        arrivals = [arrival for _, feed_arrivals in self._latest for arrival in feed_arrivals]
+        return trains_from_arrivals(arrivals, now)
+
+
+def create_gtfs_client(timeout: float = 5.0) -> GtfsFeedClient:
+    """Create a GtfsFeedClient from the GTFS_* settings."""
+    return GtfsFeedClient(
+        GTFS_FEED_URLS, GTFS_STOP_ID + GTFS_DIRECTION, timeout=timeout, api_key=GTFS_API_KEY
+    )
+
+
+async def _record(directory: str) -> None:
+    """Save the live feeds as fixture files."""
+    os.makedirs(directory, exist_ok=True)
+    headers = {"x-api-key": GTFS_API_KEY} if GTFS_API_KEY else None
+    async with httpx.AsyncClient(timeout=10.0, headers=headers) as client:
+        for url in GTFS_FEED_URLS:
+            if not url.startswith(("http://", "https://")):
+                continue
+            resp = await client.get(url)
+            resp.raise_for_status()
+            name = url.rsplit("%2F", 1)[-1].rsplit("/", 1)[-1]
+            path = os.path.join(directory, f"{name}-{int(time.time())}.pb")
+            with open(path, "wb") as fixture:
+                fixture.write(resp.content)
+            print(f"Saved {len(resp.content)} bytes to {path}")
+
+
+async def _show(sources: Sequence[str]) -> None:
+    """Print the trains the feeds produce for the configured stop."""
+    async with GtfsFeedClient(sources, GTFS_STOP_ID + GTFS_DIRECTION, api_key=GTFS_API_KEY) as client:
+        for train in await client.fetch() or []:
+            print(train)
+
+
+def main() -> None:
+    """Show or record feeds from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+    show = commands.add_parser("show", help="Print the trains decoded from feeds")
+    show.add_argument("sources", nargs="+", help="Feed URLs or recorded files")
+    record = commands.add_parser("record", help="Save the live feeds as fixture files")
+    record.add_argument("directory")
+    args = parser.parse_args()
+
+    if args.command == "show":
+        asyncio.run(_show(args.sources))
+    else:
+        asyncio.run(_record(args.directory))
+
+
+if __name__ == "__main__":
+    main()
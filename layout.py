@@ -0,0 +1,206 @@
+import os
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+# Panel arrangement and row layout to use, one of PRESETS
+MATRIX_LAYOUT = os.environ.get("MATRIX_LAYOUT", "2x64x32")
+# Number of arrival rows, overriding the preset's (must fit on the display)
+LAYOUT_ROWS = os.environ.get("LAYOUT_ROWS")
+
+# Size of the route letters drawn on the bullets (see sprites.py)
+GLYPH_WIDTH = 6
+GLYPH_HEIGHT = 8
+# Rows between two arrival rows' bands; each band reaches one row past its
+# row on both sides, so less would let repainting one row clip the next
+MIN_ROW_GAP = 2
+# Pixel mappers whose effect on the display's shape is known
+PIXEL_MAPPERS = ("", "U-mapper")
+
+
+class LayoutSpec(NamedTuple):
+    """What the display is made of and how its rows are arranged.
+
+    Each row reads, left to right: padding_left, the route bullet,
+    bullet_gap, the line name, name_gap, the minutes (right-aligned),
+    padding_right. The line name gets whatever width is left.
+    """
+    panel_rows: int = 32
+    panel_cols: int = 64
+    chain_length: int = 2
+    parallel: int = 1
+    # rgbmatrix pixel mapper; "U-mapper" folds a chain in half into a square
+    pixel_mapper: str = ""
+    # Arrival rows, or None for as many as fit
+    rows: Optional[int] = 2
+    row_height: int = 10
+    row_gap: int = 6
+    padding_top: int = 2
+    padding_left: int = 2
+    padding_right: int = 1
+    bullet_width: int = 13
+    bullet_gap: int = 2
+    name_gap: int = 4
+    minutes_width: int = 34
+
+
+PRESETS: Dict[str, LayoutSpec] = {
+    # Two 64x32 panels side by side (128x32), two arrivals
+    "2x64x32": LayoutSpec(),
+    # Four 64x32 panels in one long strip (256x32), two arrivals with room for the names
+    "4x64x32": LayoutSpec(chain_length=4),
+    # Four 64x32 panels folded into two rows of two (128x64), four arrivals
+    "4x64x32-u": LayoutSpec(chain_length=4, pixel_mapper="U-mapper", rows=None),
+    # One 64x64 panel, four arrivals
+    "64x64": LayoutSpec(panel_rows=64, chain_length=1, rows=None, minutes_width=30, name_gap=2),
+    # Two 64x64 panels side by side (128x64), five arrivals
+    "2x64x64": LayoutSpec(panel_rows=64, rows=None, row_gap=MIN_ROW_GAP),
+}
+
+
+class RowGeometry(NamedTuple):
+    """Pixel positions of every component in a row."""
+    x: int
+    y: int
+    height: int
+    bullet_end_x: int
+    circle_x: int
+    circle_y: int
+    radius: int
+    letter_x: int
+    letter_y: int
+    line_name_x: int
+    name_end_x: int
+    minutes_x: int
+    minutes_end_x: int
+    baseline: int
+
+
+class CompiledLayout(NamedTuple):
+    """A LayoutSpec resolved into the display size and every row's coordinates."""
+    spec: LayoutSpec
+    width: int
+    height: int
+    rows: Tuple[RowGeometry, ...]
+    # Pixel lit while the data is stale, above the first row's band
+    stale_indicator: Tuple[int, int]
+
+    def matrix_options(self) -> Dict[str, Any]:
+        """Get the RGBMatrixOptions attributes that describe these panels.
+
+        Returns:
+            Attribute name to value
+        """
+        options = {
+            "rows": self.spec.panel_rows,
+            "cols": self.spec.panel_cols,
+            "chain_length": self.spec.chain_length,
+            "parallel": self.spec.parallel,
+        }
+        if self.spec.pixel_mapper:
+            options["pixel_mapper_config"] = self.spec.pixel_mapper
+        return options
+
+
+def display_size(spec: LayoutSpec) -> Tuple[int, int]:
+    """Get the size of the canvas the panels make up.
+
+    Args:
+        spec: The layout
+
+    Returns:
+        Tuple of (width, height) in pixels
+
+    Raises:
+        ValueError: For a pixel mapper whose effect is unknown
+    """
+    if spec.pixel_mapper not in PIXEL_MAPPERS:
+        raise ValueError(f"Unsupported pixel mapper {spec.pixel_mapper!r}")
+    width = spec.panel_cols * spec.chain_length
+    height = spec.panel_rows * spec.parallel
+    if spec.pixel_mapper == "U-mapper":
+        width, height = width // 2, height * 2
+    return width, height
+
+
+def rows_that_fit(spec: LayoutSpec, height: int) -> int:
+    """Count the rows that fit on a display of the given height.
+
+    The last row's band, which reaches one row below it, must end on the display.
+    """
+    pitch = spec.row_height + spec.row_gap
+    return max((height - 1 - spec.row_height - spec.padding_top) // pitch + 1, 0)
+
+
+def compile_layout(spec: LayoutSpec) -> CompiledLayout:
+    """Compute the display size and the coordinates of every row component.
+
+    Done once at startup, so drawing a frame only looks positions up.
+
+    Args:
+        spec: The layout
+
+    Returns:
+        The compiled layout
+
+    Raises:
+        ValueError: If the rows or their components do not fit on the display
+    """
+    width, height = display_size(spec)
+    if spec.row_gap < MIN_ROW_GAP:
+        raise ValueError(f"Rows must be at least {MIN_ROW_GAP} pixels apart")
+    if spec.padding_top < 2:
+        raise ValueError("The first row must start at least 2 pixels down, below the stale indicator")
+    fit = rows_that_fit(spec, height)
+    count = fit if spec.rows is None else spec.rows
+    if not 1 <= count <= fit:
+        raise ValueError(f"{count} rows do not fit on a {width}x{height} display (at most {fit})")
+
+    x = spec.padding_left
+    line_name_x = x + spec.bullet_width + spec.bullet_gap
+    minutes_end_x = width - spec.padding_right
+    minutes_x = minutes_end_x - spec.minutes_width
+    name_end_x = minutes_x - spec.name_gap
+    if name_end_x <= line_name_x:
+        raise ValueError(f"No room for line names on a {width} pixel wide display")
+
+    rows = []
+    for index in range(count):
+        y = spec.padding_top + index * (spec.row_height + spec.row_gap)
+        rows.append(RowGeometry(
+            x=x,
+            y=y,
+            height=spec.row_height,
+            bullet_end_x=x + spec.bullet_width,
+            circle_x=x + spec.bullet_width // 2,
+            circle_y=y + spec.row_height // 2,
+            radius=spec.bullet_width // 2,
+            letter_x=x + (spec.bullet_width - GLYPH_WIDTH) // 2,
+            letter_y=y + (spec.row_height - GLYPH_HEIGHT) // 2,
+            line_name_x=line_name_x,
+            name_end_x=name_end_x,
+            minutes_x=minutes_x,
+            minutes_end_x=minutes_end_x,
+            # Text sits on the row's last line; descenders go into the band below
+            baseline=y + spec.row_height - 1,
+        ))
+    return CompiledLayout(spec, width, height, tuple(rows), (width - 1, 0))
+
+
+def layout_from_env(preset: str = MATRIX_LAYOUT, rows: Optional[str] = LAYOUT_ROWS) -> LayoutSpec:
+    """Get the layout chosen in the environment.
+
+    Args:
+        preset: Name of a preset in PRESETS
+        rows: Number of arrival rows overriding the preset's, if set
+
+    Returns:
+        The layout spec
+
+    Raises:
+        ValueError: For an unknown preset
+    """
+    spec = PRESETS.get(preset)
+    if spec is None:
+        raise ValueError(f"Unknown MATRIX_LAYOUT {preset!r}; choose from {', '.join(PRESETS)}")
+    if rows:
+        spec = spec._replace(rows=int(rows))
+    return spec
@@ -0,0 +1,202 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from metrics import METRICS
+
+# Records below this level are discarded where they are made
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+# Records one line of code may log per LOG_RATE_WINDOW seconds; the rest are counted and dropped
+LOG_RATE_LIMIT = int(os.environ.get("LOG_RATE_LIMIT", "20"))
+LOG_RATE_WINDOW = 60.0
+# A message repeated unchanged is logged again after this many seconds, with its count
+DUPLICATE_REPORT_INTERVAL = 300.0
+# Records waiting for the writer thread; when full, new records are dropped
+LOG_QUEUE_SIZE = 1000
+# Recent payloads kept in memory for dump_payloads()
+PAYLOAD_HISTORY = int(os.environ.get("PAYLOAD_HISTORY", "32"))
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+
+def _annotate(record: logging.LogRecord, note: str) -> None:
+    """Append a note to a record's message, formatting it first."""
+    record.msg = f"{record.getMessage()} [{note}]"
+    record.args = None
+
+
+class RateLimitFilter(logging.Filter):
+    """Lets each line of code log at most `limit` records per window.
+
+    Runs where records are made, so dropped records cost a dict lookup and
+    are never formatted or queued. The first record let through in a new
+    window says how many were dropped in the last one.
+    """
+
+    def __init__(self, limit: int = LOG_RATE_LIMIT, window: float = LOG_RATE_WINDOW):
+        """Initialize the filter.
+
+        Args:
+            limit: Records allowed per call site per window
+            window: Window length in seconds
+        """
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        # (logger, line) -> [window start, records let through, records dropped]
+        self._sites: Dict[Tuple[str, int], list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        now = record.created
+        site = self._sites.get((record.name, record.lineno))
+        if site is None or now - site[0] >= self.window:
+            dropped = site[2] if site is not None else 0
+            self._sites[(record.name, record.lineno)] = [now, 1, 0]
+            if dropped:
+                _annotate(record, f"{dropped} more dropped by the rate limit")
+            return True
+        if site[1] < self.limit:
+            site[1] += 1
+            return True
+        site[2] += 1
+        METRICS.inc("log_records_rate_limited")
+        return False
+
+
+class DuplicateFilter(logging.Filter):
+    """Suppresses a message repeated unchanged by the same line of code.
+
+    A repeat is logged again every `interval` seconds with its count, so
+    a persistent error stays visible, and the next different message says
+    how many repeats were suppressed. Runs on the writer thread, where
+    messages are formatted anyway.
+    """
+
+    def __init__(self, interval: float = DUPLICATE_REPORT_INTERVAL):
+        """Initialize the filter.
+
+        Args:
+            interval: Seconds after which a repeat is logged anyway
+        """
+        super().__init__()
+        self.interval = interval
+        # (logger, line) -> [last message, when it was last logged, repeats suppressed since]
+        self._last: Dict[Tuple[str, int], list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = (record.name, record.lineno)
+        message = record.getMessage()
+        last = self._last.get(key)
+        if last is not None and last[0] == message:
+            if record.created - last[1] < self.interval:
+                last[2] += 1
+                METRICS.inc("log_records_deduplicated")
+                return False
+            repeats, last[1], last[2] = last[2], record.created, 0
+            if repeats:
+                _annotate(record, f"repeated {repeats} more times")
+            return True
+        if last is not None and last[2]:
+            _annotate(record, f"previous message repeated {last[2]} more times")
+        self._last[key] = [message, record.created, 0]
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queues records for the writer thread without blocking or formatting.
+
+    Records are formatted by the writer, not here, and when the queue is
+    full new records are dropped and counted instead of waiting.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            METRICS.inc("log_records_dropped")
+
+
+class PayloadRing:
+    """The most recent payloads received, kept in memory for debugging.
+
+    Recording one is a deque append, so payloads can be kept on every poll
+    without logging them.
+    """
+
+    def __init__(self, size: int = PAYLOAD_HISTORY):
+        """Initialize an empty ring.
+
+        Args:
+            size: Number of payloads kept
+        """
+        self.payloads: Deque[Tuple[float, str, Any]] = deque(maxlen=size)
+
+    def record(self, source: str, payload: Any) -> None:
+        """Keep a payload.
+
+        Args:
+            source: Where it came from (e.g. "poll", "push")
+            payload: The decoded payload
+        """
+        self.payloads.append((time.time(), source, payload))
+
+    def dump(self) -> str:
+        """Format the kept payloads, oldest first.
+
+        Returns:
+            One line per payload
+        """
+        lines = [f"Last {len(self.payloads)} payloads:"]
+        for received_at, source, payload in list(self.payloads):
+            stamp = time.strftime("%H:%M:%S", time.localtime(received_at))
+            lines.append(f"  {stamp} {source}: {payload}")
+        return "\n".join(lines)
+
+
+# Shared ring for the whole process
+PAYLOADS = PayloadRing()
+listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging(level: str = LOG_LEVEL) -> logging.handlers.QueueListener:
+    """Route all logging through a queue to a background writer thread.
+
+    Records are rate limited where they are made, then queued; the writer
+    thread suppresses duplicates, formats them and writes them to stdout.
+    Calling it again returns the running writer.
+
+    Args:
+        level: Lowest level logged (e.g. "INFO", "DEBUG")
+
+    Returns:
+        The writer, which is stopped and flushed at exit
+    """
+    global listener
+    if listener is not None:
+        return listener
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(logging.Formatter(LOG_FORMAT))
+    stream.addFilter(DuplicateFilter())
+
+    records: "queue.Queue[logging.LogRecord]" = queue.Queue(LOG_QUEUE_SIZE)
+    handler = DroppingQueueHandler(records)
+    handler.addFilter(RateLimitFilter())
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+    # httpx logs every request at INFO
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    listener = logging.handlers.QueueListener(records, stream, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
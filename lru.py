@@ -0,0 +1,83 @@
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class LRUCache:
+    """A small bounded mapping that evicts the least recently used entry."""
+
+    def __init__(self, max_size: int = 128):
+        """Initialize the cache.
+
+        Args:
+            max_size: Maximum number of entries kept before evicting
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """Look up a key, marking it as most recently used.
+
+        Args:
+            key: The cache key
+            default: Value returned when the key is missing
+
+        Returns:
+            The cached value or default
+        """
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting the oldest entry if the cache is full.
+
+        Args:
+            key: The cache key
+            value: The value to store
+        """
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """Return the cached value for key, building it with factory on a miss.
+
+        Args:
+            key: The cache key
+            factory: Zero-argument callable producing the value
+
+        Returns:
+            The cached or newly created value
+        """
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            value = factory()
+            self.put(key, value)
+            return value
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def clear(self) -> None:
+        """Drop every entry and reset the hit/miss counters."""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
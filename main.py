@@ -1,90 +1,210 @@
 #!/usr/bin/env python3
 import asyncio
+import logging
 import sys
 import signal
 import os
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
-import httpx
-
-from rgb_matrix_controller import get_controller
-
-# Load environment variables from .env file
+# Load environment variables from .env file before any module reads them
 script_dir = Path(__file__).parent.absolute()
 env_path = script_dir / '.env'
 load_dotenv(dotenv_path=env_path)
 
-POLLING_INTERVAL = 15
-API_URL = os.environ.get("TRAIN_API_URL")
+# Startup phases are timed from here; the network stack is only imported
+# once the first frame is on the panel
+from startup import STARTUP  # pylint: disable=wrong-import-position
+from log_pipeline import PAYLOADS, setup_logging  # pylint: disable=wrong-import-position
+from metrics import METRICS, start_metrics_server  # pylint: disable=wrong-import-position
+from poll_scheduler import PollScheduler  # pylint: disable=wrong-import-position
+from rgb_matrix_controller import RGBMatrixController, get_controller  # pylint: disable=wrong-import-position
+from state_store import (  # pylint: disable=wrong-import-position
+    MAX_STALE_INTERVALS, STALE_INDICATOR_INTERVALS, SavedState, StateStore
+)
+STARTUP.mark("imports")
+# Logging goes through a queue to a writer thread, so it never blocks the loop
+setup_logging()
+logger = logging.getLogger(__name__)
 
-try:
-    # Set affinity to CPUs 0, 1, 2 (leaving 3 isolated)
-    os.sched_setaffinity(0, {0, 1, 2})
-    print("Set CPU affinity to cores 0-2")
-except Exception as e:
-    print(f"Could not set CPU affinity: {e}")
+# Several API endpoints serving the same trains (comma separated); requests
+# go to the healthiest and are hedged to another when it is slow (see endpoint_pool.py)
+API_URLS = [url.strip() for url in os.environ.get("TRAIN_API_URLS", "").split(",") if url.strip()]
+API_URL = os.environ.get("TRAIN_API_URL") or (API_URLS[0] if API_URLS else None)
+# "poll" fetches TRAIN_API_URL on a schedule; "push" subscribes to the API's
+# Server-Sent Events at TRAIN_PUSH_URL and polls only while that is unavailable
+TRAIN_TRANSPORT = os.environ.get("TRAIN_TRANSPORT", "poll")
+TRAIN_PUSH_URL = os.environ.get("TRAIN_PUSH_URL") or (
+    f"{API_URL.rstrip('/')}/events" if API_URL else None
+)
+# "api" polls TRAIN_API_URL; "gtfs" decodes the MTA feeds in-process (see gtfs_feed.py)
+TRAIN_SOURCE = os.environ.get("TRAIN_SOURCE", "api")
+# Serve Prometheus metrics at http://METRICS_HOST:METRICS_PORT/metrics if set
+METRICS_PORT = os.environ.get("METRICS_PORT")
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+# "hub" polls once and broadcasts the trains to other signs; "subscriber"
+# shows what a hub broadcasts instead of polling (see fanout.py)
+HUB_MODE = os.environ.get("HUB_MODE", "off")
+# "thread" drives the matrix from this process; "multiprocess" hands finished
+# frames to a separate render process through shared memory (see render_process.py)
+RENDER_MODE = os.environ.get("RENDER_MODE", "thread")
 
-# For non-root users, use a lower priority
-try:
-    os.nice(-10)  # Use nice instead of real-time priority
-    print("Set process priority")
-except Exception as e:
-    print(f"Could not set process priority: {e}")
+def tune_process() -> None:
+    """Pin the process to cores 0-2 and raise its priority."""
+    try:
+        # Set affinity to CPUs 0, 1, 2 (leaving 3 isolated)
+        os.sched_setaffinity(0, {0, 1, 2})
+        logger.info("Set CPU affinity to cores 0-2")
+    except Exception as e:
+        logger.warning("Could not set CPU affinity: %s", e)
 
-async def poll_and_display(controller: Any, url: str, interval: int) -> None:
+    # For non-root users, use a lower priority
+    try:
+        os.nice(-10)  # Use nice instead of real-time priority
+        logger.info("Set process priority")
+    except Exception as e:
+        logger.warning("Could not set process priority: %s", e)
+
+async def poll_and_display(
+    controller: Any,
+    url: str,
+    scheduler: PollScheduler,
+    store: Optional[StateStore] = None,
+    saved: Optional[SavedState] = None
+) -> None:
     """Poll a URL for train data and display it on the matrix.
     
+    Fetching and drawing run as separate tasks joined by a latest-value
+    slot, so a slow poll never freezes the countdown and a slow frame never
+    delays a poll. All matrix calls happen on one dedicated thread. A hub
+    also broadcasts the slot to subscribers, which fill their slot from
+    the broadcast instead of polling.
+    
     Args:
         controller: The matrix controller object
         url: The API URL to poll for train data
-        interval: The polling interval in seconds
+        scheduler: Decides when to poll; its longest delay sets how soon
+            the trains count as stale
+        store: Where new train lists are persisted
+        saved: Train list restored from the store, shown until the first poll
     """
-    print(f"Starting application with API URL: {url}")
-    print(f"Polling interval: {interval} seconds")
+    # pylint: disable=import-outside-toplevel
+    from pipeline import FetchResult, LatestValue, fetch_loop, render_loop
+    from train_client import TrainApiClient
+    
+    slot = LatestValue()
+    initial_delay = 0.0
+    if saved is not None:
+        slot.publish(FetchResult(saved.trains, None, saved.received_at))
+        # After a quick restart, poll when the saved trains are due a refresh
+        initial_delay = max(0.0, scheduler.delay - saved.age())
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="matrix")
+    renderer = render_loop(
+        controller, slot, executor, scheduler.max_interval * MAX_STALE_INTERVALS,
+        stale_after=scheduler.max_interval * STALE_INDICATOR_INTERVALS
+    )
     
-    while True:
+    if HUB_MODE == "subscriber":
+        from fanout import FANOUT_GROUP, FANOUT_PORT, FanoutSubscriber, subscribe_loop
+        logger.info("Starting application as a subscriber of %s:%s", FANOUT_GROUP, FANOUT_PORT)
         try:
-            async with httpx.AsyncClient() as client:
-                resp = await client.get(url, timeout=5.0)
-                if resp.status_code == 200:
-                    print('response', resp.json())
-                    trains = resp.json()
-                    controller.display_trains(trains[:2])  # Display first two trains
-                else:
-                    print(f"Bad response: {resp}")
-                    controller.display_trains([
-                        {"line": "?", "status": "Bad response", "express": False},
-                        {"line": "?", "status": "Bad response", "express": False}
-                    ])
-        except Exception as e:
-            print(f"Error: {e}")
-            controller.display_trains([
-                {"line": "?", "status": str(e)[:20], "express": False}
-            ])
-        await asyncio.sleep(interval)
+            await asyncio.gather(subscribe_loop(FanoutSubscriber(), slot, store), renderer)
+        finally:
+            executor.shutdown(wait=True)
+        return
+    
+    if TRAIN_SOURCE == "gtfs":
+        from gtfs_feed import GTFS_FEED_URLS, create_gtfs_client
+        client = create_gtfs_client(timeout=5.0)
+        logger.info("Starting application with GTFS-realtime feeds: %s", ", ".join(GTFS_FEED_URLS))
+    elif len(API_URLS) > 1:
+        from endpoint_pool import EndpointPool
+        client = EndpointPool(API_URLS, timeout=5.0)
+        logger.info("Starting application with API URLs: %s", ", ".join(API_URLS))
+    else:
+        client = TrainApiClient(url, timeout=5.0)
+        logger.info("Starting application with API URL: %s", url)
+    logger.info(
+        "Polling every %.0f seconds, adapting between %.0f and %.0f",
+        scheduler.interval, scheduler.min_interval, scheduler.max_interval
+    )
+    if TRAIN_TRANSPORT == "push" and TRAIN_SOURCE != "gtfs":
+        from push_client import TrainPushClient, push_loop
+        logger.info("Subscribing to %s", TRAIN_PUSH_URL)
+        push = TrainPushClient(TRAIN_PUSH_URL, timeout=5.0)
+        tasks = [push_loop(push, client, slot, scheduler, store), renderer]
+    else:
+        tasks = [fetch_loop(client, slot, scheduler, store, initial_delay), renderer]
+    if HUB_MODE == "hub":
+        from fanout import FANOUT_GROUP, FANOUT_PORT, FanoutPublisher, broadcast_loop
+        logger.info("Broadcasting trains to %s:%s", FANOUT_GROUP, FANOUT_PORT)
+        tasks.append(broadcast_loop(FanoutPublisher(), slot))
+    try:
+        async with client:
+            await asyncio.gather(*tasks)
+    finally:
+        # Let an in-flight frame finish before the matrix is shut down
+        executor.shutdown(wait=True)
 
 async def main() -> None:
     """Main function to set up and run the train display."""
     # Get the controller instance
-    controller = get_controller()
+    render_process = None
+    if RENDER_MODE == "multiprocess":
+        from render_process import RenderProcess  # pylint: disable=import-outside-toplevel
+        render_process = RenderProcess()
+        render_process.start()
+        controller = RGBMatrixController(
+            double_buffered=False, matrix_components=render_process.matrix_components()
+        )
+        logger.info("Rendering in a separate process")
+    else:
+        controller = get_controller()
+    STARTUP.mark("matrix")
+    
+    # Show the last good trains, counted down, while everything else starts up.
+    # Minutes are counted down locally between polls, so trains only count
+    # as stale relative to the longest gap the scheduler may leave.
+    scheduler = PollScheduler()
+    store = StateStore()
+    saved = store.load(max_age=scheduler.max_interval * MAX_STALE_INTERVALS)
+    if saved is not None:
+        controller.display_trains(
+            saved.trains_at(), stale=saved.age() > scheduler.max_interval * STALE_INDICATOR_INTERVALS
+        )
+    
+    tune_process()
     
     # Register signal handlers for graceful shutdown
     for sig in (signal.SIGINT, signal.SIGTERM):
         signal.signal(sig, lambda s, f: sys.exit(0))
     
+    # Dump stats on SIGUSR1 (kill -USR1 <pid>) and recent payloads on SIGUSR2
+    if hasattr(signal, "SIGUSR1"):
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGUSR1, lambda: logger.info("%s", METRICS.dump()))
+        loop.add_signal_handler(signal.SIGUSR2, lambda: logger.info("%s", PAYLOADS.dump()))
+    if METRICS_PORT:
+        await start_metrics_server(METRICS_HOST, int(METRICS_PORT))
+    
+    STARTUP.mark("ready")
+    logger.info("%s", STARTUP.report())
+    
     # Start polling and displaying trains
     try:
-        await poll_and_display(controller, API_URL, POLLING_INTERVAL)
+        await poll_and_display(controller, API_URL, scheduler, store, saved)
     except KeyboardInterrupt:
-        print("Shutting down...")
+        logger.info("Shutting down...")
     finally:
         controller.shutdown()
+        if render_process is not None:
+            render_process.stop()
 
 if __name__ == "__main__":
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
-        print("Exiting...")
+        logger.info("Exiting...")
         sys.exit(0)
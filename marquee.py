@@ -0,0 +1,133 @@
+import os
+import time
+from typing import Any, Optional, Tuple
+
+import numpy as np
+
+from bdf_font import BdfFont
+
+# Scroll speed in pixels per second; a frame is drawn for every pixel moved
+MARQUEE_SPEED = float(os.environ.get("MARQUEE_SPEED", "20"))
+# Blank columns between the end of the text and its repeat
+MARQUEE_GAP = 12
+# Seconds the text rests at its start on every pass, so it can be read
+MARQUEE_PAUSE = 1.5
+
+
+def rasterize(font: BdfFont, text: str) -> np.ndarray:
+    """Draw text into a boolean strip, one font height tall.
+
+    Row font.baseline - 1 is the last row above the baseline, as when the
+    text is drawn with its baseline at y = font.baseline.
+
+    Args:
+        font: Font to draw with
+        text: Text to draw
+
+    Returns:
+        (font.height, advance) boolean array
+    """
+    glyphs = [font.glyph(ord(char)) for char in text]
+    width = sum(glyph.device_width for glyph in glyphs if glyph is not None)
+    strip = np.zeros((font.height, width), dtype=bool)
+    x = 0
+    for glyph in glyphs:
+        if glyph is None:
+            continue
+        if glyph.height:
+            top = font.baseline - glyph.height - glyph.y_offset
+            rows = slice(max(top, 0), min(top + glyph.height, font.height))
+            columns = slice(x, min(x + glyph.width, width))
+            strip[rows, columns] |= glyph.bitmap[
+                rows.start - top:rows.stop - top, :columns.stop - columns.start
+            ]
+        x += glyph.device_width
+    return strip
+
+
+class Marquee:
+    """Scrolls one string through a fixed-width window.
+
+    The text is rasterized once, twice over with a gap between, so every
+    frame only copies a window-wide slice of the strip at the current
+    offset onto the canvas. Text layout never runs again while it scrolls.
+    """
+
+    def __init__(
+        self,
+        font: BdfFont,
+        text: str,
+        width: int,
+        speed: float = MARQUEE_SPEED,
+        started_at: Optional[float] = None
+    ):
+        """Rasterize the text.
+
+        Args:
+            font: Font to draw with
+            text: Text to scroll
+            width: Window width in pixels
+            speed: Pixels per second
+            started_at: time.monotonic() the scrolling starts from (now)
+        """
+        text_strip = rasterize(font, text)
+        self.text = text
+        self.width = width
+        self.speed = speed
+        self.period = text_strip.shape[1] + MARQUEE_GAP
+        self.started_at = time.monotonic() if started_at is None else started_at
+        looped = np.zeros((font.height, self.period), dtype=bool)
+        looped[:, :text_strip.shape[1]] = text_strip
+        self.strip = np.concatenate((looped, looped[:, :width]), axis=1)
+
+    @property
+    def frame_interval(self) -> float:
+        """Seconds between frames so that each one moves by a pixel."""
+        return 1.0 / self.speed
+
+    def offset(self, now: Optional[float] = None) -> int:
+        """Get the strip column at the window's left edge.
+
+        Args:
+            now: time.monotonic() (defaults to now)
+
+        Returns:
+            The offset, in [0, period)
+        """
+        now = time.monotonic() if now is None else now
+        elapsed = (now - self.started_at) % (MARQUEE_PAUSE + self.period / self.speed)
+        if elapsed < MARQUEE_PAUSE:
+            return 0
+        return min(int((elapsed - MARQUEE_PAUSE) * self.speed), self.period - 1)
+
+    def window(self, offset: int) -> np.ndarray:
+        """Get the visible part of the strip.
+
+        Args:
+            offset: Strip column at the window's left edge
+
+        Returns:
+            (height, width) boolean view of the strip
+        """
+        return self.strip[:, offset:offset + self.width]
+
+    def draw(self, canvas: Any, x: int, y: int, rgb: Tuple[int, int, int], offset: int) -> None:
+        """Paint the lit pixels of the window onto a canvas.
+
+        The window area must already be blank.
+
+        Args:
+            canvas: FrameBuffer or rgbmatrix canvas
+            x: Column of the window's left edge
+            y: Row of the strip's top
+            rgb: Text color
+            offset: Strip column at the window's left edge
+        """
+        window = self.window(offset)
+        if hasattr(canvas, "blit_mask"):
+            canvas.blit_mask(window, x, y, rgb)
+            return
+        r, g, b = rgb
+        rows, columns = np.nonzero(window)
+        for row, column in zip(rows.tolist(), columns.tolist()):
+            canvas.SetPixel(x + column, y + row, r, g, b)
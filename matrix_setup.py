@@ -1,45 +1,77 @@
 import platform
 import sys
 import os
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
 
-from rgbmatrix import RGBMatrix, RGBMatrixOptions, graphics
+from layout import compile_layout, layout_from_env
+from startup import CACHE_DIR
 
-# Constants for layout
-PANEL_WIDTH = 64  # Width of a single panel
-MATRIX_WIDTH = PANEL_WIDTH * 2  # Two panels chained
-MATRIX_HEIGHT = 32
-PADDING_X = 2
-PADDING_Y = 2  # Reduced from 4 to move top circle up
-CENTER_GAP = 6  # Increased from 4 to create more separation between rows
-ROW_HEIGHT = 10
+# Hardware and NumPy modules are imported in initialize_matrix, only once
+# it is known which ones this display needs
 
-# Row component measurements
-CIRCLE_WIDTH = 13  # Updated circle diameter
-FIRST_GAP = 3
-LINE_NAME_WIDTH = 72  # Exact width for line name
-SECOND_GAP = 5  # Previously updated
-MINUTES_WIDTH = 34  # Previously updated
+# Panel arrangement and the position of every row, compiled once from
+# MATRIX_LAYOUT (see layout.py)
+LAYOUT = compile_layout(layout_from_env())
+MATRIX_WIDTH = LAYOUT.width
+MATRIX_HEIGHT = LAYOUT.height
 
 # Get the base directory of the project
 # Font path relative to project root - using 5x8 font for narrower spacing
 script_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.dirname(script_dir)
 font_path = "/home/matrix/matrix-controller/assets/fonts/6x10.bdf"
+BUNDLED_FONT_PATH = os.path.join(script_dir, "assets", "fonts", "6x10.bdf")
+# Compiled copies of BDF fonts, loaded instead of re-parsing them
+FONT_CACHE_DIR = os.path.join(CACHE_DIR, "fonts")
+
+# "native" draws through rgbmatrix.graphics; "numpy" composes each frame in a
+# NumPy framebuffer and uploads it with a single SetImage call
+MATRIX_BACKEND = os.environ.get("MATRIX_BACKEND", "native")
+
+# "virtual" renders into an in-memory matrix that records every frame, on any
+# platform and without GPIO; frames are written to VIRTUAL_DUMP_DIR if set
+MATRIX_DISPLAY = os.environ.get("MATRIX_DISPLAY", "hardware")
+VIRTUAL_DUMP_DIR = os.environ.get("VIRTUAL_DUMP_DIR")
+VIRTUAL_DUMP_FORMAT = os.environ.get("VIRTUAL_DUMP_FORMAT", "ppm")
+
+def load_numpy_font() -> Tuple[Any, Any]:
+    """Load the bundled font for the numpy backend, through the font cache.
+
+    Returns:
+        Tuple of (font, graphics module)
+    """
+    import numpy_graphics  # pylint: disable=import-outside-toplevel
+    from bdf_font import load_bdf_font  # pylint: disable=import-outside-toplevel
+    return load_bdf_font(BUNDLED_FONT_PATH, FONT_CACHE_DIR), numpy_graphics
 
 def initialize_matrix() -> Dict[str, Any]:
     """Initialize and return the matrix and related objects based on platform.
     
     Returns:
-        Dictionary containing matrix, font, graphics objects and is_mock flag.
+        Dictionary containing matrix, font, graphics objects, the rendering
+        backend name and is_mock flag.
         If not running on Linux (Raspberry Pi), returns mock objects.
+        With MATRIX_DISPLAY=virtual, returns a VirtualMatrix on any platform.
     """
+    if MATRIX_DISPLAY == "virtual":
+        from virtual_matrix import VirtualMatrix  # pylint: disable=import-outside-toplevel
+        font, graphics_lib = load_numpy_font()
+        return {
+            "matrix": VirtualMatrix(
+                MATRIX_WIDTH, MATRIX_HEIGHT,
+                dump_dir=VIRTUAL_DUMP_DIR, dump_format=VIRTUAL_DUMP_FORMAT
+            ),
+            "font": font,
+            "graphics": graphics_lib,
+            "backend": MATRIX_BACKEND,
+            "is_mock": False
+        }
     if platform.system() == "Linux":
+        from rgbmatrix import RGBMatrix, RGBMatrixOptions  # pylint: disable=import-outside-toplevel
         options = RGBMatrixOptions()
-        options.rows = 32  # Each panel is 16 rows high
-        options.cols = 64  # Each panel is 64 columns wide
-        options.chain_length = 2  # Two panels chained horizontally
-        options.parallel = 1
+        # Panel size, chain length, parallel chains and pixel mapper
+        for name, value in LAYOUT.matrix_options().items():
+            setattr(options, name, value)
         options.hardware_mapping = 'adafruit-hat'
         options.disable_hardware_pulsing = True
 
@@ -52,15 +84,22 @@ def initialize_matrix() -> Dict[str, Any]:
 
 
         matrix = RGBMatrix(options=options)
-        font = graphics.Font()
         
-        # Load the font from our assets directory
-        font.LoadFont(font_path)
+        if MATRIX_BACKEND == "numpy":
+            font, graphics_lib = load_numpy_font()
+        else:
+            from rgbmatrix import graphics  # pylint: disable=import-outside-toplevel
+            font = graphics.Font()
+            
+            # Load the font from our assets directory, or the copy in this checkout
+            font.LoadFont(font_path if os.path.exists(font_path) else BUNDLED_FONT_PATH)
+            graphics_lib = graphics
         
         return {
             "matrix": matrix,
             "font": font,
-            "graphics": graphics,
+            "graphics": graphics_lib,
+            "backend": MATRIX_BACKEND,
             "is_mock": False
         }
     else:
@@ -69,6 +108,7 @@ def initialize_matrix() -> Dict[str, Any]:
             "matrix": None,
             "font": None,
             "graphics": None,
+            "backend": MATRIX_BACKEND,
             "is_mock": True
         }
 
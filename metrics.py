@@ -0,0 +1,201 @@
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# Observations kept per timer for the rolling quantiles
+HISTOGRAM_WINDOW = 1024
+QUANTILES = (0.5, 0.95, 0.99)
+METRIC_PREFIX = "train_display"
+
+
+class RollingHistogram:
+    """Quantiles over the most recent observations, plus lifetime count and sum."""
+
+    def __init__(self, window: int = HISTOGRAM_WINDOW):
+        """Initialize the histogram.
+
+        Args:
+            window: Number of recent observations the quantiles cover
+        """
+        self.values: Deque[float] = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        """Record one observation.
+
+        Args:
+            value: The observed value (seconds for timers)
+        """
+        self.values.append(value)
+        self.count += 1
+        self.total += value
+
+    def quantile(self, q: float) -> float:
+        """Get a quantile of the recent observations (nearest rank).
+
+        Args:
+            q: Quantile between 0 and 1
+
+        Returns:
+            The quantile, or NaN with no observations
+        """
+        if not self.values:
+            return math.nan
+        ordered = sorted(self.values)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class Metrics:
+    """Timers, counters and gauges for the display, exportable as Prometheus text."""
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self.timers: Dict[str, RollingHistogram] = {}
+        self.counters: Dict[str, int] = {}
+        self.gauges: Dict[str, float] = {}
+        self.started_at = time.time()
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Record a duration in a timer.
+
+        Args:
+            name: Timer name (e.g. "fetch")
+            seconds: Duration in seconds
+        """
+        timer = self.timers.get(name)
+        if timer is None:
+            timer = self.timers[name] = RollingHistogram()
+        timer.observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """Time the enclosed block into a timer.
+
+        Args:
+            name: Timer name
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def inc(self, name: str, amount: int = 1) -> None:
+        """Increase a counter.
+
+        Args:
+            name: Counter name (e.g. "bad_responses")
+            amount: Amount to add
+        """
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set(self, name: str, value: float) -> None:
+        """Set a gauge.
+
+        Args:
+            name: Gauge name (e.g. "last_success_timestamp")
+            value: New value
+        """
+        self.gauges[name] = value
+
+    def render_prometheus(self) -> str:
+        """Format every metric in the Prometheus text exposition format.
+
+        Returns:
+            The exposition text
+        """
+        lines = []
+        for name, timer in sorted(self.timers.items()):
+            metric = f"{METRIC_PREFIX}_{name}_seconds"
+            lines.append(f"# TYPE {metric} summary")
+            for q in QUANTILES:
+                lines.append(f'{metric}{{quantile="{q}"}} {timer.quantile(q):.6f}')
+            lines.append(f"{metric}_sum {timer.total:.6f}")
+            lines.append(f"{metric}_count {timer.count}")
+        for name, value in sorted(self.counters.items()):
+            metric = f"{METRIC_PREFIX}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        gauges = dict(self.gauges, uptime_seconds=time.time() - self.started_at)
+        for name, value in sorted(gauges.items()):
+            metric = f"{METRIC_PREFIX}_{name}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self) -> str:
+        """Format a human readable summary of every metric.
+
+        Returns:
+            One line per metric
+        """
+        lines = []
+        for name, timer in sorted(self.timers.items()):
+            quantiles = " ".join(
+                f"p{int(q * 100)}={timer.quantile(q) * 1000:.1f}ms" for q in QUANTILES
+            )
+            lines.append(f"{name}: n={timer.count} {quantiles}")
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"{name}: {value}")
+        for name, value in sorted(self.gauges.items()):
+            lines.append(f"{name}: {value}")
+        last_success = self.gauges.get("last_success_timestamp")
+        if last_success:
+            lines.append(f"seconds since last success: {time.time() - last_success:.1f}")
+        return "\n".join(lines)
+
+
+# Shared registry for the whole process
+METRICS = Metrics()
+
+
+async def _handle_metrics_request(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+) -> None:
+    """Answer one HTTP request: GET /metrics, anything else is a 404."""
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), 5.0)
+        while (await asyncio.wait_for(reader.readline(), 5.0)) not in (b"\r\n", b"\n", b""):
+            pass
+        parts = request_line.decode("latin-1").split()
+        if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+            status, body = "200 OK", METRICS.render_prometheus().encode("utf-8")
+        else:
+            status, body = "404 Not Found", b"Not found\n"
+        writer.write(
+            f"HTTP/1.1 {status}\r\n"
+            "Content-Type: text/plain; version=0.0.4\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n".encode("latin-1") + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(host: str, port: int) -> Optional[asyncio.AbstractServer]:
+    """Serve /metrics over HTTP in the running event loop.
+
+    Args:
+        host: Interface to bind
+        port: Port to bind
+
+    Returns:
+        The server, or None if it could not be started
+    """
+    try:
+        server = await asyncio.start_server(_handle_metrics_request, host, port)
+    except OSError as e:
+        logger.error("Could not start metrics server on %s:%s: %s", host, port, e)
+        return None
+    logger.info("Serving metrics at http://%s:%s/metrics", host, port)
+    return server
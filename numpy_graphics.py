@@ -0,0 +1,59 @@
+"""Drop-in for the rgbmatrix.graphics module that draws into a FrameBuffer.
+
+Renderers take a graphics object and a canvas; passing this module together
+with a framebuffer.FrameBuffer makes them compose the frame in NumPy instead
+of calling into the hardware library once per pixel or string.
+"""
+from typing import Any
+
+from bdf_font import BdfFont as Font  # pylint: disable=unused-import
+
+
+class Color:
+    """An RGB color, matching rgbmatrix.graphics.Color."""
+
+    __slots__ = ("red", "green", "blue")
+
+    def __init__(self, red: int = 0, green: int = 0, blue: int = 0):
+        self.red = red
+        self.green = green
+        self.blue = blue
+
+    @property
+    def rgb(self):
+        """The color as an (r, g, b) tuple."""
+        return (self.red, self.green, self.blue)
+
+
+def DrawText(canvas: Any, font: Font, x: int, y: int, color: Color, text: str) -> int:  # pylint: disable=invalid-name
+    """Draw text with its baseline at y.
+
+    Returns:
+        The total advance in pixels
+    """
+    return canvas.draw_text(font, x, y, color.rgb, text)
+
+
+def DrawLine(canvas: Any, x0: int, y0: int, x1: int, y1: int, color: Color) -> None:  # pylint: disable=invalid-name
+    """Draw a line between two points, inclusive."""
+    if y0 == y1 or x0 == x1:
+        canvas.fill_rect(x0, y0, x1, y1, color.rgb)
+        return
+
+    # Bresenham for the general case
+    dx, dy = abs(x1 - x0), -abs(y1 - y0)
+    step_x = 1 if x0 < x1 else -1
+    step_y = 1 if y0 < y1 else -1
+    error = dx + dy
+    r, g, b = color.rgb
+    while True:
+        canvas.SetPixel(x0, y0, r, g, b)
+        if x0 == x1 and y0 == y1:
+            return
+        doubled = 2 * error
+        if doubled >= dy:
+            error += dy
+            x0 += step_x
+        if doubled <= dx:
+            error += dx
+            y0 += step_y
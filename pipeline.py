@@ -0,0 +1,228 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, NamedTuple, Optional
+
+from countdown import Countdown, TICK_INTERVAL
+from log_pipeline import PAYLOADS
+from metrics import METRICS
+from poll_scheduler import PollScheduler
+from state_store import StateStore
+from train_client import BadResponseError, TrainApiClient
+from train_record import TrainArrival
+
+logger = logging.getLogger(__name__)
+
+
+class FetchResult(NamedTuple):
+    """What the fetcher learned from one poll."""
+    trains: Optional[List[TrainArrival]]
+    error: Optional[str]
+    received_at: float
+
+
+class LatestValue:
+    """A single-slot mailbox: publishing overwrites, readers see only the newest value.
+
+    The fetcher never waits for the renderer and the renderer never waits
+    for the network; it simply picks up whatever was published last.
+    """
+
+    def __init__(self):
+        """Initialize an empty slot."""
+        self.value: Optional[FetchResult] = None
+        self.version = 0
+        # Last time the API answered successfully, even if nothing changed
+        self.fresh_at: Optional[float] = None
+        self._changed = asyncio.Event()
+
+    def publish(self, value: FetchResult) -> None:
+        """Replace the slot's value.
+
+        Args:
+            value: The newest fetch result
+        """
+        self.value = value
+        self.version += 1
+        if value.error is None:
+            self.fresh_at = value.received_at
+        self._changed.set()
+
+    def mark_fresh(self, now: Optional[float] = None) -> None:
+        """Record a successful poll that returned nothing new.
+
+        Args:
+            now: Time of the poll (defaults to time.time())
+        """
+        self.fresh_at = time.time() if now is None else now
+
+    async def wait(self, version: int, timeout: float) -> bool:
+        """Wait until the slot holds something newer than version.
+
+        Args:
+            version: The version the caller has already seen
+            timeout: Maximum seconds to wait
+
+        Returns:
+            True if a newer value is available
+        """
+        if self.version != version:
+            return True
+        self._changed.clear()
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.version != version
+
+
+def error_rows(message: str, rows: int = 1) -> List[TrainArrival]:
+    """Build placeholder trains that show an error message.
+
+    Args:
+        message: Status text to show
+        rows: Number of rows to fill
+
+    Returns:
+        Trains for display_trains
+    """
+    return [TrainArrival("?", message, False)] * rows
+
+
+async def fetch_loop(
+    client: TrainApiClient,
+    slot: LatestValue,
+    scheduler: PollScheduler,
+    store: Optional[StateStore] = None,
+    initial_delay: float = 0.0
+) -> None:
+    """Poll the API forever and publish each result into the slot.
+
+    Args:
+        client: The train API client
+        slot: Slot the renderer reads from
+        scheduler: Decides how long to wait after each poll
+        store: Where each new train list is persisted, if anywhere
+        initial_delay: Seconds to wait before the first poll
+    """
+    if initial_delay > 0:
+        await asyncio.sleep(initial_delay)
+    while True:
+        try:
+            trains = await client.fetch()
+            delay = scheduler.on_success(trains)
+            if trains is None:  # Unchanged since the last poll
+                slot.mark_fresh()
+            else:
+                PAYLOADS.record("poll", trains)
+                logger.debug("Response: %s", trains)
+                received_at = time.time()
+                slot.publish(FetchResult(trains, None, received_at))
+                if store is not None:
+                    await asyncio.get_running_loop().run_in_executor(
+                        None, store.save, trains, received_at
+                    )
+        except BadResponseError as e:
+            logger.warning("Bad response: %s", e.response)
+            METRICS.inc("bad_responses")
+            slot.publish(FetchResult(None, "Bad response", time.time()))
+            delay = scheduler.on_error()
+        except Exception as e:
+            logger.warning("Error: %s", e)
+            METRICS.inc("fetch_errors")
+            client.reset()
+            slot.publish(FetchResult(None, str(e), time.time()))
+            delay = scheduler.on_error()
+        await asyncio.sleep(delay)
+
+
+def draw_frame(controller: Any, trains: Optional[List[TrainArrival]], stale: bool) -> None:
+    """Run one render tick on the matrix thread.
+
+    The controller's refresh settings are updated first, so a brightness
+    change is drawn in the same tick. Only rows whose content changed are
+    redrawn.
+
+    Args:
+        controller: The matrix controller object
+        trains: Trains to show, or None while there is nothing to show
+        stale: Whether to show the stale data indicator
+    """
+    controller.tick()
+    if trains is not None:
+        controller.display_trains(trains, stale)
+
+
+async def render_loop(
+    controller: Any,
+    slot: LatestValue,
+    executor: ThreadPoolExecutor,
+    max_staleness: float,
+    cadence: float = TICK_INTERVAL,
+    stale_after: Optional[float] = None
+) -> None:
+    """Draw the newest data at a fixed cadence, independently of polling.
+
+    Matrix calls block, so they run on the executor's thread and the event
+    loop stays free for the fetcher. During an outage the last good trains
+    keep counting down; errors are only shown when there is nothing to
+    count down. While text on screen scrolls, frames are drawn as often as
+    the scrolling needs.
+
+    Args:
+        controller: The matrix controller object
+        slot: Slot the fetcher publishes into
+        executor: Single-thread executor that owns the matrix
+        max_staleness: Seconds after the last successful poll before the
+            countdown is replaced with a "No data" row
+        cadence: Seconds between frames
+        stale_after: Seconds after the last successful poll before the
+            stale data indicator is lit (never if None)
+    """
+    loop = asyncio.get_running_loop()
+    countdown = Countdown()
+    seen_version = 0
+    trains: Optional[List[TrainArrival]] = None
+    # Last successful poll before "No data" was shown, so the outage is
+    # logged once when it starts and once when it ends
+    outage_from: Optional[float] = None
+
+    while True:
+        if slot.version != seen_version:
+            seen_version = slot.version
+            result = slot.value
+            if result.error is None:
+                countdown.update(result.trains, now=result.received_at)
+            elif countdown.updated_at is None:
+                # Nothing to fall back on
+                rows = 2 if result.error == "Bad response" else 1
+                trains = error_rows(result.error, rows)
+
+        now = time.time()
+        stale = False
+        if countdown.updated_at is not None:
+            age = now - (slot.fresh_at if slot.fresh_at is not None else countdown.updated_at)
+            if age > max_staleness:
+                if outage_from is None:
+                    outage_from = now - age
+                    logger.warning("No successful poll for %.0fs", age)
+                countdown.clear()
+                trains = error_rows("No data")
+            else:
+                if outage_from is not None:
+                    logger.info("Polling recovered after %.0fs", now - age - outage_from)
+                    outage_from = None
+                trains = countdown.trains(now)
+                stale = stale_after is not None and age > stale_after
+
+        try:
+            with METRICS.timer("render"):
+                await loop.run_in_executor(executor, draw_frame, controller, trains, stale)
+        except Exception as e:
+            logger.error("Render error: %s", e)
+            METRICS.inc("render_errors")
+        scroll_interval = controller.scroll_interval()
+        await slot.wait(
+            seen_version, cadence if scroll_interval is None else min(cadence, scroll_interval)
+        )
@@ -0,0 +1,129 @@
+import logging
+import os
+import random
+import time
+from typing import List, Optional
+
+from countdown import MINUTES_STATUS
+from metrics import METRICS
+from train_record import TrainArrival
+
+logger = logging.getLogger(__name__)
+
+# Poll interval used until there is an arrival to go by
+POLLING_INTERVAL = float(os.environ.get("POLLING_INTERVAL", "60"))
+# Bounds on the time between polls, in seconds
+POLL_MIN_INTERVAL = float(os.environ.get("POLL_MIN_INTERVAL", "15"))
+POLL_MAX_INTERVAL = float(os.environ.get("POLL_MAX_INTERVAL", "120"))
+# Poll again once this fraction of the time to the next arrival has passed
+PROXIMITY_FRACTION = 0.5
+# Each poll in a row that finds nothing new waits this much longer
+UNCHANGED_GROWTH = 1.5
+
+
+class PollScheduler:
+    """Chooses when to poll next.
+
+    Polls come sooner as the next train gets closer, spread out while
+    responses keep coming back unchanged, and back off exponentially with
+    jitter while polls fail, always within [min_interval, max_interval].
+    Every decision is logged with its reason so the request rate can be
+    audited.
+    """
+
+    def __init__(
+        self,
+        interval: float = POLLING_INTERVAL,
+        min_interval: float = POLL_MIN_INTERVAL,
+        max_interval: float = POLL_MAX_INTERVAL,
+        rng: Optional[random.Random] = None
+    ):
+        """Initialize the scheduler.
+
+        Args:
+            interval: Delay used when no arrival time is known
+            min_interval: Shortest delay between polls
+            max_interval: Longest delay between polls
+            rng: Random source for the backoff jitter
+        """
+        self.interval = interval
+        self.min_interval = min(min_interval, max_interval)
+        self.max_interval = max_interval
+        self.rng = rng or random.Random()
+        self.failures = 0
+        self.unchanged = 0
+        self.delay = self._clamp(interval)
+        self.reason = "initial interval"
+        # time.time() of every timed arrival in the last train list
+        self._arrivals: List[float] = []
+
+    def _clamp(self, delay: float) -> float:
+        return min(max(delay, self.min_interval), self.max_interval)
+
+    def _decide(self, delay: float, reason: str, kind: str) -> float:
+        """Record and log a decision."""
+        self.delay = self._clamp(delay)
+        self.reason = reason
+        METRICS.inc(f"poll_decisions_{kind}")
+        METRICS.set("next_poll_delay_seconds", self.delay)
+        logger.info("Next poll in %.0fs: %s", self.delay, reason)
+        return self.delay
+
+    def _soonest_arrival(self, now: float) -> Optional[float]:
+        """Get the seconds until the soonest arrival still ahead, if any."""
+        upcoming = [arrives_at - now for arrives_at in self._arrivals if arrives_at > now]
+        return min(upcoming) if upcoming else None
+
+    def on_success(
+        self, trains: Optional[List[TrainArrival]], now: Optional[float] = None
+    ) -> float:
+        """Choose the delay after a successful poll.
+
+        Args:
+            trains: The new train list, or None if it was unchanged
+            now: Time of the poll (defaults to time.time())
+
+        Returns:
+            Seconds until the next poll
+        """
+        now = time.time() if now is None else now
+        if self.failures:
+            logger.info("Polling recovered after %d failure(s)", self.failures)
+        self.failures = 0
+
+        if trains is not None:
+            self.unchanged = 0
+            # Arrivals sit in the middle of their minute, as in Countdown
+            self._arrivals = [
+                now + (int(match.group(1)) + 0.5) * 60
+                for match in (MINUTES_STATUS.match(train.status) for train in trains)
+                if match
+            ]
+        else:
+            self.unchanged += 1
+
+        eta = self._soonest_arrival(now)
+        if eta is not None:
+            delay, reason, kind = eta * PROXIMITY_FRACTION, f"next train in {eta:.0f}s", "proximity"
+        else:
+            delay, reason, kind = self.interval, "no arrival times listed", "interval"
+        if self.unchanged:
+            delay *= UNCHANGED_GROWTH ** self.unchanged
+            reason += f", unchanged {self.unchanged}x"
+            kind = "unchanged"
+        return self._decide(delay, reason, kind)
+
+    def on_error(self) -> float:
+        """Choose the delay after a failed poll.
+
+        The delay doubles with every failure in a row, starting from twice
+        the minimum interval, and is then jittered down by up to half so
+        that displays restarted together do not poll in lockstep.
+
+        Returns:
+            Seconds until the next poll
+        """
+        self.failures += 1
+        ceiling = min(self.min_interval * 2 ** self.failures, self.max_interval)
+        delay = self.rng.uniform(ceiling / 2, ceiling)
+        return self._decide(delay, f"failure {self.failures} in a row, backing off", "backoff")
@@ -0,0 +1,250 @@
+import asyncio
+import logging
+import time
+from typing import Any, AsyncIterator, Callable, List, NamedTuple, Optional
+
+import httpx
+
+from log_pipeline import PAYLOADS
+from metrics import METRICS
+from pipeline import FetchResult, LatestValue, fetch_loop
+from poll_scheduler import PollScheduler
+from state_store import StateStore
+from train_client import BadResponseError, TrainApiClient
+from train_record import decode_trains
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait before reconnecting, until the server sends its own "retry:"
+PUSH_RETRY = 3.0
+# Longest wait between reconnect attempts
+PUSH_MAX_RETRY = 60.0
+# Seconds without a byte from the server (events or keepalive comments)
+# before the subscription is considered dead
+PUSH_READ_TIMEOUT = 45.0
+# Failed connections in a row before falling back to polling
+PUSH_MAX_FAILURES = 3
+# Seconds to poll before trying to subscribe again
+PUSH_FALLBACK_PERIOD = 300.0
+# Status codes meaning the server has no event stream at this URL
+PUSH_UNSUPPORTED_STATUSES = (404, 405, 406, 501)
+
+
+class PushUnavailableError(Exception):
+    """The server does not offer an event stream at the push URL."""
+
+
+class ServerEvent(NamedTuple):
+    """One Server-Sent Event."""
+    event: str
+    data: str
+    id: Optional[str]
+
+
+class SseParser:
+    """Turns the lines of a text/event-stream into events.
+
+    Follows the Server-Sent Events format: "data:" lines accumulate until
+    a blank line dispatches the event, the last "id:" is remembered across
+    events and "retry:" sets the reconnection delay.
+    """
+
+    def __init__(self, last_id: Optional[str] = None):
+        """Initialize the parser.
+
+        Args:
+            last_id: Event ID to start from, as sent in Last-Event-ID
+        """
+        self.last_id = last_id
+        self.retry: Optional[float] = None
+        self._event = ""
+        self._data: List[str] = []
+
+    def feed(self, line: str) -> Optional[ServerEvent]:
+        """Process one line, without its line ending.
+
+        Args:
+            line: The line
+
+        Returns:
+            The event the line completes, if any
+        """
+        if not line:
+            if not self._data:
+                self._event = ""
+                return None
+            event = ServerEvent(self._event or "message", "\n".join(self._data), self.last_id)
+            self._event = ""
+            self._data = []
+            return event
+        if line.startswith(":"):
+            return None  # Comment, used as a keepalive
+        field, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+        if field == "data":
+            self._data.append(value)
+        elif field == "event":
+            self._event = value
+        elif field == "id" and "\0" not in value:
+            self.last_id = value
+        elif field == "retry" and value.isdigit():
+            self.retry = int(value) / 1000
+        return None
+
+
+class TrainPushClient:
+    """Holds a Server-Sent Events subscription to the train API.
+
+    Every event carries the full train list as JSON, in the same format
+    polling returns. The ID of the last event received is sent back as
+    Last-Event-ID on reconnect, so the server only resends the trains if
+    they changed in between.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        timeout: float = 5.0,
+        read_timeout: float = PUSH_READ_TIMEOUT,
+        decode: Callable[[bytes], Any] = decode_trains
+    ):
+        """Initialize the client.
+
+        Args:
+            url: The event stream URL
+            timeout: Connect and write timeout in seconds
+            read_timeout: Seconds of silence after which the stream is dropped
+            decode: Turns an event's data into the trains subscribe yields
+        """
+        self.url = url
+        self.decode = decode
+        self.last_event_id: Optional[str] = None
+        self.retry = PUSH_RETRY
+        self._client = httpx.AsyncClient(timeout=httpx.Timeout(timeout, read=read_timeout))
+
+    async def __aenter__(self) -> "TrainPushClient":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Close the connection."""
+        await self._client.aclose()
+
+    async def subscribe(self) -> AsyncIterator[Optional[Any]]:
+        """Subscribe and yield train lists as the server pushes them.
+
+        Yields:
+            The decoded trains for each event, or None whenever the server
+            shows it is alive without sending anything new (on connect and
+            on keepalive comments)
+
+        Raises:
+            PushUnavailableError: If the server has no event stream here
+            BadResponseError: If the server answers with another error
+            httpx.HTTPError: On network errors and read timeouts
+            ValueError: If an event cannot be decoded
+        """
+        headers = {"Accept": "text/event-stream", "Cache-Control": "no-cache"}
+        if self.last_event_id is not None:
+            headers["Last-Event-ID"] = self.last_event_id
+        async with self._client.stream("GET", self.url, headers=headers) as resp:
+            if resp.status_code in PUSH_UNSUPPORTED_STATUSES:
+                raise PushUnavailableError(f"status {resp.status_code}")
+            if resp.status_code != 200:
+                raise BadResponseError(resp)
+            content_type = resp.headers.get("Content-Type", "")
+            if not content_type.startswith("text/event-stream"):
+                raise PushUnavailableError(f"content type {content_type or 'missing'}")
+            METRICS.inc("push_connects")
+            METRICS.set("last_success_timestamp", time.time())
+            yield None
+
+            parser = SseParser(self.last_event_id)
+            async for line in resp.aiter_lines():
+                if line.startswith(":"):
+                    METRICS.set("last_success_timestamp", time.time())
+                    yield None
+                    continue
+                event = parser.feed(line)
+                if parser.retry is not None:
+                    self.retry = parser.retry
+                if event is None or event.event not in ("message", "trains"):
+                    continue
+                METRICS.inc("push_events")
+                with METRICS.timer("decode"):
+                    trains = self.decode(event.data.encode("utf-8"))
+                self.last_event_id = event.id
+                METRICS.set("last_success_timestamp", time.time())
+                yield trains
+
+
+async def push_loop(
+    push: TrainPushClient,
+    poll_client: TrainApiClient,
+    slot: LatestValue,
+    scheduler: PollScheduler,
+    store: Optional[StateStore] = None
+) -> None:
+    """Publish pushed train lists into the slot as they arrive, forever.
+
+    Dropped subscriptions are resumed after the server's retry delay,
+    backing off while they keep failing. When the server has no event
+    stream, or it fails PUSH_MAX_FAILURES times in a row, the trains are
+    polled for PUSH_FALLBACK_PERIOD seconds before subscribing again.
+    The push client is closed when the loop ends.
+
+    Args:
+        push: The push client
+        poll_client: Client used while falling back to polling
+        slot: Slot the renderer reads from
+        scheduler: Decides when to poll while falling back
+        store: Where each new train list is persisted, if anywhere
+    """
+    loop = asyncio.get_running_loop()
+    failures = 0
+    try:
+        while True:
+            fall_back = False
+            try:
+                async for trains in push.subscribe():
+                    failures = 0
+                    if trains is None:
+                        slot.mark_fresh()
+                        continue
+                    PAYLOADS.record("push", trains)
+                    logger.debug("Pushed: %s", trains)
+                    received_at = time.time()
+                    slot.publish(FetchResult(trains, None, received_at))
+                    if store is not None:
+                        await loop.run_in_executor(None, store.save, trains, received_at)
+                logger.info("Push stream closed by the server")
+            except PushUnavailableError as e:
+                logger.warning("Push unavailable: %s", e)
+                fall_back = True
+            except (OSError, httpx.HTTPError, BadResponseError, ValueError) as e:
+                logger.warning("Push error: %s", e)
+                METRICS.inc("push_errors")
+                failures += 1
+                slot.publish(FetchResult(None, str(e), time.time()))
+                fall_back = failures >= PUSH_MAX_FAILURES
+
+            if fall_back:
+                logger.info("Polling for %.0fs before subscribing again", PUSH_FALLBACK_PERIOD)
+                METRICS.inc("push_fallbacks")
+                failures = 0
+                try:
+                    await asyncio.wait_for(
+                        fetch_loop(poll_client, slot, scheduler, store), PUSH_FALLBACK_PERIOD
+                    )
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            delay = min(push.retry * 2 ** max(failures - 1, 0), PUSH_MAX_RETRY)
+            logger.info("Resubscribing in %.0fs", delay)
+            await asyncio.sleep(delay)
+    finally:
+        await push.aclose()
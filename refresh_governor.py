@@ -0,0 +1,293 @@
+import logging
+import os
+import re
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+# Set to 0 to keep the matrix at its startup refresh settings
+REFRESH_GOVERNOR = os.environ.get("REFRESH_GOVERNOR", "1") != "0"
+# Local time span (HH:MM-HH:MM, may wrap past midnight) when static content
+# is shown with the night profile; empty to never use it
+GOVERNOR_NIGHT = os.environ.get("GOVERNOR_NIGHT", "01:00-05:00")
+# Seconds of frame history the frame rate is measured over
+FRAME_WINDOW = 5.0
+# Frames per second above which the content counts as animated
+ACTIVE_FPS = 2.0
+# Seconds without animation before stepping down from the active profile
+STEP_DOWN_AFTER = 10.0
+# Seconds between temperature readings
+TEMPERATURE_INTERVAL = 10.0
+TEMPERATURE_PATH = "/sys/class/thermal/thermal_zone0/temp"
+# GOVERNOR_NIGHT's format, spaces allowed around the times
+TIME_SPAN = re.compile(r"\s*(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})\s*")
+
+
+class RefreshProfile(NamedTuple):
+    """Matrix settings that can be changed while it runs.
+
+    Fewer PWM bits means fewer bit planes per refresh, so with the refresh
+    rate capped the refresh thread spends more of each cycle asleep.
+    """
+    name: str
+    pwm_bits: int
+    brightness: int
+
+
+class ProfileStats:
+    """Wall time, CPU time and temperature accumulated while a profile was in use."""
+
+    def __init__(self):
+        """Initialize empty stats."""
+        self.seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.temperature_total = 0.0
+        self.temperature_samples = 0
+
+    @property
+    def cpu_percent(self) -> Optional[float]:
+        """Process CPU use as a percentage of one core, refresh thread included."""
+        return self.cpu_seconds / self.seconds * 100 if self.seconds else None
+
+    @property
+    def temperature(self) -> Optional[float]:
+        """Mean SoC temperature in degrees Celsius, if it could be read."""
+        if not self.temperature_samples:
+            return None
+        return self.temperature_total / self.temperature_samples
+
+
+def read_temperature(path: str = TEMPERATURE_PATH) -> Optional[float]:
+    """Read the SoC temperature.
+
+    Args:
+        path: Thermal zone file holding millidegrees Celsius
+
+    Returns:
+        Degrees Celsius, or None where there is no such sensor
+    """
+    try:
+        with open(path, encoding="ascii") as f:
+            return int(f.read().strip()) / 1000
+    except (OSError, ValueError):
+        return None
+
+
+def parse_time_span(span: str) -> Optional[Tuple[int, int]]:
+    """Parse "HH:MM-HH:MM" into minutes after midnight.
+
+    Args:
+        span: The span, or an empty string
+
+    Returns:
+        Tuple of (start, end) minutes, or None if span is empty
+
+    Raises:
+        ValueError: If span is malformed or a time is out of range
+    """
+    if not span:
+        return None
+    match = TIME_SPAN.fullmatch(span)
+    if match is None:
+        raise ValueError(f"{span!r} is not a HH:MM-HH:MM time span")
+    start_hours, start_mins, end_hours, end_mins = (int(part) for part in match.groups())
+    if max(start_hours, end_hours) > 23 or max(start_mins, end_mins) > 59:
+        raise ValueError(f"{span!r} has a time outside 00:00-23:59")
+    return start_hours * 60 + start_mins, end_hours * 60 + end_mins
+
+
+class RefreshGovernor:
+    """Switches the matrix between refresh profiles to match what is on screen.
+
+    Content that animates (scrolling text, a frame every second or more)
+    gets the profile the matrix started with. Content that only changes
+    every few seconds or less gets fewer PWM bits, and during the night
+    span also a lower brightness. Stepping up is immediate; stepping down
+    waits until nothing has animated for STEP_DOWN_AFTER seconds.
+
+    Each rgbmatrix FrameCanvas has its own PWM bits and brightness, so a
+    profile is applied to the matrix and to every canvas passed to
+    add_canvas(). Brightness is applied as pixels are set, so after it
+    changes the frame on the panel has to be drawn again.
+
+    Call note_frame() for every frame shown and update() regularly, both
+    from the thread that owns the matrix. Process CPU time and SoC
+    temperature are accounted to the profile in use, and reported in the
+    metrics and the log whenever the profile changes.
+    """
+
+    def __init__(
+        self,
+        matrix: Any,
+        static: Optional[RefreshProfile] = None,
+        night: Optional[RefreshProfile] = None,
+        night_span: str = GOVERNOR_NIGHT
+    ):
+        """Initialize the governor, starting in the matrix's own profile.
+
+        Args:
+            matrix: RGBMatrix (or VirtualMatrix) with pwmBits and brightness
+            static: Profile for static content (defaults to 6 PWM bits)
+            night: Profile for static content at night (defaults to 4 PWM
+                bits and half the brightness)
+            night_span: "HH:MM-HH:MM" local time span for the night profile;
+                if empty or malformed, the night profile is never used
+        """
+        self.matrix = matrix
+        active = RefreshProfile("active", matrix.pwmBits, matrix.brightness)
+        self.profiles: Dict[str, RefreshProfile] = {
+            "active": active,
+            "static": static or RefreshProfile("static", min(active.pwm_bits, 6), active.brightness),
+            "night": night or RefreshProfile(
+                "night", min(active.pwm_bits, 4), max(active.brightness // 2, 1)
+            ),
+        }
+        try:
+            self.night_span = parse_time_span(night_span)
+        except ValueError as e:
+            logger.warning("Night profile disabled, GOVERNOR_NIGHT is unusable: %s", e)
+            self.night_span = None
+        self.current = active
+        # The matrix and every frame canvas swapped onto it
+        self.canvases: List[Any] = [matrix]
+        self.stats: Dict[str, ProfileStats] = {name: ProfileStats() for name in self.profiles}
+        self._frames: Deque[float] = deque()
+        self._last_active = time.monotonic()
+        self._accounted_at = self._last_active
+        self._cpu_at = time.process_time()
+        self._temperature_at = 0.0
+
+    def add_canvas(self, canvas: Any) -> None:
+        """Keep a frame canvas at the current profile's settings from now on.
+
+        Cheap enough to call with the canvas handed back by every swap.
+
+        Args:
+            canvas: FrameCanvas drawn on and swapped onto the matrix
+        """
+        for known in self.canvases:
+            if known is canvas:
+                return
+        self.canvases.append(canvas)
+        canvas.pwmBits = self.current.pwm_bits
+        canvas.brightness = self.current.brightness
+
+    def note_frame(self, now: Optional[float] = None) -> None:
+        """Record that a new frame was shown, stepping up at once if content animates.
+
+        Args:
+            now: time.monotonic() (defaults to now)
+        """
+        now = time.monotonic() if now is None else now
+        self._frames.append(now)
+        if self.current.name != "active" and self._animating(now):
+            self.update(now)
+
+    def _animating(self, now: float) -> bool:
+        while self._frames and self._frames[0] < now - FRAME_WINDOW:
+            self._frames.popleft()
+        return len(self._frames) > ACTIVE_FPS * FRAME_WINDOW
+
+    def _is_night(self) -> bool:
+        if self.night_span is None:
+            return False
+        local = time.localtime()
+        minute = local.tm_hour * 60 + local.tm_min
+        start, end = self.night_span
+        if start <= end:
+            return start <= minute < end
+        return minute >= start or minute < end
+
+    def choose(self, now: float) -> RefreshProfile:
+        """Pick the profile the current content calls for.
+
+        Args:
+            now: time.monotonic()
+
+        Returns:
+            The profile
+        """
+        if self._animating(now):
+            self._last_active = now
+            return self.profiles["active"]
+        if self.current.name == "active" and now - self._last_active < STEP_DOWN_AFTER:
+            return self.current
+        return self.profiles["night" if self._is_night() else "static"]
+
+    def update(self, now: Optional[float] = None) -> RefreshProfile:
+        """Account resource use to the current profile and switch if needed.
+
+        Args:
+            now: time.monotonic() (defaults to now)
+
+        Returns:
+            The profile now in use
+        """
+        now = time.monotonic() if now is None else now
+        self._account(now)
+        profile = self.choose(now)
+        if profile != self.current:
+            self.apply(profile)
+        return self.current
+
+    def _account(self, now: float) -> None:
+        stats = self.stats[self.current.name]
+        cpu = time.process_time()
+        stats.seconds += now - self._accounted_at
+        stats.cpu_seconds += cpu - self._cpu_at
+        self._accounted_at = now
+        self._cpu_at = cpu
+        if now - self._temperature_at >= TEMPERATURE_INTERVAL:
+            self._temperature_at = now
+            temperature = read_temperature()
+            if temperature is not None:
+                stats.temperature_total += temperature
+                stats.temperature_samples += 1
+
+    def apply(self, profile: RefreshProfile) -> None:
+        """Switch the matrix and its canvases to a profile.
+
+        Args:
+            profile: The profile to use
+        """
+        for canvas in self.canvases:
+            canvas.pwmBits = profile.pwm_bits
+            canvas.brightness = profile.brightness
+        logger.info(
+            "Refresh profile %s -> %s (%d PWM bits, brightness %d); %s",
+            self.current.name, profile.name, profile.pwm_bits, profile.brightness, self.report()
+        )
+        self.current = profile
+        METRICS.inc("refresh_profile_switches")
+        METRICS.set("refresh_pwm_bits", profile.pwm_bits)
+        METRICS.set("refresh_brightness", profile.brightness)
+        self.publish_metrics()
+
+    def publish_metrics(self) -> None:
+        """Set a gauge for each profile's time, CPU use and temperature."""
+        for name, stats in self.stats.items():
+            METRICS.set(f"refresh_{name}_seconds", stats.seconds)
+            if stats.cpu_percent is not None:
+                METRICS.set(f"refresh_{name}_cpu_percent", stats.cpu_percent)
+            if stats.temperature is not None:
+                METRICS.set(f"refresh_{name}_temperature_celsius", stats.temperature)
+
+    def report(self) -> str:
+        """Summarize each profile's time, CPU use and temperature so far.
+
+        Returns:
+            One clause per profile used
+        """
+        parts = []
+        for name, stats in self.stats.items():
+            if not stats.seconds:
+                continue
+            part = f"{name} {stats.seconds:.0f}s at {stats.cpu_percent:.0f}% CPU"
+            if stats.temperature is not None:
+                part += f", {stats.temperature:.1f}C"
+            parts.append(part)
+        return "; ".join(parts) or "no usage yet"
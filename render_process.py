@@ -0,0 +1,360 @@
+import gc
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+from multiprocessing import shared_memory
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from framebuffer import FrameBuffer
+from log_pipeline import setup_logging
+from matrix_setup import MATRIX_WIDTH, MATRIX_HEIGHT, initialize_matrix, load_numpy_font
+from refresh_governor import REFRESH_GOVERNOR, RefreshGovernor
+
+logger = logging.getLogger(__name__)
+
+# Cores the render process is pinned to; core 3 is kept free of everything
+# else by tune_process() in main.py
+RENDER_CPUS = os.environ.get("RENDER_CPUS", "3")
+# Niceness increment for the render process (needs root to be negative)
+RENDER_NICE = int(os.environ.get("RENDER_NICE", "-15"))
+# Frame slots in shared memory; at least 3, so the writer always has one
+# that holds neither the newest frame nor the one being read
+RING_SLOTS = 4
+# Seconds the render process waits for a frame before checking on its parent
+PARENT_CHECK_INTERVAL = 1.0
+# Header fields: newest frame's sequence number, its slot, slot being read
+LATEST_SEQ, LATEST_SLOT, READING_SLOT = range(3)
+HEADER_BYTES = 3 * 8
+
+
+class FrameRing:
+    """Frames handed from one writer process to one reader through shared memory.
+
+    The block starts with a header of three int64s: the sequence number of
+    the newest frame, the slot holding it and the slot the reader is
+    copying (-1 while it is not reading); the slots' pixels follow. The
+    header is only touched while holding a multiprocessing.Lock shared by
+    both processes, and taking and releasing it orders the pixel copies
+    around it on any CPU. The copies themselves happen outside the lock:
+    the writer fills a slot that is neither the newest nor being read and
+    then publishes it, and the reader claims the newest slot before
+    copying it out, so neither waits for the other's copy.
+    """
+
+    def __init__(
+        self,
+        memory: shared_memory.SharedMemory,
+        width: int,
+        height: int,
+        slots: int,
+        lock: Any
+    ):
+        """Wrap a shared memory block. Use create() or attach() instead.
+
+        Args:
+            memory: The shared memory block
+            width: Frame width in pixels
+            height: Frame height in pixels
+            slots: Number of frames in the ring
+            lock: multiprocessing.Lock guarding the header
+        """
+        self.memory = memory
+        self.width = width
+        self.height = height
+        self.slots = slots
+        self.lock = lock
+        self._header = np.ndarray((3,), np.int64, memory.buf, 0)
+        self._frames = np.ndarray((slots, height, width, 3), np.uint8, memory.buf, HEADER_BYTES)
+        # Only used by the writer
+        self._next_slot = 0
+
+    @staticmethod
+    def size(width: int, height: int, slots: int) -> int:
+        """Bytes needed for a ring of the given shape."""
+        return HEADER_BYTES + slots * height * width * 3
+
+    @classmethod
+    def create(
+        cls, width: int, height: int, slots: int = RING_SLOTS, lock: Optional[Any] = None
+    ) -> "FrameRing":
+        """Allocate a new, empty ring.
+
+        Args:
+            width: Frame width in pixels
+            height: Frame height in pixels
+            slots: Number of frames in the ring
+            lock: multiprocessing.Lock to share with the reader (a new one by default)
+
+        Returns:
+            The ring; its memory.name and lock are passed to attach() in the reader
+
+        Raises:
+            ValueError: For fewer than 3 slots
+        """
+        if slots < 3:
+            raise ValueError(f"A frame ring needs at least 3 slots, not {slots}")
+        memory = shared_memory.SharedMemory(create=True, size=cls.size(width, height, slots))
+        ring = cls(memory, width, height, slots, multiprocessing.Lock() if lock is None else lock)
+        ring._header[:] = (0, -1, -1)
+        return ring
+
+    @classmethod
+    def attach(cls, name: str, width: int, height: int, slots: int, lock: Any) -> "FrameRing":
+        """Open a ring created by another process, with the lock it was created with."""
+        return cls(shared_memory.SharedMemory(name=name), width, height, slots, lock)
+
+    @property
+    def latest(self) -> int:
+        """Sequence number of the newest frame (0 before the first)."""
+        with self.lock:
+            return int(self._header[LATEST_SEQ])
+
+    def write(self, pixels: np.ndarray) -> int:
+        """Publish a frame.
+
+        Args:
+            pixels: (height, width, 3) uint8 frame
+
+        Returns:
+            The frame's sequence number
+        """
+        with self.lock:
+            seq = int(self._header[LATEST_SEQ]) + 1
+            # The reader only ever claims the newest slot, which stays put until
+            # this frame is published
+            busy = (int(self._header[LATEST_SLOT]), int(self._header[READING_SLOT]))
+        slot = self._next_slot
+        while slot in busy:
+            slot = (slot + 1) % self.slots
+        self._next_slot = (slot + 1) % self.slots
+        self._frames[slot] = pixels
+        with self.lock:
+            self._header[LATEST_SEQ] = seq
+            self._header[LATEST_SLOT] = slot
+        return seq
+
+    def read_latest(self, out: np.ndarray, after: int = 0) -> Optional[int]:
+        """Copy the newest frame out if it is newer than after.
+
+        Args:
+            out: (height, width, 3) uint8 array to copy into
+            after: Sequence number of the last frame the caller has
+
+        Returns:
+            The sequence number of the copied frame, or None if there is
+            nothing newer
+        """
+        with self.lock:
+            seq = int(self._header[LATEST_SEQ])
+            if seq <= after:
+                return None
+            slot = int(self._header[LATEST_SLOT])
+            self._header[READING_SLOT] = slot
+        out[:] = self._frames[slot]
+        with self.lock:
+            self._header[READING_SLOT] = -1
+        return seq
+
+    def close(self) -> None:
+        """Detach from the shared memory."""
+        # The views must go before the mapping can be closed
+        del self._header, self._frames
+        self.memory.close()
+
+
+class SharedFrameCanvas(FrameBuffer):
+    """The matrix as seen from the network process.
+
+    Every frame uploaded with SetImage, and every Clear, is published to
+    the ring for the render process to show.
+    """
+
+    def __init__(self, ring: FrameRing, frame_ready: Any):
+        """Initialize the canvas.
+
+        Args:
+            ring: Ring the frames are published to
+            frame_ready: multiprocessing.Event set after each frame
+        """
+        super().__init__(ring.width, ring.height)
+        self.ring = ring
+        self.frame_ready = frame_ready
+
+    def SetImage(self, image: Any, offset_x: int = 0, offset_y: int = 0, unsafe: bool = True) -> None:  # pylint: disable=invalid-name
+        super().SetImage(image, offset_x, offset_y, unsafe)
+        self.publish()
+
+    def Clear(self) -> None:  # pylint: disable=invalid-name
+        super().Clear()
+        self.publish()
+
+    def publish(self) -> None:
+        """Hand the current frame to the render process."""
+        self.ring.write(self.pixels)
+        self.frame_ready.set()
+
+
+def pin_render_process(cpus: str = RENDER_CPUS, niceness: int = RENDER_NICE) -> None:
+    """Pin the calling process to the render cores and raise its priority.
+
+    Args:
+        cpus: Comma separated core numbers
+        niceness: Niceness increment
+    """
+    try:
+        os.sched_setaffinity(0, {int(cpu) for cpu in cpus.split(",")})
+        logger.info("Render process pinned to cores %s", cpus)
+    except Exception as e:
+        logger.warning("Could not set render process affinity: %s", e)
+    try:
+        os.nice(niceness)
+    except Exception as e:
+        logger.warning("Could not set render process priority: %s", e)
+
+
+def run_render_process(name: str, slots: int, lock: Any, frame_ready: Any, stop: Any) -> None:
+    """Show frames from the ring on the matrix until told to stop.
+
+    This is the whole render process: it owns the matrix, and all it does
+    is copy each new frame out of shared memory and swap it in on vsync.
+    It also runs the refresh governor, since only it can reach the matrix.
+
+    Args:
+        name: Shared memory name of the ring
+        slots: Number of frames in the ring
+        lock: The ring's lock
+        frame_ready: multiprocessing.Event set by the writer after each frame
+        stop: multiprocessing.Event set when the process should exit
+    """
+    # Ctrl-C reaches the whole process group; the parent decides when to stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda s, f: sys.exit(0))
+    setup_logging()
+    pin_render_process()
+
+    matrix = initialize_matrix()["matrix"]
+    if matrix is None:
+        logger.warning("No matrix available; render process exiting")
+        return
+    ring = FrameRing.attach(name, MATRIX_WIDTH, MATRIX_HEIGHT, slots, lock)
+    frame = FrameBuffer(MATRIX_WIDTH, MATRIX_HEIGHT)
+    canvas = matrix.CreateFrameCanvas()
+    parent = multiprocessing.parent_process()
+    governor = RefreshGovernor(matrix) if REFRESH_GOVERNOR else None
+    if governor is not None:
+        governor.add_canvas(canvas)
+    shown = skipped = seen = 0
+
+    # Nothing below allocates reference cycles, so the collector never needs to run
+    gc.collect()
+    gc.disable()
+    try:
+        while not stop.is_set():
+            if governor is not None:
+                brightness = governor.current.brightness
+                governor.update()
+                if governor.current.brightness != brightness and shown:
+                    # Brightness is applied as pixels are set, so set the shown frame again
+                    frame.push(canvas)
+                    canvas = matrix.SwapOnVSync(canvas)
+                    governor.add_canvas(canvas)
+            if not frame_ready.wait(PARENT_CHECK_INTERVAL):
+                if parent is not None and not parent.is_alive():
+                    break
+                continue
+            # Clear before reading: a frame written after this sets it again
+            frame_ready.clear()
+            seq = ring.read_latest(frame.pixels, seen)
+            if seq is None:
+                continue
+            skipped += seq - seen - 1
+            seen = seq
+            frame.push(canvas)
+            canvas = matrix.SwapOnVSync(canvas)
+            shown += 1
+            if governor is not None:
+                governor.add_canvas(canvas)
+                governor.note_frame()
+    finally:
+        matrix.Clear()
+        ring.close()
+        logger.info("Render process showed %d frames, skipped %d", shown, skipped)
+        if governor is not None:
+            logger.info("Refresh profiles used: %s", governor.report())
+
+
+class RenderProcess:
+    """Runs the matrix in a separate process fed through a FrameRing.
+
+    The calling process keeps polling, decoding and composing frames with
+    the numpy backend; the render process only swaps finished frames onto
+    the panel, so garbage collection and network stalls in the caller never
+    delay a swap.
+    """
+
+    def __init__(self, slots: int = RING_SLOTS):
+        """Initialize the render process; nothing runs until start().
+
+        Args:
+            slots: Number of frames in the ring
+        """
+        self.slots = slots
+        # Spawned, so the child starts from a clean interpreter with a small heap
+        self.context = multiprocessing.get_context("spawn")
+        self.ring: Optional[FrameRing] = None
+        self.process: Optional[Any] = None
+        self.lock = self.context.Lock()
+        self.frame_ready = self.context.Event()
+        self.stop_requested = self.context.Event()
+
+    def start(self) -> None:
+        """Allocate the ring and start the render process."""
+        self.ring = FrameRing.create(MATRIX_WIDTH, MATRIX_HEIGHT, self.slots, self.lock)
+        self.process = self.context.Process(
+            target=run_render_process,
+            args=(
+                self.ring.memory.name, self.slots, self.lock, self.frame_ready,
+                self.stop_requested
+            ),
+            name="matrix-render",
+            daemon=True
+        )
+        self.process.start()
+
+    def matrix_components(self) -> Dict[str, Any]:
+        """Get matrix components for an RGBMatrixController that draws into the ring.
+
+        Returns:
+            Components in the form returned by initialize_matrix()
+        """
+        font, graphics_lib = load_numpy_font()
+        return {
+            "matrix": SharedFrameCanvas(self.ring, self.frame_ready),
+            "font": font,
+            "graphics": graphics_lib,
+            "backend": "numpy",
+            "is_mock": False
+        }
+
+    def stop(self, timeout: float = 2.0) -> None:
+        """Stop the render process and free the ring.
+
+        Args:
+            timeout: Seconds to wait for the process to clear the panel and exit
+        """
+        if self.process is not None:
+            self.stop_requested.set()
+            self.frame_ready.set()
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join()
+            self.process = None
+        if self.ring is not None:
+            self.ring.close()
+            self.ring.memory.unlink()
+            self.ring = None
@@ -1,41 +1,104 @@
 import asyncio
+import logging
+import os
 import sys
-from typing import List, Dict, Any, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
-from matrix_setup import (
-    initialize_matrix,
-    MATRIX_WIDTH, MATRIX_HEIGHT, PANEL_WIDTH,
-    PADDING_X, PADDING_Y, CENTER_GAP, ROW_HEIGHT
-)
+from matrix_setup import initialize_matrix, MATRIX_WIDTH, MATRIX_HEIGHT
+from metrics import METRICS
+from refresh_governor import REFRESH_GOVERNOR, RefreshGovernor
 from shape_renderer import ShapeRenderer
+from startup import STARTUP
 from text_renderer import TextRenderer
+from train_record import TrainArrival
 from train_renderer import TrainRenderer
+from transitions import TRANSITION, TransitionPlayer
+
+logger = logging.getLogger(__name__)
+
+# Build frames off-screen and swap them in on vsync (set to 0 to draw directly)
+DOUBLE_BUFFER = os.environ.get("MATRIX_DOUBLE_BUFFER", "1") != "0"
 
 class RGBMatrixController:
     """Controller for the RGB LED matrix display."""
     
-    def __init__(self):
-        """Initialize the RGB matrix controller with appropriate renderers."""
+    def __init__(
+        self,
+        double_buffered: Optional[bool] = None,
+        matrix_components: Optional[Dict[str, Any]] = None,
+        transition: Optional[str] = None
+    ):
+        """Initialize the RGB matrix controller with appropriate renderers.
+        
+        Args:
+            double_buffered: Render into an off-screen canvas and swap it in
+                on vsync. Defaults to the MATRIX_DOUBLE_BUFFER setting.
+            matrix_components: Matrix, font and graphics to draw with, as
+                returned by initialize_matrix(). Defaults to initializing
+                the matrix for this platform.
+            transition: Animation played when the trains on screen change,
+                one of transitions.TRANSITIONS or "off". Defaults to the
+                TRANSITION setting.
+        """
         # Initialize hardware components
-        matrix_components = initialize_matrix()
+        if matrix_components is None:
+            matrix_components = initialize_matrix()
         self.matrix = matrix_components["matrix"]
         self.is_mock = matrix_components["is_mock"]
+        # Only imported by initialize_matrix when a virtual matrix is in use
+        virtual_matrix = sys.modules.get("virtual_matrix")
+        self.is_virtual = virtual_matrix is not None and isinstance(
+            self.matrix, virtual_matrix.VirtualMatrix
+        )
+        
+        if double_buffered is None:
+            double_buffered = DOUBLE_BUFFER
+        self.double_buffered = double_buffered and not self.is_mock
+        self.canvas = (
+            self.matrix.CreateFrameCanvas() if self.double_buffered else self.matrix
+        )
+        
+        # Lowers the refresh settings while the content is static; only a
+        # real (or virtual) matrix has them, not a render process's canvas
+        self.governor = None
+        if REFRESH_GOVERNOR and not self.is_mock and hasattr(self.matrix, "pwmBits"):
+            self.governor = RefreshGovernor(self.matrix)
+            if self.double_buffered:
+                self.governor.add_canvas(self.canvas)
+        
+        # With the numpy backend every frame is composed in one framebuffer
+        self.framebuffer = None
+        if not self.is_mock and matrix_components["backend"] == "numpy":
+            from framebuffer import FrameBuffer  # pylint: disable=import-outside-toplevel
+            self.framebuffer = FrameBuffer(MATRIX_WIDTH, MATRIX_HEIGHT)
+        
+        # Transitions animate between whole frames, so they need the framebuffer
+        if transition is None:
+            transition = TRANSITION
+        self.transitions = None
+        if self.framebuffer is not None and transition != "off":
+            self.transitions = TransitionPlayer(transition)
+        # (line, express) of each row on screen; a change starts a transition
+        self._shown_lines: Optional[Tuple[Tuple[str, bool], ...]] = None
         
         # Initialize renderers
         if not self.is_mock:
             self.graphics = matrix_components["graphics"]
             self.font = matrix_components["font"]
+            target = self.framebuffer or self.matrix
             
             self.text_renderer = TextRenderer(
-                self.matrix, self.font, self.graphics, is_mock=False
+                target, self.font, self.graphics, is_mock=False
             )
             self.shape_renderer = ShapeRenderer(
-                self.matrix, self.graphics, is_mock=False
+                target, self.graphics, is_mock=False
             )
             self.train_renderer = TrainRenderer(
-                self.matrix, self.graphics, self.text_renderer, 
+                target, self.graphics, self.text_renderer, 
                 self.shape_renderer, is_mock=False
             )
+            if self.framebuffer is None:
+                self._set_canvas(self.canvas)
         else:
             # Mock versions of renderers
             self.text_renderer = TextRenderer(None, None, None, is_mock=True)
@@ -44,22 +107,123 @@ class RGBMatrixController:
                 None, None, self.text_renderer, self.shape_renderer, is_mock=True
             )
     
-    def display_trains(self, trains: List[Dict[str, Any]]) -> None:
+    def display_trains(self, trains: List[TrainArrival], stale: bool = False) -> None:
         """Display a list of trains on the LED matrix.
         
         Args:
-            trains: List of train data dictionaries
+            trains: Trains to display, soonest first
+            stale: Whether to show the stale data indicator
+        """
+        lines = tuple((train.line, train.express) for train in trains[:self.train_renderer.max_rows])
+        before = None
+        if self.transitions is not None and self._shown_lines not in (None, lines):
+            before = self.framebuffer.pixels.copy()
+        self._shown_lines = lines
+        # One train per layout row; nothing to present if the frame is unchanged
+        if self.train_renderer.render_trains(trains, stale):
+            if before is not None:
+                self._play_transition(before)
+            self.present()
+    
+    def tick(self) -> None:
+        """Let the refresh governor switch profiles; called on every render tick.
+        
+        Brightness is applied as pixels are set, so after it changes every
+        row is drawn again by the next display_trains().
+        """
+        if self.governor is None:
+            return
+        brightness = self.governor.current.brightness
+        self.governor.update()
+        if self.governor.current.brightness != brightness:
+            self.train_renderer.invalidate()
+    
+    def scroll_interval(self) -> Optional[float]:
+        """Get how often frames must be drawn for the scrolling text on screen.
+        
+        Returns:
+            Seconds between frames, or None if nothing scrolls
+        """
+        return self.train_renderer.scroll_interval()
+    
+    def _play_transition(self, before: Any) -> None:
+        """Animate from a previous frame to the one just drawn in the framebuffer.
+        
+        Args:
+            before: (height, width, 3) pixels of the previous frame
+        """
+        after = self.framebuffer.pixels.copy()
+        
+        def show(frame: Any) -> None:
+            self.framebuffer.pixels[:] = frame
+            self._swap_in()
+            if self.governor is not None:
+                self.governor.note_frame()
+        
+        try:
+            self.transitions.play(before, after, show)
+        finally:
+            # The renderer keeps drawing on top of the finished frame
+            self.framebuffer.pixels[:] = after
+    
+    def present(self) -> None:
+        """Show the frame drawn since the last call.
+        
+        With the numpy backend the finished framebuffer is first uploaded
+        to the matrix canvas in a single SetImage call. In double-buffered
+        mode the finished off-screen canvas is then swapped in on the next
+        vsync and the renderers are pointed at the canvas handed back, so
+        the panel never shows a half-drawn frame.
+        """
+        METRICS.inc("frames_drawn")
+        if self.governor is not None:
+            self.governor.note_frame()
+        self._swap_in()
+        STARTUP.mark("first_pixel")
+    
+    def _swap_in(self) -> None:
+        """Upload the framebuffer if there is one, then swap or record the frame."""
+        if self.framebuffer is not None:
+            self.framebuffer.push(self.canvas)
+        if self.double_buffered:
+            swapped = self.matrix.SwapOnVSync(self.canvas)
+            if self.governor is not None:
+                self.governor.add_canvas(swapped)
+            if self.framebuffer is None:
+                self._set_canvas(swapped)
+            else:
+                self.canvas = swapped
+        elif self.is_virtual:
+            # Nothing is swapped, so record the directly drawn frame
+            self.matrix.capture()
+    
+    def _set_canvas(self, canvas) -> None:
+        """Make every renderer draw onto the given canvas.
+        
+        Args:
+            canvas: The matrix or frame canvas to draw on
         """
-        self.train_renderer.render_trains(trains[:2])  # Show at most 2 trains
+        self.canvas = canvas
+        self.text_renderer.set_canvas(canvas)
+        self.shape_renderer.set_canvas(canvas)
+        self.train_renderer.set_canvas(canvas)
     
     def clear_display(self) -> None:
         """Clear the LED matrix display."""
         if not self.is_mock and self.matrix:
             self.matrix.Clear()
+            if self.double_buffered:
+                self.canvas.Clear()
+            if self.framebuffer is not None:
+                self.framebuffer.Clear()
+        self.train_renderer.invalidate()
+        self._shown_lines = None
     
     def shutdown(self) -> None:
         """Clean shutdown of the LED matrix."""
         self.clear_display()
+        if self.governor is not None:
+            logger.info("Refresh profiles used: %s", self.governor.report())
 
 # Singleton instance for easy importing
 controller: Optional[RGBMatrixController] = None
@@ -1,27 +1,39 @@
-from rgbmatrix import graphics
-from typing import Tuple, Any
+from typing import Dict, Tuple, Any
+
+from sprites import Sprite, SpriteCache
 
 class ShapeRenderer:
     """Renders shapes on the LED matrix display."""
-    
+
     def __init__(self, matrix: Any, graphics_obj: Any, is_mock: bool = False):
         """Initialize the shape renderer.
-        
+
         Args:
             matrix: The LED matrix instance
             graphics_obj: The graphics object from rgbmatrix
             is_mock: Whether to use mock mode
         """
         self.matrix = matrix
+        self.canvas = matrix
         self.graphics = graphics_obj
         self.is_mock = is_mock
+        self.sprites = SpriteCache()
+        self._colors: Dict[Tuple[int, int, int], Any] = {}
+
+    def set_canvas(self, canvas: Any) -> None:
+        """Point subsequent draw calls at a different canvas.
+
+        Args:
+            canvas: The matrix or off-screen frame canvas to draw on
+        """
+        self.canvas = canvas
 
     def _get_rgb_values(self, color: Any) -> Tuple[int, int, int]:
         """Extract RGB values from either a Color object or RGB tuple.
-        
+
         Args:
             color: Either a graphics.Color object or RGB tuple
-            
+
         Returns:
             Tuple of (r, g, b) values
         """
@@ -30,87 +42,62 @@ class ShapeRenderer:
         # If it's a graphics.Color object, get its RGB values
         return (color.red, color.green, color.blue)
 
-    def draw_circle(self, x: int, y: int, radius: int, color: Any) -> None:
-        """Draw a filled circle, but remove only the cardinal point pixels for a smoother look."""
+    def _get_color(self, rgb: Tuple[int, int, int]) -> Any:
+        """Get a cached graphics.Color for an RGB tuple."""
+        color = self._colors.get(rgb)
+        if color is None:
+            color = self._colors[rgb] = self.graphics.Color(*rgb)
+        return color
+
+    def blit(self, sprite: Sprite, x: int, y: int) -> None:
+        """Draw a pre-rasterized sprite with one line call per span (or one bulk call).
+
+        Args:
+            sprite: The sprite to draw
+            x: X-coordinate of the sprite anchor
+            y: Y-coordinate of the sprite anchor
+        """
         if self.is_mock:
             return
-        
-        r, g, b = self._get_rgb_values(color)
-        radius_squared = radius * radius
-        for i in range(-radius, radius + 1):
-            for j in range(-radius, radius + 1):
-                # Standard filled circle
-                if i * i + j * j <= radius_squared:
-                    # Remove only the cardinal points (top, bottom, left, right)
-                    if (abs(i) == radius and j == 0) or (abs(j) == radius and i == 0):
-                        continue
-                    self.matrix.SetPixel(x + i, y + j, r, g, b)
 
-    def draw_diamond(self, x: int, y: int, radius: int, color: Any) -> None:
-        """Draw a filled diamond."""
-        if self.is_mock:
+        canvas = self.canvas
+        fill_spans = getattr(canvas, "fill_spans", None)
+        if fill_spans is not None:
+            # Framebuffer canvases take all spans in one call
+            fill_spans(sprite.spans, x, y, sprite.color)
             return
-            
-        r, g, b = self._get_rgb_values(color)
-        radius = 5  # Enforce radius of 5 pixels (10px total width)
-        for i in range(-radius, radius + 1):
-            for j in range(-radius, radius + 1):
-                if abs(i) + abs(j) <= radius:
-                    self.matrix.SetPixel(x + i, y + j, r, g, b)
 
-    def draw_thick_F(self, x: int, y: int, color: Any) -> None:
-        """Draw a 2px thick F letter (now 9px tall, top line 5px wide, raised 1 row)."""
+        draw_line = self.graphics.DrawLine
+        color = self._get_color(sprite.color)
+        for dy, x0, x1 in sprite.spans:
+            draw_line(canvas, x + x0, y + dy, x + x1, y + dy, color)
+
+    def draw_shape(self, shape: str, x: int, y: int, radius: int, color: Any) -> None:
+        """Draw any registered shape or glyph through the sprite cache.
+
+        Args:
+            shape: Registered shape or glyph name (see sprites.register_shape)
+            x: X-coordinate of the shape anchor
+            y: Y-coordinate of the shape anchor
+            radius: Shape radius (ignored by glyphs)
+            color: Either a graphics.Color object or RGB tuple
+        """
         if self.is_mock:
             return
-        
-        r, g, b = self._get_rgb_values(color)
-        
-        # Vertical line (shifted right by 1, down by 0)
-        for i in range(9):  # Height of 9px
-            self.matrix.SetPixel(x + 1, y + i, r, g, b)
-            self.matrix.SetPixel(x + 2, y + i, r, g, b)
-        
-        # Top horizontal line (shifted right by 1, down by 0)
-        for i in range(5):  # Width of 5px
-            self.matrix.SetPixel(x + 1 + i, y, r, g, b)
-            self.matrix.SetPixel(x + 1 + i, y + 1, r, g, b)
-        
-        # Middle horizontal line (move down 1 row)
-        for i in range(4):  # Width of 4px
-            self.matrix.SetPixel(x + 1 + i, y + 4, r, g, b)
-            self.matrix.SetPixel(x + 1 + i, y + 5, r, g, b)
+        self.blit(self.sprites.get(shape, radius, self._get_rgb_values(color)), x, y)
+
+    def draw_circle(self, x: int, y: int, radius: int, color: Any) -> None:
+        """Draw a filled circle, but remove only the cardinal point pixels for a smoother look."""
+        self.draw_shape("circle", x, y, radius, color)
+
+    def draw_diamond(self, x: int, y: int, radius: int, color: Any) -> None:
+        """Draw a filled diamond (radius capped at 5 pixels, 10px total width)."""
+        self.draw_shape("diamond", x, y, radius, color)
+
+    def draw_thick_F(self, x: int, y: int, color: Any) -> None:
+        """Draw a 2px thick F letter (9px tall, top line 5px wide)."""
+        self.draw_shape("F", x, y, 0, color)
 
     def draw_thick_G(self, x: int, y: int, color: Any) -> None:
-        """Draw a 2px thick G letter (9px tall, with curved bottom left corner, bottom row omits leftmost pixel, and one more row at the top of the inner part)."""
-        if self.is_mock:
-            return
-        
-        r, g, b = self._get_rgb_values(color)
-        
-        # Top row (xooooo)
-        for i in range(1, 6):
-            self.matrix.SetPixel(x + i, y, r, g, b)
-        # Second row (oooooo)
-        for i in range(0, 6):
-            self.matrix.SetPixel(x + i, y + 1, r, g, b)
-        # Third and fourth rows (ooxxxx)
-        for j in range(2, 4):
-            for i in range(0, 2):
-                self.matrix.SetPixel(x + i, y + j, r, g, b)
-        # Fifth and sixth rows (ooxooo)
-        for j in range(4, 6):
-            for i in range(0, 2):
-                self.matrix.SetPixel(x + i, y + j, r, g, b)
-            for i in range(3, 6):
-                self.matrix.SetPixel(x + i, y + j, r, g, b)
-        # Seventh row (ooxxoo)
-        for i in range(0, 2):
-            self.matrix.SetPixel(x + i, y + 6, r, g, b)
-        for i in range(4, 6):
-            self.matrix.SetPixel(x + i, y + 6, r, g, b)
-        # Eighth row (oooooo)
-        for i in range(0, 6):
-            self.matrix.SetPixel(x + i, y + 7, r, g, b)
-        # Ninth row (xooooo)
-        for i in range(1, 6):
-            self.matrix.SetPixel(x + i, y + 8, r, g, b)
\ No newline at end of file
+        """Draw a 2px thick G letter (9px tall, with curved corners)."""
+        self.draw_shape("G", x, y, 0, color)
@@ -0,0 +1,198 @@
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from lru import LRUCache
+
+# A horizontal run of lit pixels: (dy, dx_start, dx_end), end inclusive,
+# relative to the point the sprite is drawn at
+Span = Tuple[int, int, int]
+Rasterizer = Callable[[int], Iterable[Tuple[int, int]]]
+
+SPRITE_CACHE_SIZE = 64
+
+
+class Sprite:
+    """A pre-rasterized pixel mask stored as horizontal spans."""
+
+    __slots__ = ("spans", "color", "pixel_count")
+
+    def __init__(self, spans: Tuple[Span, ...], color: Tuple[int, int, int]):
+        """Initialize the sprite.
+
+        Args:
+            spans: Horizontal runs of lit pixels relative to the anchor point
+            color: RGB color the sprite is drawn in
+        """
+        self.spans = spans
+        self.color = color
+        self.pixel_count = sum(x1 - x0 + 1 for _, x0, x1 in spans)
+
+
+class _ShapeDef:
+    """A registered shape: how to rasterize it and its largest allowed radius."""
+
+    __slots__ = ("rasterizer", "max_radius")
+
+    def __init__(self, rasterizer: Rasterizer, max_radius: Optional[int]):
+        self.rasterizer = rasterizer
+        self.max_radius = max_radius
+
+
+_SHAPES: Dict[str, _ShapeDef] = {}
+
+
+def pixels_to_spans(pixels: Iterable[Tuple[int, int]]) -> Tuple[Span, ...]:
+    """Collapse a set of (dx, dy) pixels into horizontal spans.
+
+    Args:
+        pixels: Pixel offsets relative to the anchor point
+
+    Returns:
+        Spans sorted top to bottom, left to right
+    """
+    rows: Dict[int, List[int]] = {}
+    for dx, dy in set(pixels):
+        rows.setdefault(dy, []).append(dx)
+
+    spans: List[Span] = []
+    for dy in sorted(rows):
+        xs = sorted(rows[dy])
+        start = prev = xs[0]
+        for dx in xs[1:]:
+            if dx != prev + 1:
+                spans.append((dy, start, prev))
+                start = dx
+            prev = dx
+        spans.append((dy, start, prev))
+    return tuple(spans)
+
+
+def register_shape(name: str, rasterizer: Rasterizer, max_radius: Optional[int] = None) -> None:
+    """Register a shape that can be drawn as a cached sprite.
+
+    Args:
+        name: Shape name used when drawing
+        rasterizer: Callable taking a radius and yielding (dx, dy) pixel offsets
+        max_radius: Optional cap applied to the requested radius
+    """
+    _SHAPES[name] = _ShapeDef(rasterizer, max_radius)
+
+
+def register_glyph(name: str, rows: Sequence[str]) -> None:
+    """Register a fixed bitmap, anchored at its top-left corner.
+
+    Args:
+        name: Glyph name used when drawing
+        rows: Bitmap rows top to bottom, '#' for a lit pixel and '.' for unlit
+    """
+    pixels = tuple(
+        (dx, dy)
+        for dy, row in enumerate(rows)
+        for dx, char in enumerate(row)
+        if char == "#"
+    )
+    register_shape(name, lambda _radius: pixels)
+
+
+def is_registered(name: str) -> bool:
+    """Check whether a shape or glyph has been registered.
+
+    Args:
+        name: Shape or glyph name
+
+    Returns:
+        True if the name can be drawn
+    """
+    return name in _SHAPES
+
+
+def _rasterize_circle(radius: int) -> Iterable[Tuple[int, int]]:
+    """Filled circle without the single cardinal point pixels, centered on the anchor."""
+    radius_squared = radius * radius
+    for i in range(-radius, radius + 1):
+        for j in range(-radius, radius + 1):
+            if i * i + j * j <= radius_squared:
+                if (abs(i) == radius and j == 0) or (abs(j) == radius and i == 0):
+                    continue
+                yield (i, j)
+
+
+def _rasterize_diamond(radius: int) -> Iterable[Tuple[int, int]]:
+    """Filled diamond centered on the anchor."""
+    for i in range(-radius, radius + 1):
+        for j in range(-radius, radius + 1):
+            if abs(i) + abs(j) <= radius:
+                yield (i, j)
+
+
+class SpriteCache:
+    """Bounded cache of rasterized sprites keyed by (shape, radius, color)."""
+
+    def __init__(self, max_size: int = SPRITE_CACHE_SIZE):
+        """Initialize the sprite cache.
+
+        Args:
+            max_size: Maximum number of sprites kept
+        """
+        self._sprites = LRUCache(max_size)
+        self._masks = LRUCache(max_size)
+
+    def get(self, shape: str, radius: int, color: Tuple[int, int, int]) -> Sprite:
+        """Return the sprite for a shape, rasterizing it on first use.
+
+        Args:
+            shape: Registered shape or glyph name
+            radius: Shape radius (ignored by glyphs)
+            color: RGB color tuple
+
+        Returns:
+            The cached sprite
+
+        Raises:
+            KeyError: If the shape has not been registered
+        """
+        shape_def = _SHAPES[shape]
+        if shape_def.max_radius is not None:
+            radius = min(radius, shape_def.max_radius)
+        key = (shape, radius, color)
+        sprite = self._sprites.get(key)
+        if sprite is None:
+            spans = self._masks.get_or_create(
+                (shape, radius),
+                lambda: pixels_to_spans(shape_def.rasterizer(radius))
+            )
+            sprite = Sprite(spans, color)
+            self._sprites.put(key, sprite)
+        return sprite
+
+    def clear(self) -> None:
+        """Drop every cached sprite."""
+        self._sprites.clear()
+        self._masks.clear()
+
+
+register_shape("circle", _rasterize_circle)
+register_shape("diamond", _rasterize_diamond, max_radius=5)  # 10px total width
+
+# 2px thick route letters, 6x9
+register_glyph("F", (
+    ".#####",
+    ".#####",
+    ".##...",
+    ".##...",
+    ".####.",
+    ".####.",
+    ".##...",
+    ".##...",
+    ".##...",
+))
+register_glyph("G", (
+    ".#####",
+    "######",
+    "##....",
+    "##....",
+    "##.###",
+    "##.###",
+    "##..##",
+    "######",
+    ".#####",
+))
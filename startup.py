@@ -0,0 +1,71 @@
+import logging
+import os
+import time
+from typing import Dict
+
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+# Seconds from launch until the first frame is on the panel before startup
+# is reported as too slow
+FIRST_PIXEL_BUDGET = float(os.environ.get("FIRST_PIXEL_BUDGET", "2.0"))
+
+# Compiled fonts and the saved train state live here
+script_dir = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.environ.get("MATRIX_CACHE_DIR", os.path.join(script_dir, ".cache"))
+
+
+class StartupTimer:
+    """Records when each startup phase finished, relative to process launch.
+
+    Time is counted from the first import of this module, which main.py
+    does right after loading .env. Each phase is also published as a
+    startup_<phase>_seconds metric, and a first pixel later than the
+    budget is logged.
+    """
+
+    def __init__(self, budget: float = FIRST_PIXEL_BUDGET):
+        """Initialize the timer.
+
+        Args:
+            budget: Seconds allowed until the first pixel is shown
+        """
+        self.started_at = time.perf_counter()
+        self.budget = budget
+        self.phases: Dict[str, float] = {}
+
+    def mark(self, phase: str) -> float:
+        """Record that a phase has finished; later marks of the same phase are ignored.
+
+        Args:
+            phase: Phase name (e.g. "imports", "matrix", "first_pixel")
+
+        Returns:
+            Seconds from launch to the end of the phase
+        """
+        elapsed = self.phases.get(phase)
+        if elapsed is None:
+            elapsed = self.phases[phase] = time.perf_counter() - self.started_at
+            METRICS.set(f"startup_{phase}_seconds", elapsed)
+            if phase == "first_pixel" and elapsed > self.budget:
+                logger.warning(
+                    "First pixel took %.0fms, over the %.0fms budget", elapsed * 1000, self.budget * 1000
+                )
+        return elapsed
+
+    def report(self) -> str:
+        """Format the phases in the order they finished.
+
+        Returns:
+            A one-line summary
+        """
+        phases = ", ".join(
+            f"{phase} {elapsed * 1000:.0f}ms"
+            for phase, elapsed in sorted(self.phases.items(), key=lambda item: item[1])
+        )
+        return f"Startup: {phases} (first pixel budget {self.budget * 1000:.0f}ms)"
+
+
+# Shared timer for the whole process
+STARTUP = StartupTimer()
@@ -0,0 +1,105 @@
+import json
+import logging
+import os
+import time
+from typing import List, NamedTuple, Optional
+
+from countdown import Countdown
+from startup import CACHE_DIR
+from train_record import TrainArrival, trains_from_objects
+
+logger = logging.getLogger(__name__)
+
+# The last good train list is kept here so restarts and outages never
+# start from a blank panel
+STATE_PATH = os.environ.get("STATE_PATH", os.path.join(CACHE_DIR, "state.json"))
+# Bump whenever the layout of the state file changes
+STATE_VERSION = 1
+# Data older than this many polling intervals is no longer shown
+MAX_STALE_INTERVALS = 10
+# Past this many polling intervals the stale data indicator is lit
+STALE_INDICATOR_INTERVALS = 2
+
+
+class SavedState(NamedTuple):
+    """The last good train list and when it was received."""
+    trains: List[TrainArrival]
+    received_at: float
+
+    def age(self, now: Optional[float] = None) -> float:
+        """Seconds since the trains were received."""
+        return (time.time() if now is None else now) - self.received_at
+
+    def trains_at(self, now: Optional[float] = None) -> List[TrainArrival]:
+        """Get the trains with their minutes counted down to now.
+
+        Args:
+            now: Current time (defaults to time.time())
+
+        Returns:
+            The trains still to arrive, as the countdown would show them
+        """
+        countdown = Countdown()
+        countdown.update(self.trains, now=self.received_at)
+        return countdown.trains(now)
+
+
+class StateStore:
+    """Persists the last good train list in a small JSON file.
+
+    The file is written to a temporary name, synced and renamed over the
+    old one, so a crash or power cut leaves either the old or the new
+    state, never a torn one.
+    """
+
+    def __init__(self, path: str = STATE_PATH):
+        """Initialize the store.
+
+        Args:
+            path: State file
+        """
+        self.path = path
+
+    def save(self, trains: List[TrainArrival], received_at: float) -> None:
+        """Replace the saved state.
+
+        Args:
+            trains: Trains as received from the API
+            received_at: When they were received
+        """
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as state:
+                json.dump({
+                    "version": STATE_VERSION,
+                    "received_at": received_at,
+                    "trains": [train._asdict() for train in trains],
+                }, state)
+                state.flush()
+                os.fsync(state.fileno())
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logger.warning("Could not save state: %s", e)
+
+    def load(self, max_age: Optional[float] = None) -> Optional[SavedState]:
+        """Load the saved state.
+
+        Args:
+            max_age: Seconds after which saved trains are too old to use
+
+        Returns:
+            The saved state, or None if there is none, it is unreadable or
+            it is older than max_age
+        """
+        try:
+            with open(self.path, "r", encoding="utf-8") as state:
+                saved = json.load(state)
+            if saved.get("version") != STATE_VERSION:
+                return None
+            result = SavedState(trains_from_objects(saved["trains"]), float(saved["received_at"]))
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return None
+        if max_age is not None and result.age() > max_age:
+            return None
+        return result
@@ -1,5 +1,57 @@
-from typing import Tuple
+from typing import Dict, NamedTuple, Tuple
 
 # RGB color definitions for train lines
 F_TRAIN_COLOR: Tuple[int, int, int] = (238, 104, 0)  # #EB6800
 G_TRAIN_COLOR: Tuple[int, int, int] = (121, 149, 52)  # #799534
+# Corner pixel lit while the arrivals shown are old
+STALE_INDICATOR_COLOR: Tuple[int, int, int] = (160, 0, 0)
+
+
+class RouteBullet(NamedTuple):
+    """How a route is drawn: bullet color, shapes, letter glyph and line names."""
+    color: Tuple[int, int, int]
+    glyph: str
+    local_name: str
+    express_name: str
+    shape: str = "circle"
+    express_shape: str = "diamond"
+    glyph_color: Tuple[int, int, int] = (255, 255, 255)
+
+
+ROUTE_BULLETS: Dict[str, RouteBullet] = {}
+
+# Route used for lines that have no bullet registered
+DEFAULT_ROUTE = "G"
+
+
+def register_route_bullet(route: str, bullet: RouteBullet) -> None:
+    """Register the bullet drawn for a route.
+
+    Args:
+        route: Route identifier as sent by the train API (e.g. "F")
+        bullet: Bullet definition; its glyph must be registered in sprites
+    """
+    ROUTE_BULLETS[route] = bullet
+
+
+def get_route_bullet(route: str) -> RouteBullet:
+    """Get the bullet for a route, falling back to the default route.
+
+    Args:
+        route: Route identifier
+
+    Returns:
+        The registered bullet
+    """
+    return ROUTE_BULLETS.get(route) or ROUTE_BULLETS[DEFAULT_ROUTE]
+
+
+register_route_bullet("F", RouteBullet(
+    color=F_TRAIN_COLOR, glyph="F",
+    local_name="6 Av Local", express_name="6 Av - Culver Express",
+))
+register_route_bullet("G", RouteBullet(
+    color=G_TRAIN_COLOR, glyph="G",
+    local_name="Crosstown", express_name="Crosstown",
+    express_shape="circle",
+))
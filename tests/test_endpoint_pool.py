@@ -0,0 +1,188 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import endpoint_pool
+from endpoint_pool import CircuitBreaker, EndpointPool
+from fake_train_api import FakeTrainApi
+from metrics import METRICS
+from train_client import BadResponseError
+from train_record import TrainArrival
+
+F_TRAINS = [{"line": "F", "status": "3 mins", "express": False}]
+G_TRAINS = [{"line": "G", "status": "7 mins", "express": False}]
+# How long an endpoint that has not answered yet is given before hedging
+HEDGE_DELAY = 0.1
+
+
+@pytest.fixture(name="servers")
+def fixture_servers():
+    """Start local stand-ins for the train API; each serves different trains."""
+    started = []
+
+    def start(trains, **faults):
+        api = FakeTrainApi(trains, **faults).start()
+        started.append(api)
+        return api
+
+    yield start
+    for api in started:
+        api.stop()
+
+
+@pytest.fixture(autouse=True)
+def fixture_fast_hedge(monkeypatch):
+    monkeypatch.setattr(endpoint_pool, "HEDGE_DEFAULT_DELAY", HEDGE_DELAY)
+
+
+def counter(name: str) -> int:
+    return METRICS.counters.get(name, 0)
+
+
+async def timed_fetch(pool: EndpointPool):
+    start = time.monotonic()
+    trains = await pool.fetch()
+    return trains, time.monotonic() - start
+
+
+def test_hedge_fires_when_primary_is_slow(servers):
+    slow = servers(F_TRAINS, delay=1.0)
+    fast = servers(G_TRAINS)
+    hedges, wins = counter("hedged_requests"), counter("hedge_wins")
+
+    async def run():
+        async with EndpointPool([slow.url, fast.url], timeout=2.0) as pool:
+            return await timed_fetch(pool)
+
+    trains, elapsed = asyncio.run(run())
+    assert trains == [TrainArrival("G", "7 mins", False)]
+    assert HEDGE_DELAY <= elapsed < 1.0
+    assert (slow.requests, fast.requests) == (1, 1)
+    assert counter("hedged_requests") == hedges + 1
+    assert counter("hedge_wins") == wins + 1
+
+
+def test_no_hedge_when_primary_answers_in_time(servers):
+    primary = servers(F_TRAINS)
+    secondary = servers(G_TRAINS)
+
+    async def run():
+        async with EndpointPool([primary.url, secondary.url], timeout=2.0) as pool:
+            return [await pool.fetch() for _ in range(5)]
+
+    results = asyncio.run(run())
+    assert results[0] == [TrainArrival("F", "3 mins", False)]
+    # Conditional GETs still apply: the unchanged list comes back as None
+    assert results[1:] == [None] * 4
+    assert secondary.requests == 0
+
+
+def test_failover_when_preferred_endpoint_is_down(servers):
+    down = servers(F_TRAINS)
+    down.stop()
+    up = servers(G_TRAINS)
+    failovers, wins = counter("failovers"), counter("failover_wins")
+
+    async def run():
+        async with EndpointPool([down.url, up.url], timeout=2.0) as pool:
+            first = await timed_fetch(pool)
+            # The failed endpoint's error rate now ranks it last
+            order = [endpoint.url for endpoint in pool.candidates()]
+            return first, order
+
+    (trains, elapsed), order = asyncio.run(run())
+    assert trains == [TrainArrival("G", "7 mins", False)]
+    # Replaced at once, not after the hedge delay
+    assert elapsed < HEDGE_DELAY
+    assert order == [up.url, down.url]
+    assert counter("failovers") == failovers + 1
+    assert counter("failover_wins") == wins + 1
+
+
+def test_every_endpoint_failing_raises(servers):
+    first = servers(F_TRAINS, fail_rate=1.0)
+    second = servers(G_TRAINS, fail_rate=1.0)
+
+    async def run():
+        async with EndpointPool([first.url, second.url], timeout=2.0) as pool:
+            await pool.fetch()
+
+    with pytest.raises(BadResponseError):
+        asyncio.run(run())
+    assert (first.failed, second.failed) == (1, 1)
+
+
+def test_breaker_opens_after_repeated_failures_then_half_opens(servers):
+    api = servers(F_TRAINS, fail_rate=1.0)
+    opens, closes = counter("circuit_opens"), counter("circuit_closes")
+
+    async def run():
+        async with EndpointPool([api.url], timeout=2.0) as pool:
+            endpoint = pool.endpoints[0]
+            endpoint.breaker = CircuitBreaker(cooldown=0.2)
+            for _ in range(endpoint_pool.BREAKER_FAILURES):
+                assert endpoint.breaker.state() == "closed"
+                with pytest.raises(BadResponseError):
+                    await pool.fetch()
+            assert endpoint.breaker.state() == "open"
+            assert counter("circuit_opens") == opens + 1
+
+            # A failed trial reopens the circuit for twice as long
+            await asyncio.sleep(0.25)
+            assert endpoint.breaker.state() == "half-open"
+            with pytest.raises(BadResponseError):
+                await pool.fetch()
+            assert endpoint.breaker.state() == "open"
+            assert endpoint.breaker.cooldown == pytest.approx(0.4)
+
+            # A successful trial closes it
+            api.fail_rate = 0.0
+            await asyncio.sleep(0.45)
+            assert endpoint.breaker.state() == "half-open"
+            trains = await pool.fetch()
+            assert endpoint.breaker.state() == "closed"
+            assert endpoint.breaker.cooldown == pytest.approx(0.2)
+            return trains
+
+    assert asyncio.run(run()) == [TrainArrival("F", "3 mins", False)]
+    assert counter("circuit_closes") == closes + 1
+
+
+def test_open_endpoint_is_skipped_until_its_trial(servers):
+    flaky = servers(F_TRAINS, fail_rate=1.0)
+    steady = servers(G_TRAINS)
+
+    async def run():
+        async with EndpointPool([flaky.url, steady.url], timeout=2.0) as pool:
+            pool.endpoints[0].breaker = CircuitBreaker(failures=1, cooldown=0.2)
+            assert await pool.fetch() == [TrainArrival("G", "7 mins", False)]
+            assert pool.endpoints[0].breaker.state() == "open"
+
+            # While open, only the healthy endpoint is asked
+            assert await pool.fetch() is None
+            assert flaky.requests == 1
+
+            # Once half-open it gets the next request, despite its error rate
+            flaky.fail_rate = 0.0
+            await asyncio.sleep(0.25)
+            assert pool.candidates()[0] is pool.endpoints[0]
+            trains = await pool.fetch()
+            assert flaky.requests == 2
+            assert pool.endpoints[0].breaker.state() == "closed"
+            return trains
+
+    assert asyncio.run(run()) == [TrainArrival("F", "3 mins", False)]
+
+
+def test_connection_errors_count_against_endpoint():
+    async def run():
+        async with EndpointPool(["http://127.0.0.1:9/trains"], timeout=1.0) as pool:
+            with pytest.raises(httpx.HTTPError):
+                await pool.fetch()
+            return pool.endpoints[0]
+
+    endpoint = asyncio.run(run())
+    assert endpoint.breaker.failures == 1
+    assert endpoint.recent_errors() > 0
@@ -0,0 +1,167 @@
+import asyncio
+import json
+import socket
+
+import pytest
+
+from fanout import (
+    FanoutPublisher, FanoutState, FanoutSubscriber, broadcast_loop, decode_state,
+    encode_state, subscribe_loop
+)
+from metrics import METRICS
+from pipeline import FetchResult, LatestValue
+from train_record import TrainArrival
+
+GROUP = "239.255.42.99"
+LOOPBACK = "127.0.0.1"
+TRAINS = [TrainArrival("F", "3 mins", True), TrainArrival("G", "Delayed", False)]
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind((LOOPBACK, 0))
+        return sock.getsockname()[1]
+
+
+def state(seq: int, hub: int = 1, data_version: int = 1, **fields) -> FanoutState:
+    values = {"trains": TRAINS, "age": 2.5, "fresh_age": 0.5, "error": None}
+    values.update(fields)
+    return FanoutState(hub, seq, data_version, **values)
+
+
+def packet(**fields) -> bytes:
+    """Encode a valid packet with some of its fields replaced."""
+    values = json.loads(encode_state(state(1)))
+    values.update(fields)
+    return json.dumps(values).encode()
+
+
+@pytest.mark.parametrize("sent", [
+    state(7),
+    state(8, trains=None, age=None, fresh_age=None, error="Bad response"),
+    state(9, trains=[], error="timed out"),
+])
+def test_state_round_trip(sent):
+    received = decode_state(encode_state(sent))
+    assert received == sent
+    assert all(isinstance(train, TrainArrival) for train in received.trains or [])
+
+
+@pytest.mark.parametrize("payload", [
+    b"not json",
+    b"[]",
+    json.dumps({"v": 99, "hub": 1, "seq": 1}).encode(),
+    json.dumps({"v": 1, "hub": 1, "seq": 1}).encode(),
+    json.dumps({
+        "v": 1, "hub": 1, "seq": 1, "data": 1, "trains": [["F", "3 mins"]],
+        "age": 0, "fresh_age": 0, "error": None,
+    }).encode(),
+    json.dumps({
+        "v": 1, "hub": 1, "seq": 1, "data": 1, "trains": [["F", 3, True]],
+        "age": 0, "fresh_age": 0, "error": None,
+    }).encode(),
+    packet(age=None),
+    packet(age="2.5"),
+    packet(age=True),
+    packet(trains=None, age="2.5"),
+    packet(fresh_age="0.5"),
+    packet(fresh_age=[]),
+    packet(error=503),
+    packet(error={"message": "timed out"}),
+    packet(age=float("nan")),
+])
+def test_malformed_packets_raise(payload):
+    with pytest.raises(ValueError):
+        decode_state(payload)
+
+
+def test_accept_drops_old_and_duplicate_packets():
+    subscriber = FanoutSubscriber(GROUP, free_port(), LOOPBACK)
+    lost = METRICS.counters.get("fanout_lost", 0)
+
+    assert subscriber.accept(state(5))
+    assert not subscriber.accept(state(5))
+    assert not subscriber.accept(state(4))
+    assert subscriber.accept(state(6))
+    # A gap is only counted; every packet carries the full state
+    assert subscriber.accept(state(9))
+    assert METRICS.counters.get("fanout_lost", 0) == lost + 2
+    assert not subscriber.accept(state(8))
+
+
+def test_accept_follows_restarted_hub():
+    subscriber = FanoutSubscriber(GROUP, free_port(), LOOPBACK)
+    assert subscriber.accept(state(50, hub=1))
+    subscriber.data_version = 3
+    # A new hub starts counting again from 1
+    assert subscriber.accept(state(1, hub=2))
+    assert subscriber.data_version is None
+    assert subscriber.accept(state(2, hub=2))
+    assert not subscriber.accept(state(1, hub=2))
+
+
+def test_hub_to_subscriber_over_loopback():
+    port = free_port()
+
+    async def run():
+        hub_slot, sign_slot = LatestValue(), LatestValue()
+        publisher = FanoutPublisher(GROUP, port, LOOPBACK)
+        subscriber = FanoutSubscriber(GROUP, port, LOOPBACK)
+        tasks = [asyncio.create_task(subscribe_loop(subscriber, sign_slot, heartbeat=0.2))]
+        try:
+            # Let the subscriber join the group before anything is sent
+            while subscriber.transport is None:
+                await asyncio.sleep(0.01)
+            tasks.append(asyncio.create_task(broadcast_loop(publisher, hub_slot, heartbeat=0.2)))
+
+            hub_slot.publish(FetchResult(TRAINS, None, 1000.0))
+            assert await sign_slot.wait(0, 2.0)
+            assert sign_slot.value.trains == TRAINS
+            assert sign_slot.value.error is None
+            # Sent as ages, so the times come out the same on the sign
+            assert sign_slot.value.received_at == pytest.approx(1000.0, abs=0.1)
+            assert sign_slot.fresh_at == pytest.approx(1000.0, abs=0.1)
+            version = sign_slot.version
+
+            # Heartbeats repeat the same data, which is not published again
+            await asyncio.sleep(0.5)
+            assert sign_slot.version == version
+
+            new_trains = [TrainArrival("G", "4 mins", False)]
+            hub_slot.publish(FetchResult(new_trains, None, 1010.0))
+            assert await sign_slot.wait(version, 2.0)
+            assert sign_slot.value.trains == new_trains
+            assert sign_slot.value.received_at == pytest.approx(1010.0, abs=0.1)
+            version = sign_slot.version
+
+            # A replayed older packet with other trains is dropped
+            stale = state(publisher.seq - 1, hub=publisher.hub, data_version=99)
+            publisher.sock.sendto(encode_state(stale), publisher.address)
+            duplicate = state(publisher.seq, hub=publisher.hub, data_version=100)
+            publisher.sock.sendto(encode_state(duplicate), publisher.address)
+            assert not await sign_slot.wait(version, 0.3)
+            assert sign_slot.value.trains == new_trains
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            publisher.close()
+
+    asyncio.run(run())
+
+
+def test_subscriber_without_hub_reports_error():
+    async def run():
+        slot = LatestValue()
+        subscriber = FanoutSubscriber(GROUP, free_port(), LOOPBACK)
+        task = asyncio.create_task(subscribe_loop(subscriber, slot, heartbeat=0.05))
+        try:
+            assert await slot.wait(0, 2.0)
+            return slot.value
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    result = asyncio.run(run())
+    assert result.trains is None
+    assert result.error == "No hub"
@@ -0,0 +1,155 @@
+import asyncio
+import os
+
+import pytest
+
+from gtfs_feed import GtfsDecodeError, GtfsFeedClient, parse_feed, trains_from_arrivals
+from train_record import TrainArrival
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "gtfs-fg-1760000000.pb")
+FEED_TIME = 1760000000
+
+
+def varint(value: int) -> bytes:
+    """Encode an unsigned (or two's complement int64) varint."""
+    value &= (1 << 64) - 1
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def field(number: int, value) -> bytes:
+    """Encode a varint (int) or length-delimited (bytes or str) field."""
+    if isinstance(value, int):
+        return varint(number << 3) + varint(value)
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+    return varint(number << 3 | 2) + varint(len(value)) + value
+
+
+def stop_time(stop_id: str, arrival=None, departure=None) -> bytes:
+    """Encode a StopTimeUpdate."""
+    message = b""
+    if arrival is not None:
+        message += field(2, field(2, arrival))
+    if departure is not None:
+        message += field(3, field(2, departure))
+    return message + field(4, stop_id)
+
+
+def trip_entity(entity_id: str, route_id: str, *stop_times: bytes) -> bytes:
+    """Encode a FeedEntity holding a TripUpdate."""
+    trip = field(1, f"{entity_id}_trip") + field(5, route_id)
+    update = field(1, trip) + b"".join(field(2, update) for update in stop_times)
+    return field(2, field(1, entity_id) + field(3, update))
+
+
+def build_feed() -> bytes:
+    """Build the FeedMessage saved as the fixture.
+
+    Trips at 7 Av northbound (F24N) in 5, 2 (express) and 11 minutes (a
+    departure time only), one that has already left, one southbound and
+    a vehicle position that mentions the stop but has no trip update.
+    """
+    header = field(1, "2.0") + field(2, 0) + field(3, FEED_TIME)
+    return field(1, header) + b"".join([
+        trip_entity(
+            "1", "F",
+            stop_time("F23N", arrival=FEED_TIME + 180),
+            stop_time("F24N", arrival=FEED_TIME + 300, departure=FEED_TIME + 330),
+            stop_time("F25N", arrival=FEED_TIME + 420),
+        ),
+        trip_entity("2", "FX", stop_time("F24N", arrival=FEED_TIME + 125)),
+        trip_entity("3", "G", stop_time("F24S", arrival=FEED_TIME + 200)),
+        trip_entity("4", "G", stop_time("F24N", departure=FEED_TIME + 660)),
+        trip_entity("5", "F", stop_time("F24N", arrival=FEED_TIME - 30)),
+        field(2, field(1, "6") + field(4, field(7, "F24N"))),
+    ])
+
+
+def test_fixture_is_the_built_feed():
+    with open(FIXTURE, "rb") as fixture:
+        assert fixture.read() == build_feed()
+
+
+def test_fixture_decodes_to_trains():
+    with open(FIXTURE, "rb") as fixture:
+        timestamp, arrivals = parse_feed(fixture.read(), "F24N")
+    assert timestamp == FEED_TIME
+    assert [(a.route_id, a.arrives_at - FEED_TIME) for a in arrivals] == [
+        ("F", 300), ("FX", 125), ("G", 660), ("F", -30),
+    ]
+    assert trains_from_arrivals(arrivals, FEED_TIME) == [
+        TrainArrival("F", "2 mins", True),
+        TrainArrival("F", "5 mins", False),
+        TrainArrival("G", "11 mins", False),
+    ]
+
+
+def test_other_direction_is_filtered():
+    with open(FIXTURE, "rb") as fixture:
+        _, arrivals = parse_feed(fixture.read(), "F24S")
+    assert [(a.route_id, a.arrives_at - FEED_TIME) for a in arrivals] == [("G", 200)]
+
+
+def test_client_replays_recorded_feed():
+    async def fetch_twice():
+        async with GtfsFeedClient([FIXTURE], "F24N") as client:
+            return await client.fetch(), await client.fetch()
+
+    trains, unchanged = asyncio.run(fetch_twice())
+    # Counted from the time the feed was recorded, not from now
+    assert trains[0] == TrainArrival("F", "2 mins", True)
+    assert len(trains) == 3
+    assert unchanged is None
+
+
+def test_fixed_width_fields_are_skipped():
+    header = field(3, FEED_TIME) + varint(4 << 3 | 1) + bytes(8) + varint(5 << 3 | 5) + bytes(4)
+    timestamp, arrivals = parse_feed(field(1, header), "F24N")
+    assert timestamp == FEED_TIME
+    assert not arrivals
+
+
+def test_negative_times_are_signed():
+    feed = trip_entity("1", "G", stop_time("F24N", arrival=-60))
+    _, arrivals = parse_feed(feed, "F24N")
+    assert arrivals[0].arrives_at == -60
+
+
+@pytest.mark.parametrize("data", [
+    # Varint whose last byte still has its continuation bit set
+    b"\x18\x80",
+    # Key varint cut off
+    b"\x80",
+    # Varint longer than 64 bits
+    b"\x18" + b"\xff" * 10 + b"\x01",
+    # Length-delimited field longer than the data
+    field(1, b"\x18\x01")[:-1],
+    # Nested message whose last varint runs past its end into the next field
+    field(1, b"\x18\x80") + field(2, b"\x0a\x00"),
+    # Wire type 3 (start group) is not supported
+    b"\x0b",
+])
+def test_malformed_data_raises(data):
+    with pytest.raises(GtfsDecodeError):
+        parse_feed(data, "F24N")
+
+
+def test_every_truncation_of_fixture_raises_or_decodes_a_prefix():
+    with open(FIXTURE, "rb") as fixture:
+        data = fixture.read()
+    _, complete = parse_feed(data, "F24N")
+    for length in range(1, len(data)):
+        try:
+            _, arrivals = parse_feed(data[:length], "F24N")
+        except GtfsDecodeError:
+            continue
+        # Only a cut between two top-level fields decodes, to the entities before it
+        assert arrivals == complete[:len(arrivals)]
@@ -0,0 +1,77 @@
+import pytest
+
+from layout import (
+    MIN_ROW_GAP, PRESETS, LayoutSpec, RowGeometry, compile_layout, display_size, layout_from_env,
+    rows_that_fit
+)
+
+
+def test_default_preset_keeps_original_coordinates():
+    layout = compile_layout(PRESETS["2x64x32"])
+    assert (layout.width, layout.height) == (128, 32)
+    assert layout.stale_indicator == (127, 0)
+    assert layout.rows == (
+        RowGeometry(x=2, y=2, height=10, bullet_end_x=15, circle_x=8, circle_y=7, radius=6,
+                    letter_x=5, letter_y=3, line_name_x=17, name_end_x=89, minutes_x=93,
+                    minutes_end_x=127, baseline=11),
+        RowGeometry(x=2, y=18, height=10, bullet_end_x=15, circle_x=8, circle_y=23, radius=6,
+                    letter_x=5, letter_y=19, line_name_x=17, name_end_x=89, minutes_x=93,
+                    minutes_end_x=127, baseline=27),
+    )
+    assert layout.matrix_options() == {"rows": 32, "cols": 64, "chain_length": 2, "parallel": 1}
+
+
+@pytest.mark.parametrize("preset, size, rows", [
+    ("2x64x32", (128, 32), 2),
+    ("4x64x32", (256, 32), 2),
+    ("4x64x32-u", (128, 64), 4),
+    ("64x64", (64, 64), 4),
+    ("2x64x64", (128, 64), 5),
+])
+def test_presets_compile(preset, size, rows):
+    layout = compile_layout(PRESETS[preset])
+    assert (layout.width, layout.height) == size
+    assert len(layout.rows) == rows
+    # Every row's band, one pixel either side of it, stays on the display
+    assert layout.rows[0].y - 1 >= 1
+    assert layout.rows[-1].y + layout.rows[-1].height < layout.height
+    for upper, lower in zip(layout.rows, layout.rows[1:]):
+        assert lower.y - (upper.y + upper.height) >= MIN_ROW_GAP
+
+
+@pytest.mark.parametrize("height, fit", [
+    # The second row needs 2 + 16 + 10 rows plus one below its band
+    (28, 1),
+    (29, 2),
+    (44, 2),
+    (45, 3),
+    (10, 0),
+])
+def test_rows_that_fit(height, fit):
+    assert rows_that_fit(LayoutSpec(), height) == fit
+
+
+def test_u_mapper_folds_chain_in_half():
+    spec = PRESETS["4x64x32-u"]
+    assert display_size(spec) == (128, 64)
+    assert compile_layout(spec).matrix_options()["pixel_mapper_config"] == "U-mapper"
+
+
+@pytest.mark.parametrize("spec, message", [
+    (LayoutSpec(rows=3), "3 rows do not fit"),
+    (LayoutSpec(rows=0), "0 rows do not fit"),
+    (LayoutSpec(row_gap=MIN_ROW_GAP - 1), "at least 2 pixels apart"),
+    (LayoutSpec(padding_top=1), "stale indicator"),
+    (LayoutSpec(panel_cols=32, chain_length=1), "No room for line names"),
+    (LayoutSpec(pixel_mapper="Rotate:90"), "Unsupported pixel mapper"),
+])
+def test_layouts_that_do_not_fit_raise(spec, message):
+    with pytest.raises(ValueError, match=message):
+        compile_layout(spec)
+
+
+def test_layout_from_env():
+    assert layout_from_env("64x64", None) == PRESETS["64x64"]
+    assert layout_from_env("2x64x64", "3").rows == 3
+    with pytest.raises(ValueError, match="Unknown MATRIX_LAYOUT"):
+        layout_from_env("3x64x32", None)
@@ -0,0 +1,84 @@
+import logging
+import queue
+
+from log_pipeline import DroppingQueueHandler, DuplicateFilter, PayloadRing, RateLimitFilter
+from metrics import METRICS
+
+
+def record(message: str, created: float, lineno: int = 10, *args) -> logging.LogRecord:
+    made = logging.LogRecord("sign", logging.WARNING, "sign.py", lineno, message, args, None)
+    made.created = created
+    return made
+
+
+def test_rate_limit_drops_past_limit_per_window():
+    limit = RateLimitFilter(limit=3, window=60.0)
+    dropped = METRICS.counters.get("log_records_rate_limited", 0)
+    passed = [limit.filter(record("poll failed", 1000.0 + i)) for i in range(5)]
+    assert passed == [True, True, True, False, False]
+    assert METRICS.counters["log_records_rate_limited"] == dropped + 2
+
+    # The first record in the next window says how many were dropped
+    first = record("poll failed", 1060.0)
+    assert limit.filter(first)
+    assert first.getMessage() == "poll failed [2 more dropped by the rate limit]"
+    following = record("poll failed", 1061.0)
+    assert limit.filter(following)
+    assert following.getMessage() == "poll failed"
+
+
+def test_rate_limit_counts_each_call_site():
+    limit = RateLimitFilter(limit=1, window=60.0)
+    assert limit.filter(record("a", 1000.0, lineno=10))
+    assert not limit.filter(record("a", 1001.0, lineno=10))
+    assert limit.filter(record("b", 1001.0, lineno=20))
+
+
+def test_duplicates_are_suppressed_and_counted():
+    duplicates = DuplicateFilter(interval=300.0)
+    assert duplicates.filter(record("timed out", 1000.0))
+    assert not duplicates.filter(record("timed out", 1010.0))
+    assert not duplicates.filter(record("timed out", 1020.0))
+
+    # A different message from the same line says how many were suppressed
+    changed = record("HTTP %d", 1030.0, 10, 503)
+    assert duplicates.filter(changed)
+    assert changed.getMessage() == "HTTP 503 [previous message repeated 2 more times]"
+
+
+def test_persistent_duplicate_is_repeated_after_interval():
+    duplicates = DuplicateFilter(interval=300.0)
+    assert duplicates.filter(record("timed out", 1000.0))
+    for offset in range(10, 300, 10):
+        assert not duplicates.filter(record("timed out", 1000.0 + offset))
+    repeat = record("timed out", 1300.0)
+    assert duplicates.filter(repeat)
+    assert repeat.getMessage() == "timed out [repeated 29 more times]"
+    # Counting starts again from the repeat
+    assert not duplicates.filter(record("timed out", 1310.0))
+
+
+def test_duplicates_are_per_call_site():
+    duplicates = DuplicateFilter()
+    assert duplicates.filter(record("timed out", 1000.0, lineno=10))
+    assert duplicates.filter(record("timed out", 1000.0, lineno=20))
+
+
+def test_full_queue_drops_records():
+    records = queue.Queue(1)
+    handler = DroppingQueueHandler(records)
+    dropped = METRICS.counters.get("log_records_dropped", 0)
+    handler.handle(record("first", 1000.0))
+    handler.handle(record("second", 1001.0))
+    assert records.get_nowait().getMessage() == "first"
+    assert METRICS.counters["log_records_dropped"] == dropped + 1
+
+
+def test_payload_ring_keeps_most_recent():
+    ring = PayloadRing(size=2)
+    for number in range(3):
+        ring.record("poll", {"n": number})
+    lines = ring.dump().splitlines()
+    assert lines[0] == "Last 2 payloads:"
+    assert lines[1].endswith("poll: {'n': 1}")
+    assert lines[2].endswith("poll: {'n': 2}")
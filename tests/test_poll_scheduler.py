@@ -0,0 +1,77 @@
+import random
+
+import pytest
+
+from poll_scheduler import PollScheduler
+from train_record import TrainArrival
+
+NOW = 1_000_000.0
+
+
+def scheduler() -> PollScheduler:
+    return PollScheduler(interval=60, min_interval=15, max_interval=120, rng=random.Random(1))
+
+
+def trains(*statuses: str):
+    return [TrainArrival("F", status, False) for status in statuses]
+
+
+def test_no_arrival_times_uses_interval():
+    polls = scheduler()
+    assert polls.on_success(trains("Delayed"), now=NOW) == 60
+    assert polls.reason == "no arrival times listed"
+
+
+@pytest.mark.parametrize("statuses, delay", [
+    # The next train is half a minute into its minute: 90s away, so poll in 45s
+    (("1 mins", "9 mins"), 45),
+    # The soonest timed arrival counts, whatever the order
+    (("Delayed", "9 mins", "2 mins"), 75),
+    # Far away: capped at the maximum
+    (("5 mins",), 120),
+    # Arriving now: never sooner than the minimum
+    (("0 mins",), 15),
+])
+def test_polls_sooner_as_train_gets_closer(statuses, delay):
+    assert scheduler().on_success(trains(*statuses), now=NOW) == pytest.approx(delay)
+
+
+def test_unchanged_responses_spread_polls_out():
+    polls = scheduler()
+    polls.on_success(trains("1 mins"), now=NOW)
+    # 90s to the train: half of what is left, times 1.5 per unchanged poll
+    assert polls.on_success(None, now=NOW + 10) == pytest.approx(40 * 1.5)
+    assert polls.on_success(None, now=NOW + 50) == pytest.approx(20 * 1.5 ** 2)
+    assert "unchanged 2x" in polls.reason
+    # New data resets the growth
+    assert polls.on_success(trains("1 mins"), now=NOW + 60) == pytest.approx(45)
+
+
+def test_arrived_trains_fall_back_to_interval():
+    polls = scheduler()
+    polls.on_success(trains("1 mins"), now=NOW)
+    assert polls.on_success(None, now=NOW + 100) == pytest.approx(60 * 1.5)
+
+
+def test_failures_back_off_exponentially_with_jitter():
+    polls = scheduler()
+    for failures, ceiling in enumerate((30, 60, 120, 120), start=1):
+        delay = polls.on_error()
+        assert ceiling / 2 <= delay <= ceiling
+        assert polls.failures == failures
+    polls.on_success(trains("5 mins"), now=NOW)
+    assert polls.failures == 0
+    assert 15 <= polls.on_error() <= 30
+
+
+def test_jitter_spreads_displays_apart():
+    delays = {
+        PollScheduler(60, 15, 120, rng=random.Random(seed)).on_error() for seed in range(5)
+    }
+    assert len(delays) == 5
+
+
+def test_minimum_above_maximum_is_capped():
+    polls = PollScheduler(interval=60, min_interval=200, max_interval=120)
+    assert polls.min_interval == 120
+    assert polls.on_success(trains("0 mins"), now=NOW) == 120
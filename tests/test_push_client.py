@@ -0,0 +1,160 @@
+import asyncio
+import socket
+
+import pytest
+
+import push_client
+from fake_train_api import FakeTrainApi
+from metrics import METRICS
+from pipeline import LatestValue
+from poll_scheduler import PollScheduler
+from push_client import TrainPushClient, push_loop
+from train_client import TrainApiClient
+from train_record import TrainArrival
+
+TRAINS = [
+    {"line": "F", "status": "3 mins", "express": False},
+    {"line": "G", "status": "7 mins", "express": True},
+]
+
+
+@pytest.fixture(name="api")
+def fixture_api():
+    api = FakeTrainApi(TRAINS, keepalive=0.2).start()
+    yield api
+    api.stop()
+
+
+@pytest.fixture(name="fast_retry")
+def fixture_fast_retry(monkeypatch):
+    """Resubscribe almost at once instead of after the server's retry delay."""
+    monkeypatch.setattr(push_client, "PUSH_MAX_RETRY", 0.05)
+
+
+def closed_port_url() -> str:
+    """Get a local URL nothing is listening on."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}/trains/fg-northbound-next/events"
+
+
+async def wait_for_trains(slot: LatestValue, version: int, timeout: float = 5.0):
+    """Wait for the slot to hold a train list published after version."""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while True:
+        remaining = deadline - asyncio.get_running_loop().time()
+        assert remaining > 0, "no trains published in time"
+        if await slot.wait(version, remaining) and slot.value.trains is not None:
+            return slot.value.trains
+        version = slot.version
+
+
+async def run_push_loop(push_url: str, poll_url: str, scenario):
+    """Run push_loop in the background while scenario(slot) runs."""
+    slot = LatestValue()
+    push = TrainPushClient(push_url, timeout=1.0, read_timeout=1.0)
+    async with TrainApiClient(poll_url, timeout=1.0) as poll_client:
+        task = asyncio.create_task(
+            push_loop(push, poll_client, slot, PollScheduler(1.0, 0.1, 1.0))
+        )
+        try:
+            await scenario(slot, push)
+        finally:
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+
+def test_pushed_trains_reach_slot(api):
+    async def scenario(slot, push):
+        trains = await wait_for_trains(slot, 0)
+        assert trains == [TrainArrival("F", "3 mins", False), TrainArrival("G", "7 mins", True)]
+
+        version = slot.version
+        api.set_trains([{"line": "G", "status": "Delayed", "express": False}])
+        assert await wait_for_trains(slot, version) == [TrainArrival("G", "Delayed", False)]
+        assert api.events_sent == 2
+        assert api.requests == 0
+        assert push.last_event_id is not None
+
+    asyncio.run(run_push_loop(api.url + "/events", api.url, scenario))
+
+
+def test_subscribe_resumes_from_last_event_id(api):
+    async def scenario():
+        async with TrainPushClient(api.url + "/events", timeout=1.0) as push:
+            received = []
+            async for trains in push.subscribe():
+                if trains is not None:
+                    received.append(trains)
+                    break
+            assert len(received) == 1
+            last_id = push.last_event_id
+
+            # The list has not changed, so resuming only gets keepalives
+            keepalives = 0
+            async for trains in push.subscribe():
+                assert trains is None
+                keepalives += 1
+                if keepalives == 3:
+                    break
+            assert api.events_sent == 1
+
+            api.count_down()
+            async for trains in push.subscribe():
+                if trains is not None:
+                    assert trains[0] == TrainArrival("F", "2 mins", False)
+                    break
+            assert push.last_event_id != last_id
+            assert api.subscriptions == [None, last_id, last_id]
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.usefixtures("fast_retry")
+def test_push_loop_reconnects_with_last_event_id():
+    # Keepalives slower than the client's read timeout drop every subscription
+    api = FakeTrainApi(TRAINS, keepalive=5.0).start()
+    try:
+        async def scenario(slot, push):
+            await wait_for_trains(slot, 0)
+            last_id = push.last_event_id
+            while len(api.subscriptions) < 3:
+                await asyncio.sleep(0.05)
+            # Every reconnect said which list it had, so none was sent again
+            assert api.subscriptions[:3] == [None, last_id, last_id]
+            assert api.events_sent == 1
+
+            version = slot.version
+            api.count_down()
+            trains = await wait_for_trains(slot, version)
+            assert trains[0] == TrainArrival("F", "2 mins", False)
+            assert push.last_event_id != last_id
+
+        asyncio.run(run_push_loop(api.url + "/events", api.url, scenario))
+    finally:
+        api.stop()
+
+
+@pytest.mark.usefixtures("fast_retry")
+def test_polling_takes_over_while_stream_is_down(api):
+    fallbacks = METRICS.counters.get("push_fallbacks", 0)
+
+    async def scenario(slot, _push):
+        trains = await wait_for_trains(slot, 0, timeout=10.0)
+        assert trains == [TrainArrival("F", "3 mins", False), TrainArrival("G", "7 mins", True)]
+        assert api.requests >= 1
+        assert METRICS.counters["push_fallbacks"] == fallbacks + 1
+
+    asyncio.run(run_push_loop(closed_port_url(), api.url, scenario))
+
+
+def test_polling_takes_over_without_event_stream(api):
+    async def scenario(slot, _push):
+        await wait_for_trains(slot, 0)
+        assert api.requests >= 2
+        assert api.events_sent == 0
+
+    # The plain train list URL answers with JSON, not an event stream
+    asyncio.run(run_push_loop(api.url, api.url, scenario))
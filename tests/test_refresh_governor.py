@@ -0,0 +1,170 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import refresh_governor
+from refresh_governor import (
+    FRAME_WINDOW, STEP_DOWN_AFTER, RefreshGovernor, RefreshProfile, parse_time_span
+)
+
+
+def matrix(pwm_bits: int = 11, brightness: int = 80) -> SimpleNamespace:
+    return SimpleNamespace(pwmBits=pwm_bits, brightness=brightness)
+
+
+def at_local_time(monkeypatch, hours: int, minutes: int) -> None:
+    clock = time.struct_time((2026, 1, 15, hours, minutes, 0, 3, 15, 0))
+    monkeypatch.setattr(refresh_governor.time, "localtime", lambda *_: clock)
+
+
+def test_profiles_derive_from_matrix_settings():
+    governor = RefreshGovernor(matrix(), night_span="")
+    assert governor.profiles == {
+        "active": RefreshProfile("active", 11, 80),
+        "static": RefreshProfile("static", 6, 80),
+        "night": RefreshProfile("night", 4, 40),
+    }
+    assert governor.current.name == "active"
+
+
+def test_steps_down_only_after_quiet_period():
+    panel = matrix()
+    governor = RefreshGovernor(panel, night_span="")
+    start = time.monotonic()
+    assert governor.update(start + STEP_DOWN_AFTER - 1).name == "active"
+    assert governor.update(start + STEP_DOWN_AFTER + 1).name == "static"
+    assert (panel.pwmBits, panel.brightness) == (6, 80)
+
+
+def test_animation_steps_up_at_once_and_holds():
+    panel = matrix()
+    governor = RefreshGovernor(panel, night_span="")
+    start = time.monotonic() + STEP_DOWN_AFTER + 1
+    governor.update(start)
+    assert governor.current.name == "static"
+
+    # A slow countdown, one frame a second, is not animation
+    for second in range(5):
+        governor.note_frame(start + second)
+    assert governor.current.name == "static"
+
+    # Scrolling at 10 frames a second steps up without waiting for update()
+    frame_at = start + 5
+    while governor.current.name != "active":
+        frame_at += 0.1
+        governor.note_frame(frame_at)
+    assert frame_at - start < 6
+    assert panel.pwmBits == 11
+
+    # Once the scrolling stops the active profile is held for STEP_DOWN_AFTER
+    assert governor.update(frame_at + FRAME_WINDOW + 0.5).name == "active"
+    assert governor.update(frame_at + STEP_DOWN_AFTER - 0.5).name == "active"
+    assert governor.update(frame_at + STEP_DOWN_AFTER + 0.5).name == "static"
+
+
+@pytest.mark.parametrize("hours, minutes, night", [
+    (22, 59, False),
+    (23, 0, True),
+    (0, 0, True),
+    (1, 59, True),
+    (2, 0, False),
+    (12, 0, False),
+])
+def test_night_span_crosses_midnight(monkeypatch, hours, minutes, night):
+    at_local_time(monkeypatch, hours, minutes)
+    panel = matrix()
+    governor = RefreshGovernor(panel, night_span="23:00-02:00")
+    profile = governor.update(time.monotonic() + STEP_DOWN_AFTER + 1)
+    assert profile.name == ("night" if night else "static")
+    assert panel.brightness == (40 if night else 80)
+
+
+def test_night_span_within_a_day(monkeypatch):
+    governor = RefreshGovernor(matrix(), night_span="01:00-05:00")
+    at_local_time(monkeypatch, 0, 59)
+    assert not governor._is_night()  # pylint: disable=protected-access
+    at_local_time(monkeypatch, 3, 0)
+    assert governor._is_night()  # pylint: disable=protected-access
+
+
+def test_parse_time_span():
+    assert parse_time_span("23:00-02:30") == (23 * 60, 2 * 60 + 30)
+    assert parse_time_span(" 1:00 - 5:00 ") == (60, 300)
+    assert parse_time_span("") is None
+
+
+@pytest.mark.parametrize("span", [
+    "1-5", "01:00", "01:00-", "1:0-5:00", "24:00-05:00", "01:00-05:60", "01:00-05:00-07:00",
+    "one-five",
+])
+def test_malformed_time_span_raises(span):
+    with pytest.raises(ValueError):
+        parse_time_span(span)
+
+
+def test_malformed_night_span_disables_night_profile(monkeypatch, caplog):
+    at_local_time(monkeypatch, 3, 0)
+    panel = matrix()
+    governor = RefreshGovernor(panel, night_span="1-5")
+    assert "Night profile disabled" in caplog.text
+    assert governor.night_span is None
+    assert governor.update(time.monotonic() + STEP_DOWN_AFTER + 1).name == "static"
+
+
+def test_profile_reaches_every_canvas():
+    panel = matrix()
+    governor = RefreshGovernor(panel, night_span="")
+    front, back = matrix(), matrix()
+    governor.add_canvas(front)
+    governor.add_canvas(back)
+    governor.add_canvas(front)
+    assert governor.canvases == [panel, front, back]
+
+    governor.update(time.monotonic() + STEP_DOWN_AFTER + 1)
+    assert all(canvas.pwmBits == 6 for canvas in governor.canvases)
+    # A canvas seen later starts at the profile in use
+    late = matrix()
+    governor.add_canvas(late)
+    assert (late.pwmBits, late.brightness) == (6, 80)
+
+
+def virtual_controller():
+    # pylint: disable=import-outside-toplevel
+    from matrix_setup import load_numpy_font
+    from rgb_matrix_controller import RGBMatrixController
+    from virtual_matrix import VirtualMatrix
+    font, graphics = load_numpy_font()
+    components = {
+        "matrix": VirtualMatrix(128, 32), "font": font, "graphics": graphics,
+        "backend": "numpy", "is_mock": False,
+    }
+    return RGBMatrixController(double_buffered=True, matrix_components=components)
+
+
+def test_controller_repaints_after_brightness_change():
+    # pylint: disable=import-outside-toplevel
+    from train_record import TrainArrival
+    trains = [TrainArrival("F", "3 mins", False), TrainArrival("G", "7 mins", True)]
+    controller = virtual_controller()
+    panel = controller.matrix
+    governor = controller.governor
+    governor.night_span = None
+    governor.profiles["static"] = RefreshProfile("static", 6, 50)
+
+    controller.display_trains(trains)
+    controller.display_trains(trains[::-1])
+    frames = panel.frame_count
+    controller.display_trains(trains[::-1])
+    assert panel.frame_count == frames
+
+    # Nothing has moved for longer than STEP_DOWN_AFTER, so the tick steps down
+    governor._last_active -= STEP_DOWN_AFTER + 1  # pylint: disable=protected-access
+    controller.tick()
+    assert governor.current.name == "static"
+    # The matrix and both of its frame canvases
+    assert len(governor.canvases) == 3
+    assert all((c.pwmBits, c.brightness) == (6, 50) for c in governor.canvases)
+    # The unchanged trains are drawn again at the new brightness
+    controller.display_trains(trains[::-1])
+    assert panel.frame_count == frames + 1
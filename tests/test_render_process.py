@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+
+from render_process import FrameRing
+
+WIDTH, HEIGHT, SLOTS = 8, 4, 4
+
+
+@pytest.fixture(name="ring")
+def fixture_ring():
+    ring = FrameRing.create(WIDTH, HEIGHT, SLOTS)
+    yield ring
+    ring.close()
+    ring.memory.unlink()
+
+
+def frame(value: int) -> np.ndarray:
+    return np.full((HEIGHT, WIDTH, 3), value, dtype=np.uint8)
+
+
+def test_empty_ring_has_nothing_to_read(ring):
+    out = frame(0)
+    assert ring.latest == 0
+    assert ring.read_latest(out) is None
+
+
+def test_reads_newest_frame_once(ring):
+    out = frame(0)
+    assert ring.write(frame(1)) == 1
+    assert ring.write(frame(2)) == 2
+    assert ring.read_latest(out) == 2
+    assert (out == 2).all()
+    # Nothing newer than what the reader has
+    assert ring.read_latest(out, after=2) is None
+
+
+def test_wraps_around_slots(ring):
+    out = frame(0)
+    seen = 0
+    for value in range(1, 3 * SLOTS + 2):
+        assert ring.write(frame(value)) == value
+        if value % 3 == 0:
+            seq = ring.read_latest(out, seen)
+            assert seq == value
+            assert (out == value).all()
+            seen = seq
+    assert ring.read_latest(out, seen) == 3 * SLOTS + 1
+    assert (out == 3 * SLOTS + 1).all()
+
+
+def test_skipped_frames_show_as_sequence_gaps(ring):
+    out = frame(0)
+    ring.write(frame(1))
+    seen = ring.read_latest(out)
+    for value in range(2, 2 + SLOTS + 3):
+        ring.write(frame(value))
+    seq = ring.read_latest(out, seen)
+    # The render process counts seq - seen - 1 frames as skipped
+    assert seq - seen - 1 == SLOTS + 2
+    assert (out == seq).all()
+
+
+def test_reader_sees_writer_through_shared_memory(ring):
+    reader = FrameRing.attach(ring.memory.name, WIDTH, HEIGHT, SLOTS, ring.lock)
+    try:
+        out = frame(0)
+        ring.write(frame(7))
+        assert reader.read_latest(out) == 1
+        assert (out == 7).all()
+    finally:
+        reader.close()
+
+
+class WritesDuringCopy:
+    """Stands in for the reader's frame, letting the writer run while it is copied."""
+
+    def __init__(self, ring: FrameRing, frames: int):
+        self.ring = ring
+        self.frames = frames
+        self.copied = None
+
+    def __setitem__(self, key, slot_pixels):
+        for value in range(100, 100 + self.frames):
+            self.ring.write(frame(value))
+        self.copied = np.array(slot_pixels[key])
+
+
+def test_slot_being_read_is_not_overwritten(ring):
+    ring.write(frame(1))
+    ring.write(frame(2))
+    out = WritesDuringCopy(ring, 3 * SLOTS)
+    assert ring.read_latest(out) == 2
+    assert (out.copied == 2).all()
+    # The writer went on around the slot, and the reader released it
+    seq = ring.read_latest(frame(0), 2)
+    assert seq == 2 + 3 * SLOTS
+    pixels = frame(0)
+    ring.write(frame(9))
+    ring.read_latest(pixels, seq)
+    assert (pixels == 9).all()
+
+
+def test_too_few_slots_raise():
+    with pytest.raises(ValueError, match="at least 3 slots"):
+        FrameRing.create(WIDTH, HEIGHT, 2)
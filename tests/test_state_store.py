@@ -0,0 +1,143 @@
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import state_store
+from pipeline import FetchResult, LatestValue, render_loop
+from state_store import STATE_VERSION, SavedState, StateStore
+from train_record import TrainArrival
+
+TRAINS = [TrainArrival("F", "5 mins", False), TrainArrival("G", "Delayed", True)]
+
+
+@pytest.fixture(name="store")
+def fixture_store(tmp_path):
+    return StateStore(str(tmp_path / "state" / "state.json"))
+
+
+def test_save_and_load(store):
+    store.save(TRAINS, 1000.0)
+    saved = store.load()
+    assert saved == SavedState(TRAINS, 1000.0)
+    # Only the state file is left behind, no temporary one
+    assert os.listdir(os.path.dirname(store.path)) == ["state.json"]
+
+
+def test_failed_save_keeps_previous_state(store, monkeypatch):
+    store.save(TRAINS, 1000.0)
+
+    def fail(*_):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(state_store.os, "replace", fail)
+    store.save([TrainArrival("G", "1 mins", False)], 2000.0)
+    assert store.load() == SavedState(TRAINS, 1000.0)
+
+
+@pytest.mark.parametrize("content", [
+    "",
+    "{not json",
+    "[]",
+    json.dumps({"version": STATE_VERSION + 1, "received_at": 1, "trains": []}),
+    json.dumps({"version": STATE_VERSION, "trains": []}),
+    json.dumps({"version": STATE_VERSION, "received_at": 1, "trains": [{"status": "3 mins"}]}),
+])
+def test_unusable_state_is_ignored(store, content):
+    os.makedirs(os.path.dirname(store.path))
+    with open(store.path, "w", encoding="utf-8") as state:
+        state.write(content)
+    assert store.load() is None
+
+
+def test_missing_state_is_ignored(store):
+    assert store.load() is None
+
+
+def test_old_state_is_ignored(store):
+    store.save(TRAINS, time.time() - 100)
+    assert store.load(max_age=200) is not None
+    assert store.load(max_age=50) is None
+
+
+def test_saved_trains_are_counted_down():
+    saved = SavedState(TRAINS, 1000.0)
+    assert saved.age(now=1090.0) == 90.0
+    # Arrivals are taken to be in the middle of their minute
+    assert saved.trains_at(now=1120.0) == [
+        TrainArrival("F", "3 mins", False), TrainArrival("G", "Delayed", True),
+    ]
+
+
+class RecordingController:
+    """Stands in for the matrix controller, keeping every frame it is given."""
+
+    def __init__(self):
+        self.frames = []
+
+    def display_trains(self, trains, stale=False):
+        self.frames.append((list(trains), stale))
+
+    def tick(self):
+        pass
+
+    def scroll_interval(self):
+        return None
+
+
+@pytest.mark.parametrize("age, shown, stale", [
+    (1.0, TRAINS[0], False),
+    (30.0, TRAINS[0], True),
+    (120.0, TrainArrival("?", "No data", False), False),
+])
+def test_render_loop_ages_data(age, shown, stale):
+    async def run():
+        controller = RecordingController()
+        slot = LatestValue()
+        # Received just now, but the API last answered `age` seconds ago
+        slot.publish(FetchResult(TRAINS, None, time.time()))
+        slot.fresh_at = time.time() - age
+        with ThreadPoolExecutor(1) as executor:
+            task = asyncio.create_task(
+                render_loop(controller, slot, executor, 60.0, cadence=0.01, stale_after=20.0)
+            )
+            while not controller.frames:
+                await asyncio.sleep(0.01)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        return controller.frames[0]
+
+    trains, frame_stale = asyncio.run(run())
+    assert trains[0] == shown
+    assert frame_stale == stale
+
+
+def test_render_loop_logs_an_outage_once(caplog):
+    async def run():
+        controller = RecordingController()
+        slot = LatestValue()
+        with ThreadPoolExecutor(1) as executor:
+            task = asyncio.create_task(render_loop(controller, slot, executor, 60.0, cadence=0.01))
+            # Old trains keep arriving, as from a hub that lost the API
+            for _ in range(3):
+                slot.publish(FetchResult(TRAINS, None, time.time() - 120))
+                await asyncio.sleep(0.05)
+            slot.publish(FetchResult(TRAINS, None, time.time()))
+            while controller.frames[-1][0][0] != TRAINS[0]:
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.05)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    caplog.set_level("INFO", logger="pipeline")
+    asyncio.run(run())
+    messages = [record.getMessage() for record in caplog.records if record.name == "pipeline"]
+    assert [message for message in messages if message.startswith("No successful poll")] == [
+        "No successful poll for 120s"
+    ]
+    assert [message for message in messages if message.startswith("Polling recovered")] == [
+        "Polling recovered after 120s"
+    ]
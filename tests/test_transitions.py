@@ -0,0 +1,101 @@
+import time
+
+import numpy as np
+import pytest
+
+from transitions import TRANSITIONS, TransitionPlayer
+
+HEIGHT, WIDTH = 32, 128
+
+
+def frames_to_compare():
+    rng = np.random.default_rng(7)
+    old = rng.integers(0, 256, (HEIGHT, WIDTH, 3), dtype=np.uint8)
+    new = rng.integers(0, 256, (HEIGHT, WIDTH, 3), dtype=np.uint8)
+    return old, new
+
+
+@pytest.mark.parametrize("style", list(TRANSITIONS))
+@pytest.mark.parametrize("count", [1, 7, 20])
+def test_last_frame_is_new(style, count):
+    old, new = frames_to_compare()
+    player = TransitionPlayer(style, duration=count / 50, fps=50)
+    assert player.count == count
+    frames = player.frames(old, new)
+    assert frames.shape == (count, HEIGHT, WIDTH, 3)
+    assert frames.dtype == np.uint8
+    assert np.array_equal(frames[-1], new)
+
+
+def test_slide_moves_old_frame_up():
+    old, new = frames_to_compare()
+    frames = TransitionPlayer("slide", duration=0.08, fps=50).frames(old, new)
+    # Four frames of 32 rows: each moves the content up by 8 rows
+    assert np.array_equal(frames[0][:24], old[8:])
+    assert np.array_equal(frames[0][24:], new[:8])
+    assert np.array_equal(frames[2][:8], old[24:])
+
+
+def test_wipe_uncovers_from_the_left():
+    old, new = frames_to_compare()
+    frames = TransitionPlayer("wipe", duration=0.08, fps=50).frames(old, new)
+    assert np.array_equal(frames[1][:, :64], new[:, :64])
+    assert np.array_equal(frames[1][:, 64:], old[:, 64:])
+
+
+def test_fade_moves_steadily_towards_new():
+    old = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+    new = np.full((HEIGHT, WIDTH, 3), 255, dtype=np.uint8)
+    frames = TransitionPlayer("fade", duration=0.08, fps=50).frames(old, new)
+    assert [int(frame[0, 0, 0]) for frame in frames] == [63, 127, 191, 255]
+
+
+def test_tables_are_built_once_per_size():
+    player = TransitionPlayer("wipe", duration=0.1, fps=50)
+    old, new = frames_to_compare()
+    player.frames(old, new)
+    table = player._tables[(HEIGHT, WIDTH)]  # pylint: disable=protected-access
+    player.frames(new, old)
+    assert player._tables[(HEIGHT, WIDTH)] is table  # pylint: disable=protected-access
+
+
+def test_play_shows_every_frame_when_on_time():
+    old, new = frames_to_compare()
+    player = TransitionPlayer("fade", duration=0.1, fps=50)
+    shown_frames = []
+    start = time.perf_counter()
+    shown, skipped = player.play(old, new, shown_frames.append)
+    elapsed = time.perf_counter() - start
+    # The last frame is left to the caller, once it is due
+    assert (shown, skipped) == (player.count - 1, 0)
+    assert len(shown_frames) == player.count - 1
+    assert elapsed >= (player.count - 1) * player.interval
+
+
+def test_play_skips_frames_when_behind():
+    old, new = frames_to_compare()
+    player = TransitionPlayer("slide", duration=0.2, fps=50)
+    shown_frames = []
+
+    def slow_show(frame):
+        # Three frame intervals per frame: the panel cannot keep up
+        shown_frames.append(frame)
+        time.sleep(3 * player.interval)
+
+    shown, skipped = player.play(old, new, slow_show)
+    assert skipped > 0
+    assert shown == len(shown_frames)
+    assert shown + skipped == player.count - 1
+    # Frames still go out in order, never the incoming frame itself
+    frames = player.frames(old, new)
+    indexes = [
+        next(i for i, frame in enumerate(frames) if np.array_equal(frame, shown_frame))
+        for shown_frame in shown_frames
+    ]
+    assert indexes == sorted(indexes)
+    assert indexes[-1] < player.count - 1
+
+
+def test_unknown_style_raises():
+    with pytest.raises(ValueError, match="Unknown transition"):
+        TransitionPlayer("spin")
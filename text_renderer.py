@@ -1,6 +1,9 @@
 import time
 from typing import Dict, Any, Optional
 
+# Characters whose advance widths are measured when a renderer is created
+PRELOADED_CHARACTERS = "".join(chr(code) for code in range(32, 127))
+
 
 class TextRenderer:
     """Handles text rendering on the LED matrix display."""
@@ -15,10 +18,24 @@ class TextRenderer:
             is_mock: Whether to use mock mode
         """
         self.matrix = matrix
+        self.canvas = matrix
         self.font = font
         self.graphics = graphics
         self.is_mock = is_mock
         self.text_color = None if is_mock else graphics.Color(255, 255, 255)
+        # Advance width of each character in this font, filled in as new ones appear
+        self.advances: Dict[str, int] = {}
+        if not is_mock:
+            for char in PRELOADED_CHARACTERS:
+                self.advances[char] = font.CharacterWidth(ord(char))
+
+    def set_canvas(self, canvas: Any) -> None:
+        """Point subsequent draw calls at a different canvas.
+
+        Args:
+            canvas: The matrix or off-screen frame canvas to draw on
+        """
+        self.canvas = canvas
     
     def get_text_width(self, text: str) -> int:
         """Get the pixel width of text using the current font.
@@ -31,7 +48,14 @@ class TextRenderer:
         """
         if self.is_mock:
             return len(text) * 5  # Approximate for mock
-        return sum(self.font.CharacterWidth(ord(c)) for c in text)
+        advances = self.advances
+        try:
+            return sum(advances[c] for c in text)
+        except KeyError:
+            for c in text:
+                if c not in advances:
+                    advances[c] = self.font.CharacterWidth(ord(c))
+            return sum(advances[c] for c in text)
     
     def draw_text(self, text: str, x: int, y: int) -> None:
         """Draw text at the specified position.
@@ -45,7 +69,7 @@ class TextRenderer:
             return
             
         self.graphics.DrawText(
-            self.matrix, self.font, x, y,
+            self.canvas, self.font, x, y,
             self.text_color, text
         )
         
@@ -69,13 +93,13 @@ class TextRenderer:
         
         # Draw the fixed text at the calculated position
         self.graphics.DrawText(
-            self.matrix, self.font, fixed_x, y,
+            self.canvas, self.font, fixed_x, y,
             self.text_color, fixed_text
         )
         
         # Calculate and draw the variable text to the left of the fixed text
         variable_x = fixed_x - self.get_text_width(variable_text)
         self.graphics.DrawText(
-            self.matrix, self.font, variable_x, y,
+            self.canvas, self.font, variable_x, y,
             self.text_color, variable_text
         )
\ No newline at end of file
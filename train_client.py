@@ -0,0 +1,160 @@
+import asyncio
+import socket
+import time
+from typing import Any, Callable, Dict, Optional
+
+import httpx
+
+from metrics import METRICS
+from train_record import decode_trains
+
+# How long a resolved API host address is reused before looking it up again
+DNS_CACHE_TTL = 300.0
+# Keep the pooled connection open across polling intervals
+KEEPALIVE_EXPIRY = 120.0
+
+
+class BadResponseError(Exception):
+    """The train API answered with an unexpected status code."""
+
+    def __init__(self, response: httpx.Response):
+        super().__init__(f"Bad response: {response.status_code}")
+        self.response = response
+
+
+class TrainApiClient:
+    """Long-lived client for the train API.
+
+    Keeps one pooled keep-alive connection, caches the API host's address
+    between polls and sends conditional GETs (If-None-Match /
+    If-Modified-Since), so an unchanged response costs neither a new
+    connection nor JSON decoding.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        timeout: float = 5.0,
+        dns_ttl: float = DNS_CACHE_TTL,
+        headers: Optional[Dict[str, str]] = None,
+        decode: Callable[[bytes], Any] = decode_trains
+    ):
+        """Initialize the client.
+
+        Args:
+            url: The API URL to poll for train data
+            timeout: Request timeout in seconds
+            dns_ttl: Seconds a resolved host address is reused
+            headers: Extra headers sent with every request (e.g. an API key)
+            decode: Turns a response body into the value fetch returns
+        """
+        self.url = httpx.URL(url)
+        self.dns_ttl = dns_ttl
+        self.headers = dict(headers or {})
+        self.decode = decode
+        self._client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=2,
+                max_keepalive_connections=1,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+        )
+        self._etag: Optional[str] = None
+        self._last_modified: Optional[str] = None
+        self._address: Optional[str] = None
+        self._resolved_at = 0.0
+
+    async def __aenter__(self) -> "TrainApiClient":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Close the pooled connection."""
+        await self._client.aclose()
+
+    async def _resolve(self) -> Optional[str]:
+        """Get the API host's address, resolving it at most once per TTL.
+
+        Returns:
+            The cached IP address, or None when the URL should be used as is
+        """
+        host = self.url.host
+        # Only plain HTTP can be sent to a bare address; HTTPS needs the name for SNI
+        if self.url.scheme != "http" or not host:
+            return None
+        try:
+            socket.inet_pton(socket.AF_INET6 if ":" in host else socket.AF_INET, host)
+            return None  # Already an address
+        except OSError:
+            pass
+
+        now = time.monotonic()
+        if self._address is None or now - self._resolved_at > self.dns_ttl:
+            port = self.url.port or 80
+            infos = await asyncio.get_running_loop().getaddrinfo(
+                host, port, type=socket.SOCK_STREAM
+            )
+            self._address = infos[0][4][0]
+            self._resolved_at = now
+        return self._address
+
+    def reset(self) -> None:
+        """Forget the cached address and validators so the next fetch starts fresh."""
+        self._address = None
+        self.clear_validators()
+
+    def clear_validators(self) -> None:
+        """Forget the validators so the next fetch returns the full train list."""
+        self._etag = None
+        self._last_modified = None
+
+    async def fetch(self) -> Optional[Any]:
+        """Fetch the current train list.
+
+        Returns:
+            The decoded trains (or whatever decode returns), or None if they
+            have not changed since the last successful fetch
+
+        Raises:
+            BadResponseError: If the API answers with anything but 200 or 304
+            httpx.HTTPError: On network errors
+            ValueError: If the body cannot be decoded (TrainDecodeError
+                with the default decoder)
+        """
+        headers = dict(self.headers)
+        if self._etag:
+            headers["If-None-Match"] = self._etag
+        if self._last_modified:
+            headers["If-Modified-Since"] = self._last_modified
+
+        url = self.url
+        METRICS.inc("polls")
+        try:
+            with METRICS.timer("fetch"):
+                address = await self._resolve()
+                if address is not None:
+                    headers["Host"] = url.netloc.decode("ascii")
+                    url = url.copy_with(host=address)
+                resp = await self._client.get(url, headers=headers)
+        except (OSError, httpx.HTTPError):
+            self.reset()
+            raise
+
+        if resp.status_code == 304:
+            METRICS.inc("not_modified")
+            METRICS.set("last_success_timestamp", time.time())
+            return None
+        if resp.status_code != 200:
+            # The caller will show an error, so the next response must not be a 304
+            self.reset()
+            raise BadResponseError(resp)
+
+        with METRICS.timer("decode"):
+            trains = self.decode(resp.content)
+        METRICS.set("last_success_timestamp", time.time())
+        self._etag = resp.headers.get("ETag")
+        self._last_modified = resp.headers.get("Last-Modified")
+        return trains
@@ -0,0 +1,139 @@
+import json
+import sys
+from typing import Any, Dict, List, NamedTuple, Optional
+
+# Optional fast JSON decoders, used in this order when installed
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Minutes statuses are built every countdown tick; reuse one string per value
+_MINUTES_STATUSES: Dict[int, str] = {}
+
+
+class TrainDecodeError(ValueError):
+    """A train payload is not a list of well-formed train records."""
+
+
+class TrainArrival(NamedTuple):
+    """One upcoming train, as shown on a display row.
+
+    Immutable and hashable, so a train can be used directly as a cache or
+    diff key. Strings are interned when decoded, so equal trains usually
+    share their strings and compare by identity.
+    """
+    line: str
+    status: str
+    express: bool
+
+
+def minutes_status(minutes: int) -> str:
+    """Get the shared "N mins" status string for a number of minutes.
+
+    Args:
+        minutes: Whole minutes until arrival
+
+    Returns:
+        The status string
+    """
+    status = _MINUTES_STATUSES.get(minutes)
+    if status is None:
+        status = _MINUTES_STATUSES[minutes] = sys.intern(f"{minutes} mins")
+    return status
+
+
+def train_from_dict(item: Any, index: int = 0) -> TrainArrival:
+    """Validate one decoded JSON object and turn it into a TrainArrival.
+
+    Args:
+        item: The decoded object, e.g. {"line": "F", "status": "3 mins", "express": false}
+        index: Position of the item in its payload, for error messages
+
+    Returns:
+        The train
+
+    Raises:
+        TrainDecodeError: If the object is not a valid train record
+    """
+    if not isinstance(item, dict):
+        raise TrainDecodeError(f"Train {index} is not an object")
+    line = item.get("line")
+    status = item.get("status")
+    express = item.get("express", False)
+    if not isinstance(line, str) or not line:
+        raise TrainDecodeError(f"Train {index} has no line")
+    if status is None:
+        status = ""
+    elif not isinstance(status, str):
+        raise TrainDecodeError(f"Train {index} has a non-string status")
+    if not isinstance(express, bool):
+        raise TrainDecodeError(f"Train {index} has a non-boolean express flag")
+    return TrainArrival(sys.intern(line), sys.intern(status), express)
+
+
+def trains_from_objects(items: Any) -> List[TrainArrival]:
+    """Validate a decoded JSON payload in a single pass.
+
+    Args:
+        items: The decoded payload, which must be a list of train objects
+
+    Returns:
+        The trains, in payload order
+
+    Raises:
+        TrainDecodeError: If the payload is not a list of valid train records
+    """
+    if not isinstance(items, list):
+        raise TrainDecodeError("Train payload is not a list")
+    return [train_from_dict(item, index) for index, item in enumerate(items)]
+
+
+if msgspec is not None:
+    class _WireTrain(msgspec.Struct):
+        """A train as it appears in the API's JSON, validated by msgspec."""
+        line: str
+        status: Optional[str] = None
+        express: bool = False
+
+    _wire_decoder = msgspec.json.Decoder(List[_WireTrain])
+
+
+def decode_trains(payload: bytes) -> List[TrainArrival]:
+    """Decode and validate a train API response body.
+
+    Uses msgspec or orjson when installed and the json module otherwise.
+
+    Args:
+        payload: The JSON response body
+
+    Returns:
+        The trains, in payload order
+
+    Raises:
+        TrainDecodeError: If the body is not valid JSON or not a list of
+            valid train records
+    """
+    if msgspec is not None:
+        try:
+            wire_trains = _wire_decoder.decode(payload)
+        except (msgspec.DecodeError, msgspec.ValidationError) as e:
+            raise TrainDecodeError(str(e)) from e
+        trains = []
+        for index, wire in enumerate(wire_trains):
+            if not wire.line:
+                raise TrainDecodeError(f"Train {index} has no line")
+            trains.append(TrainArrival(
+                sys.intern(wire.line), sys.intern(wire.status or ""), wire.express
+            ))
+        return trains
+
+    try:
+        items = orjson.loads(payload) if orjson is not None else json.loads(payload)
+    except ValueError as e:
+        raise TrainDecodeError(f"Invalid JSON: {e}") from e
+    return trains_from_objects(items)
@@ -1,147 +1,451 @@
-from typing import Dict, List, Tuple, Any
+import time
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple, Any
 
-from matrix_setup import (
-    MATRIX_WIDTH, MATRIX_HEIGHT, PANEL_WIDTH,
-    PADDING_X, PADDING_Y, CENTER_GAP, ROW_HEIGHT,
-    CIRCLE_WIDTH, FIRST_GAP, LINE_NAME_WIDTH, 
-    SECOND_GAP, MINUTES_WIDTH
-)
-from styles import F_TRAIN_COLOR, G_TRAIN_COLOR
+from bdf_font import BdfFont
+from layout import CompiledLayout, RowGeometry
+from lru import LRUCache
+from matrix_setup import LAYOUT
+from styles import STALE_INDICATOR_COLOR, RouteBullet, get_route_bullet
+from train_record import TrainArrival
+
+# Independently repaintable parts of a row, in draw order
+ROW_COMPONENTS = ("bullet", "name", "minutes", "suffix")
+# Components whose text scrolls through their window when it does not fit
+SCROLLING_COMPONENTS = ("name", "minutes")
+# Kept at a fixed position so only the minutes digits change from tick to tick
+MINUTES_SUFFIX = " mins"
+# Number of distinct (line, express, status) rows whose layout is kept
+LAYOUT_CACHE_SIZE = 64
+# Number of scrolling strips kept, apart from the row layouts that use them
+MARQUEE_CACHE_SIZE = 32
+
+
+class RowState(NamedTuple):
+    """What a row shows, split into the components that can be repainted alone.
+
+    The status is split into its variable minutes part and the fixed
+    " mins" suffix (empty for other statuses, which go in minutes whole).
+    """
+    bullet: Tuple[RouteBullet, bool]
+    name: str
+    minutes: str
+    suffix: str
+
+
+class RowLayout(NamedTuple):
+    """A row state resolved into the [start, end) columns of each component.
+
+    Every row uses the same columns, so one layout fits any row. Text
+    too wide for its component's window gets a marquee.Marquee, and the
+    component's extent is the whole window.
+    """
+    state: RowState
+    extents: Dict[str, Tuple[int, int]]
+    marquees: Dict[str, Any]
 
 
 class TrainRenderer:
-    """Renders train information on the LED matrix display."""
-    
+    """Renders train information on the LED matrix display.
+
+    The last state drawn on each canvas is remembered per row and per
+    component, so a new frame only repaints the bullet, line name, minutes
+    or suffix regions whose content changed, and an unchanged frame draws nothing.
+
+    Each distinct train is laid out once and kept in an LRU cache keyed by
+    the train itself, so a steady-state frame measures no text. Line names
+    and statuses too long for their space scroll; while they do, frames
+    whose trains are unchanged only repaint the scrolling windows. Their
+    marquees are cached on their own, by component, text and width, so a
+    row whose minutes tick keeps scrolling its name where it was.
+
+    Row positions come from a compiled layout, so there is one row per
+    layout row and no geometry is computed while drawing.
+    """
+
     def __init__(
-        self, matrix, graphics, text_renderer, shape_renderer, is_mock=False
+        self, matrix, graphics, text_renderer, shape_renderer, is_mock=False,
+        layout: Optional[CompiledLayout] = None
     ):
         """Initialize the train renderer.
-        
+
         Args:
             matrix: The LED matrix instance
             graphics: The graphics library
             text_renderer: Text rendering component
             shape_renderer: Shape rendering component
             is_mock: Whether to use mock mode (print to console instead)
+            layout: Where everything goes (defaults to matrix_setup.LAYOUT)
         """
+        self.layout = LAYOUT if layout is None else layout
         self.matrix = matrix
+        self.canvas = matrix
         self.graphics = graphics
         self.text_renderer = text_renderer
         self.shape_renderer = shape_renderer
         self.is_mock = is_mock
-        
-        # Define colors
-        if not is_mock:
-            self.f_line_color = graphics.Color(*F_TRAIN_COLOR)
-            self.g_line_color = graphics.Color(*G_TRAIN_COLOR)
-            self.text_color = graphics.Color(255, 255, 255)
-    
-    def get_section_coordinates(self, section: int) -> Tuple[int, int, int, int]:
-        """Get the coordinates for a section (0=top, 1=bottom).
-        
+
+        # Row layouts and stale flag of the last frame rendered, and of what
+        # each canvas holds
+        self._displayed: Optional[Tuple[Tuple[Optional[RowLayout], ...], bool]] = None
+        self._canvas_states: Dict[int, Tuple[Tuple[Optional[RowLayout], ...], bool]] = {}
+        self._black = None if is_mock else graphics.Color(0, 0, 0)
+        self._stale_color = None if is_mock else graphics.Color(*STALE_INDICATOR_COLOR)
+        self._geometry = self.layout.rows
+        self._layouts = LRUCache(LAYOUT_CACHE_SIZE)
+        self._marquees = LRUCache(MARQUEE_CACHE_SIZE)
+        self._marquee_font: Optional[BdfFont] = None
+        # Scroll offsets of the last frame presented, one per scrolling component
+        self._scroll_offsets: Tuple[int, ...] = ()
+
+    def set_canvas(self, canvas: Any) -> None:
+        """Point subsequent draw calls at a different canvas.
+
         Args:
-            section: Section index (0 for top, 1 for bottom)
-            
+            canvas: The matrix or off-screen frame canvas to draw on
+        """
+        self.canvas = canvas
+
+    def invalidate(self) -> None:
+        """Forget what is on screen so the next frame is drawn in full."""
+        self._displayed = None
+        self._canvas_states.clear()
+
+    @property
+    def max_rows(self) -> int:
+        """Number of trains shown at once."""
+        return len(self._geometry)
+
+    def get_row_geometry(self, section: int) -> RowGeometry:
+        """Get the position of each row component in a section.
+
+        Args:
+            section: Row index, 0 at the top
+
         Returns:
-            Tuple of (start_x, start_y, width, height)
+            The section's RowGeometry
         """
-        start_x = PADDING_X
-        start_y = PADDING_Y if section == 0 else PADDING_Y + ROW_HEIGHT + CENTER_GAP
-        return (start_x, start_y, MATRIX_WIDTH - (PADDING_X * 2), ROW_HEIGHT)
-    
-    def render_train_line(self, section: int, train_data: Dict[str, Any]) -> None:
-        """Render a train line with its text in the specified section."""
-        if self.is_mock:
-            line = train_data['line']
-            express = '(express)' if train_data['express'] else '(local)'
-            print(f"[MOCK DISPLAY] Train {section+1} {line} {express}: {train_data['status']}")
-            return
-            
-        x, y, width, height = self.get_section_coordinates(section)
-        
-        # Clear both panels for this section
-        for i in range(height):
-            self.graphics.DrawLine(
-                self.matrix, x, y + i, MATRIX_WIDTH - 1, y + i, 
-                self.graphics.Color(0, 0, 0)
-            )
-        
-        # Calculate component positions based on exact measurements
-        circle_x = x + CIRCLE_WIDTH // 2
-        circle_y = y + (height // 2)
-        line_name_x = x + CIRCLE_WIDTH + FIRST_GAP - 1  # Moved one column to the left
-        minutes_x = line_name_x + LINE_NAME_WIDTH + SECOND_GAP - 4 + 3  # Now moved three columns to the right in total
-        minutes_end_x = minutes_x + MINUTES_WIDTH  # This is where we want the text to end
-        
-        # Get train information
-        line = train_data['line']
-        is_express = train_data['express']
-        status = train_data['status']
-        
-        # Determine line name based on train type
-        if line == 'F':
-            line_name = "6 Av - Culver Express" if is_express else "6 Av Local"
-            circle_color = F_TRAIN_COLOR if self.is_mock else self.f_line_color
-        else:  # G train
-            line_name = "Crosstown"
-            circle_color = G_TRAIN_COLOR if self.is_mock else self.g_line_color
-        
-        # Draw the train line indicator (circle or diamond)
-        circle_radius = CIRCLE_WIDTH // 2
-        letter_x = x + (CIRCLE_WIDTH - 6) // 2  # Center the 6px wide letter
-        letter_y = y + (height - 8) // 2  # Center the 8px tall letter vertically
-        
-        if line == 'F' and is_express:
-            self.shape_renderer.draw_diamond(circle_x, circle_y, circle_radius, circle_color)
+        return self._geometry[section]
+
+    def get_row_state(self, train: TrainArrival) -> RowState:
+        """Resolve a train into the content of each row component.
+
+        Args:
+            train: The train to show
+
+        Returns:
+            The RowState to draw
+        """
+        is_express = train.express
+        bullet = get_route_bullet(train.line)
+        line_name = bullet.express_name if is_express else bullet.local_name
+        status = train.status
+        if MINUTES_SUFFIX in status:
+            # Split "5 mins" into "5" and " mins"
+            minutes, suffix = status.split(MINUTES_SUFFIX, 1)[0], MINUTES_SUFFIX
         else:
-            self.shape_renderer.draw_circle(circle_x, circle_y, circle_radius, circle_color)
-        
-        # Draw the F or G letter
-        text_color_tuple = (255, 255, 255)
-        if line == 'F':
-            self.shape_renderer.draw_thick_F(letter_x, letter_y, text_color_tuple)
-        else:  # G train
-            self.shape_renderer.draw_thick_G(letter_x, letter_y, text_color_tuple)
-        
-        # Draw line name
-        self.text_renderer.draw_text(
-            line_name[:14],  # Truncate long text
-            line_name_x,
-            y + 9  # Move down 1 row (was y + 7)
+            # Other statuses are shown whole, scrolling if they do not fit
+            minutes, suffix = status, ""
+        return RowState(
+            bullet=(bullet, is_express),
+            name=line_name,
+            minutes=minutes,
+            suffix=suffix,
         )
-        
-        # Parse and draw status with fixed "mins" position
-        if status and " mins" in status:
-            # Split "5 mins" into "5" and " mins"
-            parts = status.split(" mins", 1)
-            variable_part = parts[0]
-            fixed_part = " mins"
-            
-            # Draw with fixed suffix
-            self.text_renderer.draw_text_with_fixed_suffix(
-                variable_part,
-                fixed_part,
-                minutes_end_x,
-                y + 9
+
+    def get_row_layout(self, train: TrainArrival) -> RowLayout:
+        """Get the cached layout of a train's row, laying it out on first use.
+
+        Args:
+            train: The train to show
+
+        Returns:
+            The RowLayout to draw
+        """
+        layout = self._layouts.get(train)
+        if layout is None:
+            state = self.get_row_state(train)
+            geometry = self._geometry[0]
+            extents = {
+                component: self._measure_extent(geometry, state, component)
+                for component in ROW_COMPONENTS
+            }
+            marquees = {}
+            for component in SCROLLING_COMPONENTS:
+                window = self._text_window(geometry, state, component)
+                extent = extents[component]
+                if window is not None and not self.is_mock and extent[1] > window[1]:
+                    marquees[component] = self._get_marquee(
+                        component, getattr(state, component), window[1] - window[0]
+                    )
+                    extents[component] = window
+            layout = RowLayout(state, extents, marquees)
+            self._layouts.put(train, layout)
+        return layout
+
+    def _text_window(
+        self, geometry: RowGeometry, state: RowState, component: str
+    ) -> Optional[Tuple[int, int]]:
+        """Get the [start, end) columns a component's text must fit in, if bounded."""
+        if component == "name":
+            return (geometry.line_name_x, geometry.name_end_x)
+        if component == "minutes" and not state.suffix:
+            return (geometry.minutes_x, geometry.minutes_end_x)
+        return None
+
+    def _get_marquee(self, component: str, text: str, width: int) -> Any:
+        """Get the marquee scrolling a component's text, rasterizing it on first use.
+
+        The same marquee, and so the same scroll position, is kept while
+        the text stays, whatever else in its row changes.
+        """
+        key = (component, text, width)
+        marquee = self._marquees.get(key)
+        if marquee is None:
+            marquee = self._create_marquee(text, width)
+            self._marquees.put(key, marquee)
+        return marquee
+
+    def _create_marquee(self, text: str, width: int) -> Any:
+        """Rasterize text that scrolls through a window of the given width."""
+        # pylint: disable=import-outside-toplevel
+        from marquee import Marquee
+        if self._marquee_font is None:
+            font = self.text_renderer.font
+            if not isinstance(font, BdfFont):
+                # rgbmatrix fonts cannot draw off-screen; load the same font for the strips
+                from matrix_setup import load_numpy_font
+                font = load_numpy_font()[0]
+            self._marquee_font = font
+        return Marquee(self._marquee_font, text, width)
+
+    def _measure_extent(
+        self, geometry: RowGeometry, state: RowState, component: str
+    ) -> Tuple[int, int]:
+        """Measure the [start, end) columns a component covers."""
+        if component == "bullet":
+            return (geometry.x, geometry.bullet_end_x)
+        width = self.text_renderer.get_text_width
+        if component == "name":
+            return (geometry.line_name_x, geometry.line_name_x + width(state.name))
+        if not state.suffix:
+            if component == "suffix":
+                return (geometry.minutes_end_x, geometry.minutes_end_x)
+            return (geometry.minutes_x, geometry.minutes_x + width(state.minutes))
+        suffix_x = geometry.minutes_end_x - width(state.suffix)
+        if component == "suffix":
+            return (suffix_x, geometry.minutes_end_x)
+        return (suffix_x - width(state.minutes), suffix_x)
+
+    def _clear_columns(self, geometry: RowGeometry, start_x: int, end_x: int) -> None:
+        """Blank the row band between two columns (end exclusive).
+
+        The band reaches one row above and below the section, which is
+        where the bullet and text descenders can extend to.
+        """
+        start_x = max(start_x, 0)
+        end_x = min(end_x, self.layout.width) - 1
+        if end_x < start_x:
+            return
+        for row in range(geometry.y - 1, geometry.y + geometry.height + 1):
+            self.graphics.DrawLine(self.canvas, start_x, row, end_x, row, self._black)
+
+    def _draw_component(self, geometry: RowGeometry, layout: RowLayout, component: str) -> None:
+        """Draw one component of a row."""
+        state = layout.state
+        if component == "bullet":
+            bullet, is_express = state.bullet
+
+            # Draw the train line indicator (circle or diamond)
+            shape = bullet.express_shape if is_express else bullet.shape
+            self.shape_renderer.draw_shape(
+                shape, geometry.circle_x, geometry.circle_y, geometry.radius, bullet.color
             )
-        else:
-            # Fallback to regular drawing if we don't have the expected format
-            self.text_renderer.draw_text(
-                status[:7],  # Truncate long text
-                minutes_x,
-                y + 9
+
+            # Draw the route letter
+            self.shape_renderer.draw_shape(
+                bullet.glyph, geometry.letter_x, geometry.letter_y, 0, bullet.glyph_color
             )
+        elif component in layout.marquees:
+            self._draw_marquee(geometry, layout, component, time.monotonic())
+        else:
+            # Text components, with the minutes right-aligned against the suffix
+            text = getattr(state, component)
+            if text:
+                start_x = layout.extents[component][0]
+                self.text_renderer.draw_text(text, start_x, geometry.baseline)
+
+    def _draw_marquee(
+        self, geometry: RowGeometry, layout: RowLayout, component: str, now: float
+    ) -> int:
+        """Repaint a scrolling component's window at the current offset.
+
+        Returns:
+            The offset drawn
+        """
+        marquee = layout.marquees[component]
+        offset = marquee.offset(now)
+        start_x, end_x = layout.extents[component]
+        self._clear_columns(geometry, start_x, end_x)
+        color = self.text_renderer.text_color
+        marquee.draw(
+            self.canvas, start_x, geometry.baseline - self._marquee_font.baseline,
+            (color.red, color.green, color.blue), offset
+        )
+        return offset
+
+    def _scrolling(
+        self, states: Tuple[Optional[RowLayout], ...]
+    ) -> List[Tuple[int, RowLayout, str]]:
+        """List the (section, layout, component) of every scrolling component."""
+        return [
+            (section, layout, component)
+            for section, layout in enumerate(states) if layout is not None
+            for component in layout.marquees
+        ]
+
+    def _offsets(self, states: Tuple[Optional[RowLayout], ...]) -> Tuple[int, ...]:
+        """Get the current offset of every scrolling component."""
+        now = time.monotonic()
+        return tuple(
+            layout.marquees[component].offset(now)
+            for _, layout, component in self._scrolling(states)
+        )
+
+    def _scroll(self, states: Tuple[Optional[RowLayout], ...]) -> None:
+        """Repaint every scrolling window at its current offset.
+
+        Each window is repainted whole, so a canvas that missed some frames
+        catches up.
+        """
+        now = time.monotonic()
+        offsets = []
+        for section, layout, component in self._scrolling(states):
+            offsets.append(self._draw_marquee(self._geometry[section], layout, component, now))
+        self._scroll_offsets = tuple(offsets)
+
+    def scroll_interval(self) -> Optional[float]:
+        """Get the frame interval the scrolling text needs.
+
+        Returns:
+            Seconds between frames, or None if nothing on screen scrolls
+        """
+        if self._displayed is None:
+            return None
+        intervals = [
+            layout.marquees[component].frame_interval
+            for _, layout, component in self._scrolling(self._displayed[0])
+        ]
+        return min(intervals) if intervals else None
+
+    def render_train_line(self, section: int, train: TrainArrival) -> None:
+        """Render a train line with its text in the specified section."""
+        if self.is_mock:
+            express = '(express)' if train.express else '(local)'
+            print(f"[MOCK DISPLAY] Train {section+1} {train.line} {express}: {train.status}")
+            return
+
+        geometry = self._geometry[section]
+        layout = self.get_row_layout(train)
+
+        # Clear both panels for this section
+        self._clear_columns(geometry, 0, self.layout.width)
+        for component in ROW_COMPONENTS:
+            self._draw_component(geometry, layout, component)
+
+    def _update_row(
+        self, section: int, old: Optional[RowLayout], new: Optional[RowLayout]
+    ) -> None:
+        """Repaint only the components of a row that differ between two layouts."""
+        geometry = self._geometry[section]
+        if old is None or new is None:
+            self._clear_columns(geometry, 0, self.layout.width)
+            if new is not None:
+                for component in ROW_COMPONENTS:
+                    self._draw_component(geometry, new, component)
+            return
+
+        dirty: Set[str] = set()
+        cleared: List[Tuple[int, int]] = []
+        for component in ROW_COMPONENTS:
+            old_extent = old.extents[component]
+            new_extent = new.extents[component]
+            changed = getattr(old.state, component) != getattr(new.state, component)
+            if changed or old_extent != new_extent:
+                dirty.add(component)
+                cleared.append(
+                    (min(old_extent[0], new_extent[0]), max(old_extent[1], new_extent[1]))
+                )
+
+        # Unchanged components overlapping a cleared region must be redrawn too
+        grew = True
+        while grew:
+            grew = False
+            for component in ROW_COMPONENTS:
+                if component in dirty:
+                    continue
+                start, end = new.extents[component]
+                if any(start < c_end and c_start < end for c_start, c_end in cleared):
+                    dirty.add(component)
+                    cleared.append((start, end))
+                    grew = True
+
+        for start, end in cleared:
+            self._clear_columns(geometry, start, end)
+        for component in ROW_COMPONENTS:
+            if component in dirty:
+                self._draw_component(geometry, new, component)
+
+    def _draw_stale_indicator(self, stale: bool) -> None:
+        """Light or blank the stale data indicator pixel."""
+        color = self._stale_color if stale else self._black
+        x, y = self.layout.stale_indicator
+        self.graphics.DrawLine(self.canvas, x, y, x, y, color)
+
+    def render_trains(self, trains: List[TrainArrival], stale: bool = False) -> bool:
+        """Render a list of trains, one per layout row, onto the current canvas.
+
+        Only the regions that differ from what the current canvas already
+        holds are repainted, plus the windows of any scrolling text.
 
-    def render_trains(self, trains: List[Dict[str, Any]]) -> None:
-        """Render a list of trains (up to 2).
-        
         Args:
-            trains: List of train dictionaries to display
+            trains: Trains to display, soonest first; those beyond the last row are left out
+            stale: Whether to light the stale data indicator
+
+        Returns:
+            False if the trains match the last rendered frame and no
+            scrolling text moved, so nothing was drawn; True otherwise
         """
-        if self.matrix and not self.is_mock:
-            self.matrix.Clear()
-            
-        if len(trains) > 0:
-            self.render_train_line(0, trains[0])
-        if len(trains) > 1:
-            self.render_train_line(1, trains[1])
\ No newline at end of file
+        states = tuple(
+            self.get_row_layout(trains[section]) if section < len(trains) else None
+            for section in range(self.max_rows)
+        )
+        frame = (states, stale)
+        if frame == self._displayed:
+            # Only moving text needs a new frame, but the canvas may be one behind
+            if self.is_mock or self._scroll_offsets == self._offsets(states):
+                return False
+        elif self.is_mock:
+            self._displayed = frame
+            for section, train in enumerate(trains[:self.max_rows]):
+                self.render_train_line(section, train)
+            if stale:
+                print("[MOCK DISPLAY] Data is stale")
+            return True
+        self._displayed = frame
+
+        canvas_key = id(self.canvas)
+        previous = self._canvas_states.get(canvas_key)
+        if previous is None:
+            # Unknown canvas contents: start from a blank canvas
+            self.canvas.Clear()
+            previous = ((None,) * self.max_rows, False)
+
+        previous_states, previous_stale = previous
+        for section, (old, new) in enumerate(zip(previous_states, states)):
+            if old != new:
+                self._update_row(section, old, new)
+        if stale != previous_stale:
+            self._draw_stale_indicator(stale)
+        self._canvas_states[canvas_key] = frame
+        self._scroll(states)
+        return True
@@ -0,0 +1,183 @@
+import logging
+import os
+import time
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+# "slide" (up), "wipe" (left to right), "fade" or "off" (the default)
+TRANSITION = os.environ.get("TRANSITION", "off")
+# Seconds a transition lasts
+TRANSITION_DURATION = float(os.environ.get("TRANSITION_DURATION", "0.4"))
+# Frames per second it is played at
+TRANSITION_FPS = float(os.environ.get("TRANSITION_FPS", "50"))
+
+
+# Every table builder takes (height, width, count), whichever of them it uses
+# pylint: disable=unused-argument
+def slide_table(height: int, width: int, count: int) -> np.ndarray:
+    """Rows of the old frame stacked on the new one that each slide frame shows.
+
+    Returns:
+        (count, height) index array; frame i moves the content up by
+        height * (i + 1) / count rows
+    """
+    shifts = np.rint(np.arange(1, count + 1) * height / count).astype(np.intp)
+    return shifts[:, None] + np.arange(height)[None, :]
+
+
+def slide(old: np.ndarray, new: np.ndarray, table: np.ndarray) -> np.ndarray:
+    """The new frame pushes the old one up and out."""
+    return np.concatenate((old, new))[table]
+
+
+def wipe_table(height: int, width: int, count: int) -> np.ndarray:
+    """Columns already showing the new frame in each wipe frame.
+
+    Returns:
+        (count, 1, width, 1) boolean mask, broadcast over rows and channels
+    """
+    edges = np.rint(np.arange(1, count + 1) * width / count).astype(np.intp)
+    return (np.arange(width)[None, :] < edges[:, None])[:, None, :, None]
+
+
+def wipe(old: np.ndarray, new: np.ndarray, table: np.ndarray) -> np.ndarray:
+    """The new frame is uncovered from left to right."""
+    return np.where(table, new, old)
+
+
+def fade_table(height: int, width: int, count: int) -> np.ndarray:
+    """Weight of the new frame in each cross-fade frame, out of 256.
+
+    Returns:
+        (count, 1, 1, 1) uint16 array, broadcast over pixels
+    """
+    weights = (np.arange(1, count + 1) * 256 // count).astype(np.uint16)
+    return weights[:, None, None, None]
+
+
+# pylint: enable=unused-argument
+def fade(old: np.ndarray, new: np.ndarray, table: np.ndarray) -> np.ndarray:
+    """The old frame is cross-faded into the new one."""
+    # 255 * 256 still fits in 16 bits, so the blend needs no wider type
+    blended = old.astype(np.uint16) * (256 - table) + new.astype(np.uint16) * table
+    return (blended >> 8).astype(np.uint8)
+
+
+# Builds the table for a frame size and frame count
+TableBuilder = Callable[[int, int, int], np.ndarray]
+# Composes every frame from the old frame, the new one and the table
+Composer = Callable[[np.ndarray, np.ndarray, np.ndarray], np.ndarray]
+
+TRANSITIONS: Dict[str, Tuple[TableBuilder, Composer]] = {
+    "slide": (slide_table, slide),
+    "wipe": (wipe_table, wipe),
+    "fade": (fade_table, fade),
+}
+
+
+class TransitionPlayer:
+    """Animates from one finished frame to the next.
+
+    Every intermediate frame is composed at once, as one
+    (count, height, width, 3) array, from the outgoing and incoming frames
+    and a table of row indices, column masks or blend weights that depends
+    only on the frame size and is built on first use. The frames are then
+    shown in order, each at its deadline; when showing falls behind, the
+    frames already overdue are skipped and counted rather than shown late.
+    """
+
+    def __init__(
+        self,
+        style: str = TRANSITION,
+        duration: float = TRANSITION_DURATION,
+        fps: float = TRANSITION_FPS
+    ):
+        """Initialize the player.
+
+        Args:
+            style: One of TRANSITIONS
+            duration: Seconds a transition lasts
+            fps: Frames per second
+
+        Raises:
+            ValueError: For an unknown style
+        """
+        if style not in TRANSITIONS:
+            raise ValueError(
+                f"Unknown transition {style!r}; choose from {', '.join(TRANSITIONS)}"
+            )
+        self.style = style
+        self.interval = 1.0 / fps
+        self.count = max(int(round(duration * fps)), 1)
+        self._build_table, self._compose = TRANSITIONS[style]
+        self._tables: Dict[Tuple[int, int], np.ndarray] = {}
+
+    def frames(self, old: np.ndarray, new: np.ndarray) -> np.ndarray:
+        """Compose every frame of the transition.
+
+        Args:
+            old: (height, width, 3) uint8 outgoing frame
+            new: (height, width, 3) uint8 incoming frame
+
+        Returns:
+            (count, height, width, 3) uint8 frames; the last one is new
+        """
+        height, width = old.shape[:2]
+        table = self._tables.get((height, width))
+        if table is None:
+            table = self._build_table(height, width, self.count)
+            self._tables[(height, width)] = table
+        return self._compose(old, new, table)
+
+    def play(
+        self, old: np.ndarray, new: np.ndarray, show: Callable[[np.ndarray], None]
+    ) -> Tuple[int, int]:
+        """Show the transition's frames, except the last, each at its deadline.
+
+        Returns once the last frame is due, so the caller can show the
+        incoming frame itself, on time.
+
+        Args:
+            old: (height, width, 3) uint8 outgoing frame
+            new: (height, width, 3) uint8 incoming frame
+            show: Puts one frame on the panel
+
+        Returns:
+            Tuple of (frames shown, frames skipped)
+        """
+        with METRICS.timer("transition_compose"):
+            frames = self.frames(old, new)
+        last = len(frames) - 1
+        shown = skipped = 0
+        index = 0
+        start = time.perf_counter()
+        while index < last:
+            delay = start + index * self.interval - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # Behind: jump to the newest frame that is already due
+                behind = min(int(-delay / self.interval), last - index)
+                skipped += behind
+                index += behind
+                if index == last:
+                    break
+            with METRICS.timer("transition_frame"):
+                show(frames[index])
+            shown += 1
+            index += 1
+        delay = start + last * self.interval - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+        METRICS.inc("transitions")
+        METRICS.inc("transition_frames_shown", shown)
+        METRICS.inc("transition_frames_skipped", skipped)
+        if skipped:
+            logger.debug("Transition skipped %d of %d frames", skipped, last)
+        return shown, skipped
@@ -0,0 +1,220 @@
+import os
+import time
+from collections import Counter, deque
+from typing import Any, Deque, List, Optional
+
+import numpy as np
+
+from framebuffer import FrameBuffer
+
+# Number of recorded frames kept in memory
+FRAME_HISTORY = 256
+
+
+class Frame:
+    """One frame shown on the virtual matrix."""
+
+    __slots__ = ("index", "pixels", "calls", "shown_at")
+
+    def __init__(self, index: int, pixels: np.ndarray, calls: Counter, shown_at: float):
+        """Initialize the frame.
+
+        Args:
+            index: Sequence number of the frame, starting at 1
+            pixels: (height, width, 3) uint8 copy of the frame
+            calls: Drawing calls made to build the frame, by name
+            shown_at: time.perf_counter() when the frame was shown
+        """
+        self.index = index
+        self.pixels = pixels
+        self.calls = calls
+        self.shown_at = shown_at
+
+    @property
+    def lit_pixels(self) -> int:
+        """Number of pixels that are not black."""
+        return int(np.count_nonzero(self.pixels.any(axis=2)))
+
+    def to_ascii(self, lit: str = "#", unlit: str = ".") -> str:
+        """Render the frame as one text line per pixel row."""
+        mask = self.pixels.any(axis=2)
+        return "\n".join("".join(lit if on else unlit for on in row) for row in mask)
+
+    def save_ppm(self, path: str) -> None:
+        """Write the frame as a binary PPM image (no dependencies needed)."""
+        height, width, _ = self.pixels.shape
+        with open(path, "wb") as ppm:
+            ppm.write(f"P6 {width} {height} 255\n".encode("ascii"))
+            ppm.write(self.pixels.tobytes())
+
+    def save_png(self, path: str) -> None:
+        """Write the frame as a PNG image (requires Pillow)."""
+        from PIL import Image  # pylint: disable=import-outside-toplevel
+        Image.fromarray(self.pixels, "RGB").save(path)
+
+
+class VirtualCanvas(FrameBuffer):
+    """An in-memory frame canvas that counts the drawing calls it receives.
+
+    calls holds one counter per drawing call name plus "pixel_writes", the
+    number of pixels those calls set. Like an rgbmatrix FrameCanvas it has
+    its own PWM bits and brightness, which are only recorded.
+    """
+
+    def __init__(self, width: int, height: int):
+        """Initialize a blank canvas with no calls counted."""
+        super().__init__(width, height)
+        self.calls: Counter = Counter()
+        self.brightness = 100
+        self.pwmBits = 11  # pylint: disable=invalid-name
+
+    def SetPixel(self, x: int, y: int, r: int, g: int, b: int) -> None:  # pylint: disable=invalid-name
+        """Set one pixel, counting the call."""
+        self.calls["SetPixel"] += 1
+        self.calls["pixel_writes"] += 1
+        super().SetPixel(x, y, r, g, b)
+
+    def Clear(self) -> None:  # pylint: disable=invalid-name
+        """Clear the canvas, counting every pixel as written."""
+        self.calls["Clear"] += 1
+        self.calls["pixel_writes"] += self.width * self.height
+        super().Clear()
+
+    def Fill(self, r: int, g: int, b: int) -> None:  # pylint: disable=invalid-name
+        """Fill the canvas with one color, counting every pixel as written."""
+        self.calls["Fill"] += 1
+        self.calls["pixel_writes"] += self.width * self.height
+        super().Fill(r, g, b)
+
+    def SetImage(self, image: Any, offset_x: int = 0, offset_y: int = 0, unsafe: bool = True) -> None:  # pylint: disable=invalid-name
+        """Copy an image onto the canvas, counting the pixels that land on it."""
+        self.calls["SetImage"] += 1
+        width, height = image.shape[1::-1] if isinstance(image, np.ndarray) else image.size
+        self.calls["pixel_writes"] += min(width, self.width) * min(height, self.height)
+        super().SetImage(image, offset_x, offset_y, unsafe)
+
+    def fill_rect(self, x0, y0, x1, y1, rgb) -> None:
+        """Fill a rectangle, counted as one DrawLine call."""
+        self.calls["DrawLine"] += 1
+        self.calls["pixel_writes"] += (abs(x1 - x0) + 1) * (abs(y1 - y0) + 1)
+        super().fill_rect(x0, y0, x1, y1, rgb)
+
+    def fill_spans(self, spans, x, y, rgb) -> None:
+        """Fill horizontal runs of pixels, counting the pixels in them."""
+        self.calls["fill_spans"] += 1
+        self.calls["pixel_writes"] += sum(x1 - x0 + 1 for _, x0, x1 in spans)
+        super().fill_spans(spans, x, y, rgb)
+
+    def draw_text(self, font, x, y, rgb, text) -> int:
+        """Draw text, counting the lit pixels of its glyphs."""
+        self.calls["DrawText"] += 1
+        for char in text:
+            glyph = font.glyph(ord(char))
+            if glyph is not None and glyph.height:
+                self.calls["pixel_writes"] += int(glyph.bitmap.sum())
+        return super().draw_text(font, x, y, rgb, text)
+
+
+class VirtualMatrix(VirtualCanvas):
+    """A headless stand-in for rgbmatrix.RGBMatrix.
+
+    Drawing on the matrix itself draws on the visible frame; frame canvases
+    from CreateFrameCanvas are swapped in with SwapOnVSync like on the
+    hardware. Every swap records a Frame, and capture() records the
+    directly drawn frame. Frames can be written to a directory as they are
+    recorded (see VIRTUAL_DUMP_DIR).
+    """
+
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        dump_dir: Optional[str] = None,
+        dump_format: str = "ppm",
+        history: int = FRAME_HISTORY
+    ):
+        """Initialize the virtual matrix.
+
+        Args:
+            width: Width in pixels
+            height: Height in pixels
+            dump_dir: Directory every recorded frame is written to, if set
+            dump_format: "ppm", "png" or "txt" (ASCII art)
+            history: Number of recorded frames kept in memory
+        """
+        super().__init__(width, height)
+        self.frames: Deque[Frame] = deque(maxlen=history)
+        self.frame_count = 0
+        self.dump_dir = dump_dir
+        self.dump_format = dump_format
+        self._front: Optional[VirtualCanvas] = None
+        if dump_dir:
+            os.makedirs(dump_dir, exist_ok=True)
+
+    @property
+    def visible(self) -> np.ndarray:
+        """The pixels currently shown."""
+        return self.pixels if self._front is None else self._front.pixels
+
+    def CreateFrameCanvas(self) -> VirtualCanvas:  # pylint: disable=invalid-name
+        """Create an off-screen canvas."""
+        return VirtualCanvas(self.width, self.height)
+
+    def SwapOnVSync(self, canvas: VirtualCanvas, framerate_fraction: int = 1) -> VirtualCanvas:  # pylint: disable=invalid-name,unused-argument
+        """Show a canvas and hand back the one it replaces.
+
+        Args:
+            canvas: Canvas to show
+            framerate_fraction: Ignored
+
+        Returns:
+            The previously shown canvas
+        """
+        previous = self._front or self.CreateFrameCanvas()
+        self._front = canvas
+        self._record(canvas.pixels, canvas.calls)
+        canvas.calls = Counter()
+        return previous
+
+    def capture(self) -> Frame:
+        """Record what is visible now (for direct, non-swapped drawing).
+
+        Returns:
+            The recorded frame
+        """
+        if self._front is None:
+            frame = self._record(self.pixels, self.calls)
+            self.calls = Counter()
+            return frame
+        return self._record(self._front.pixels, Counter())
+
+    def _record(self, pixels: np.ndarray, calls: Counter) -> Frame:
+        self.frame_count += 1
+        frame = Frame(self.frame_count, pixels.copy(), calls, time.perf_counter())
+        self.frames.append(frame)
+        if self.dump_dir:
+            path = os.path.join(self.dump_dir, f"frame_{frame.index:06d}.{self.dump_format}")
+            if self.dump_format == "png":
+                frame.save_png(path)
+            elif self.dump_format == "txt":
+                with open(path, "w", encoding="ascii") as txt:
+                    txt.write(frame.to_ascii() + "\n")
+            else:
+                frame.save_ppm(path)
+        return frame
+
+    @property
+    def last_frame(self) -> Optional[Frame]:
+        """The most recently recorded frame, if any."""
+        return self.frames[-1] if self.frames else None
+
+    def call_totals(self) -> Counter:
+        """Sum the drawing calls over every frame still in the history."""
+        totals: Counter = Counter()
+        for frame in self.frames:
+            totals.update(frame.calls)
+        return totals
+
+    def recent_frames(self, count: int) -> List[Frame]:
+        """Get up to count of the most recent frames, oldest first."""
+        return list(self.frames)[-count:]